@@ -1,7 +1,32 @@
 import json
 import os
+import sys
+import re
 import glob
+import math
 import random
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+# ==========================================
+# FULL AUDIT SETTINGS
+# ==========================================
+CHART_GLOB = "public/data/charts/*.json"
+PROFILE_GLOB = "public/data/profiles/*.json"
+AUDIT_MANIFEST_PATH = os.environ.get('AUDIT_MANIFEST', '.cache/audit_manifest.json')   # mtime/hash -> cached result
+AUDIT_REPORT_PATH = os.environ.get('AUDIT_REPORT', 'public/data/audit_report.json')
+CHART_STALE_DAYS = float(os.environ.get('AUDIT_CHART_STALE_DAYS', '7'))       # last bar older than this
+PROFILE_STALE_DAYS = float(os.environ.get('AUDIT_PROFILE_STALE_DAYS', '7'))   # last regenerated longer ago than this
+# When the pump last regenerated each artifact (ArtifactWriter). A profile whose content didn't
+# change isn't rewritten, so its own lastUpdated is the time of its last *change*, not its last fetch.
+AUDIT_FETCHED_PATH = os.environ.get('AUDIT_FETCHED', '.cache/artifact_fetched.json')
+ZERO_BAR_RATIO = 0.05   # warn when more than this share of bars carry a 0 price (the pump writes NaN as 0)
+
+CHART_KEYS = ("date", "price", "open", "high", "low", "volume")
+PROFILE_KEYS = ("symbol", "name", "sector", "currency", "lastUpdated")
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
 def check_data_lake():
     print("🔬 STARTING DATA LAKE AUDIT (V2 - PROFILES)...")
@@ -55,7 +80,7 @@ def check_data_lake():
                     
                     # Check key fields
                     has_desc = len(pdata.get('description', '')) > 50
-                    has_mktcap = pdata.get('marketCap', 0) or 0 > 0
+                    has_mktcap = (pdata.get('marketCap') or 0) > 0
                     has_sector = pdata.get('sector') != 'N/A'
                     
                     status = "✅"
@@ -76,5 +101,204 @@ def check_data_lake():
     else:
          print(f"⚠️ SYSTEM NEEDS ATTENTION (Stocks: {total_stocks}, Charts: {len(chart_files)}, Profiles: {len(profile_files)})")
 
+# ==========================================
+# FULL AUDIT (every chart + profile, process pool)
+# ==========================================
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def audit_chart(data):
+    """Structural checks for one chart payload. Returns (errors, warnings, lastDate)."""
+    errors, warnings = [], []
+    quotes = data.get("quotes") if isinstance(data, dict) else None
+    if not isinstance(quotes, list):
+        return ["schema: missing quotes list"], [], None
+    if not quotes:
+        return [], ["empty: no bars"], None
+
+    prev_date = None
+    unordered = nan_bars = zero_bars = bad_rows = 0
+    for q in quotes:
+        if not isinstance(q, dict) or any(k not in q for k in CHART_KEYS) or not isinstance(q["date"], str) or not DATE_RE.match(q["date"]):
+            bad_rows += 1
+            continue
+        if prev_date is not None and q["date"] <= prev_date: unordered += 1
+        prev_date = q["date"]
+        values = [q[k] for k in CHART_KEYS[1:]]
+        if not all(_is_number(v) for v in values):
+            bad_rows += 1
+        elif any(not math.isfinite(v) for v in values):
+            nan_bars += 1
+        elif q["price"] == 0:
+            zero_bars += 1
+
+    if bad_rows: errors.append(f"schema: {bad_rows} malformed bars")
+    if unordered: errors.append(f"dates: {unordered} bars out of order or duplicated")
+    if nan_bars: errors.append(f"nan: {nan_bars} bars with NaN/Infinity")
+    if zero_bars > ZERO_BAR_RATIO * len(quotes): warnings.append(f"zero: {zero_bars}/{len(quotes)} bars with a 0 price")
+    if isinstance(quotes[-1], dict) and quotes[-1].get("price") == 0: warnings.append("zero: latest bar has a 0 price")
+    return errors, warnings, prev_date
+
+def audit_profile(data):
+    """Structural checks for one profile payload. Returns (errors, warnings, lastUpdated)."""
+    if not isinstance(data, dict):
+        return ["schema: not an object"], [], None
+    errors, warnings = [], []
+    missing = [k for k in PROFILE_KEYS if k not in data]
+    if missing: errors.append(f"schema: missing {', '.join(missing)}")
+    bad = sorted(k for k, v in data.items() if isinstance(v, float) and not math.isfinite(v))
+    if bad: errors.append(f"nan: {', '.join(bad)}")
+    if not ((data.get('marketCap') or 0) > 0): warnings.append("basic: no marketCap")
+    if len(data.get('description') or '') <= 50: warnings.append("basic: no description")
+    return errors, warnings, data.get("lastUpdated")
+
+def audit_file(job):
+    """
+    Worker: read, hash and audit one file. `job` is (path, kind, known_sha1).
+    Returns (path, sha1, result); result is None when the content still matches known_sha1.
+    """
+    path, kind, known_sha1 = job
+    result = {"kind": kind, "errors": [], "warnings": [], "timestamp": None}
+    sha1 = None
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        sha1 = hashlib.sha1(raw).hexdigest()
+        if sha1 == known_sha1: return path, sha1, None # Touched, not changed
+        data = json.loads(raw)
+    except Exception as e:
+        result["errors"].append(f"corrupt: {e.__class__.__name__}: {e}")
+        return path, sha1, result
+    check = audit_chart if kind == "chart" else audit_profile
+    result["errors"], result["warnings"], result["timestamp"] = check(data)
+    return path, sha1, result
+
+def _parse_timestamp(value):
+    """'YYYY-MM-DD' bar dates and the pump's isoformat()+'Z' stamps -> aware datetime (None if unparseable)."""
+    if not isinstance(value, str): return None
+    # The pump appends "Z" to an already offset-aware isoformat() ("...+00:00Z")
+    text = value[:-1] if value.endswith("Z") and "+" in value else value.replace("Z", "+00:00")
+    try:
+        ts = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def staleness(result, now, fetched_at=None):
+    """
+    Staleness is evaluated at report time, so cached results age correctly. `fetched_at`
+    (the pump's last regeneration of the file) wins over an older in-file timestamp.
+    """
+    limit = CHART_STALE_DAYS if result["kind"] == "chart" else PROFILE_STALE_DAYS
+    stamps = [ts for ts in (_parse_timestamp(result.get("timestamp")), _parse_timestamp(fetched_at)) if ts is not None]
+    ts = max(stamps) if stamps else None
+    if ts is None:
+        return None if result["errors"] else "stale: no timestamp"
+    age = (now - ts).total_seconds() / 86400
+    return f"stale: {age:.1f} days old" if age > limit else None
+
+def load_manifest(path=AUDIT_MANIFEST_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_manifest(manifest, path=AUDIT_MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def load_fetched(path=AUDIT_FETCHED_PATH):
+    """{normalized path: last regeneration timestamp} from the pump's artifact writer ({} if absent)."""
+    try:
+        with open(path, "r") as f:
+            return {os.path.normpath(p): ts for p, ts in json.load(f).items()}
+    except Exception:
+        return {}
+
+def full_audit(workers=None, use_cache=True, report_path=AUDIT_REPORT_PATH, manifest_path=AUDIT_MANIFEST_PATH, now=None,
+               fetched_path=AUDIT_FETCHED_PATH):
+    """
+    Audit every chart and profile. Files whose (mtime, size) match the manifest reuse
+    their cached result; the rest are hashed in a process pool and re-audited unless
+    their sha1 is unchanged. Returns the report (also written to report_path).
+    """
+    now = now or datetime.now(timezone.utc)
+    previous = load_manifest(manifest_path) if use_cache else {}
+    files = [(p, "chart") for p in sorted(glob.glob(CHART_GLOB))] + [(p, "profile") for p in sorted(glob.glob(PROFILE_GLOB))]
+
+    manifest, todo = {}, []
+    for path, kind in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = previous.get(path)
+        if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            manifest[path] = entry
+        else:
+            manifest[path] = {"mtime": st.st_mtime_ns, "size": st.st_size}
+            todo.append((path, kind, entry.get("sha1") if entry else None))
+
+    print(f"🔬 Full audit: {len(files)} files, {len(todo)} new or touched, {len(files) - len(todo)} cached")
+    rechecked = 0
+    if todo:
+        chunksize = max(1, len(todo) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, sha1, result in pool.map(audit_file, todo, chunksize=chunksize):
+                manifest[path]["sha1"] = sha1
+                if result is None:
+                    manifest[path]["result"] = previous[path]["result"]
+                else:
+                    manifest[path]["result"] = result
+                    rechecked += 1
+    save_manifest(manifest, manifest_path)
+
+    summary = {kind: {"files": 0, "errors": 0, "warnings": 0, "stale": 0} for kind in ("chart", "profile")}
+    problems = {}
+    fetched = load_fetched(fetched_path)
+    for path, entry in manifest.items():
+        result = entry["result"]
+        stale = staleness(result, now, fetched.get(os.path.normpath(path)) if result["kind"] == "profile" else None)
+        warnings = result["warnings"] + ([stale] if stale else [])
+        counts = summary[result["kind"]]
+        counts["files"] += 1
+        counts["errors"] += bool(result["errors"])
+        counts["warnings"] += bool(warnings)
+        counts["stale"] += bool(stale)
+        if result["errors"] or warnings:
+            problems[path] = {"errors": result["errors"], "warnings": warnings}
+
+    report = {
+        "generatedAt": now.isoformat(),
+        "audited": rechecked,
+        "cached": len(manifest) - rechecked,
+        "summary": summary,
+        "ok": all(c["errors"] == 0 for c in summary.values()),
+        "files": problems
+    }
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, "w", encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    for kind, c in summary.items():
+        status = "✅" if c["errors"] == 0 else "❌"
+        print(f"{status} {kind}s: {c['files']} files, {c['errors']} with errors, {c['warnings']} with warnings ({c['stale']} stale)")
+    return report
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data lake audit")
+    parser.add_argument("--full", action="store_true", help="validate every chart and profile; exits 1 on errors")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the audit manifest and re-check every file")
+    parser.add_argument("--report", default=AUDIT_REPORT_PATH, help="JSON report path")
+    args = parser.parse_args()
+
+    if args.full:
+        report = full_audit(args.workers, use_cache=not args.no_cache, report_path=args.report)
+        sys.exit(0 if report["ok"] else 1)
     check_data_lake()
@@ -0,0 +1,111 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# DERIVED ANALYTICS (from price history)
+# ==========================================
+# Histories are stacked into one panel aligned on each symbol's latest bar
+# (column -1 = last session, -2 = the one before, ...), left-padded with NaN.
+# Aligning by session rather than calendar date keeps windows meaning "last N
+# trading sessions" for every symbol, whatever its exchange's holidays.
+# Every metric is then a single numpy reduction over the whole panel.
+#
+# The pump calls this once per download batch (fetch_batch, 8..32 symbols as the
+# AdaptiveScheduler sizes them; the recovery phase batches the same way), not once
+# per run: rows, charts and profiles stream out batch by batch, so a whole run's
+# histories are never in memory together. For 500 symbols x 1y that costs ~80-100ms
+# against ~75ms for a single run-wide panel and ~300ms one symbol at a time
+# (scripts/bench_pump.py: compute_analytics vs analytics_per_batch).
+
+TRADING_DAYS_PER_YEAR = 252
+RETURN_HORIZONS = {"return1w": 5, "return1m": 21, "return3m": 63, "return6m": 126}
+VOLATILITY_WINDOW = 21          # sessions of daily log returns behind volatility30d
+AVERAGE_VOLUME_WINDOW = 63      # ~3 months, like Yahoo's averageVolume
+AVERAGE_VOLUME_SHORT_WINDOW = 10
+
+ANALYTICS_FIELDS = (
+    "previousClose", "fiftyTwoWeekHigh", "fiftyTwoWeekLow", "fiftyTwoWeekChange",
+    "fiftyDayAverage", "twoHundredDayAverage", "averageVolume", "averageVolume10days",
+    "volatility30d"
+) + tuple(RETURN_HORIZONS)
+
+def stack_panel(frames):
+    """
+    {symbol: OHLCV frame} -> (symbols, {"date", "high", "low", "close", "volume": matrix, "length": bars}).
+    Matrices are (symbols x longest history), right-aligned on the latest bar.
+    """
+    symbols = [s for s, df in frames.items() if df is not None and len(df)]
+    width = max((len(frames[s]) for s in symbols), default=0)
+    panel = {field: np.full((len(symbols), width), np.nan) for field in ("high", "low", "close", "volume")}
+    panel["length"] = np.array([len(frames[s]) for s in symbols], dtype=np.int64)
+    panel["date"] = np.full((len(symbols), width), np.datetime64("NaT"), dtype="datetime64[D]")
+    for row, symbol in enumerate(symbols):
+        df = frames[symbol]
+        n = len(df)
+        index = df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+        panel["date"][row, width - n:] = index.values.astype("datetime64[D]")
+        for field, column in (("high", "High"), ("low", "Low"), ("close", "Close"), ("volume", "Volume")):
+            values = df[column]
+            if values.dtype.kind not in "fi": values = pd.to_numeric(values, errors="coerce")
+            panel[field][row, width - n:] = values.to_numpy(dtype=float)
+    return symbols, panel
+
+def _window(matrix, n):
+    """Last n sessions (all-NaN when the panel is narrower than n)."""
+    return matrix[:, -n:] if matrix.shape[1] >= n else np.full((matrix.shape[0], n), np.nan)
+
+def _last_valid(matrix):
+    """Per-row last non-NaN value (NaN for empty rows)."""
+    valid = ~np.isnan(matrix)
+    idx = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    values = matrix[np.arange(matrix.shape[0]), idx] if matrix.shape[1] else np.full(matrix.shape[0], np.nan)
+    return np.where(valid.any(axis=1), values, np.nan)
+
+def _first_valid(matrix):
+    valid = ~np.isnan(matrix)
+    idx = np.argmax(valid, axis=1)
+    values = matrix[np.arange(matrix.shape[0]), idx] if matrix.shape[1] else np.full(matrix.shape[0], np.nan)
+    return np.where(valid.any(axis=1), values, np.nan)
+
+def _full_mean(matrix, lengths, n):
+    """Mean of the last n sessions, only for symbols with at least n sessions of history."""
+    return np.where(lengths >= n, np.nanmean(_window(matrix, n), axis=1), np.nan)
+
+def compute_analytics(frames):
+    """{symbol: OHLCV frame} -> {symbol: {field: float or None}} in one vectorized pass."""
+    symbols, panel = stack_panel(frames)
+    if not symbols: return {}
+    close, high, low, volume, dates, lengths = (panel[k] for k in ("close", "high", "low", "volume", "date", "length"))
+
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning) # all-NaN slices -> NaN is what we want
+        last_close = _last_valid(close)
+
+        # 52-week window by calendar date, relative to each symbol's own latest bar
+        last_date = dates[:, -1]
+        in_year = dates > (last_date - np.timedelta64(365, "D"))[:, None]
+        year_close = np.where(in_year, close, np.nan)
+        metrics = {
+            "previousClose": close[:, -2] if close.shape[1] >= 2 else np.full(len(symbols), np.nan),
+            "fiftyTwoWeekHigh": np.nanmax(np.where(in_year, high, np.nan), axis=1),
+            "fiftyTwoWeekLow": np.nanmin(np.where(in_year, low, np.nan), axis=1),
+            "fiftyTwoWeekChange": last_close / _first_valid(year_close) - 1,
+            "fiftyDayAverage": _full_mean(close, lengths, 50),
+            "twoHundredDayAverage": _full_mean(close, lengths, 200),
+            "averageVolume": _full_mean(volume, lengths, AVERAGE_VOLUME_WINDOW),
+            "averageVolume10days": _full_mean(volume, lengths, AVERAGE_VOLUME_SHORT_WINDOW),
+        }
+        for name, n in RETURN_HORIZONS.items():
+            base = close[:, -1 - n] if close.shape[1] > n else np.full(len(symbols), np.nan)
+            metrics[name] = last_close / base - 1
+
+        log_returns = np.diff(np.log(_window(close, VOLATILITY_WINDOW + 1)), axis=1)
+        enough = np.sum(~np.isnan(log_returns), axis=1) >= VOLATILITY_WINDOW // 2
+        metrics["volatility30d"] = np.where(enough, np.nanstd(log_returns, axis=1, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR), np.nan)
+
+    columns = {name: np.where(np.isfinite(values), values, np.nan).tolist() for name, values in metrics.items()}
+    return {
+        symbol: {name: (None if values[row] != values[row] else values[row]) for name, values in columns.items()}
+        for row, symbol in enumerate(symbols)
+    }
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CHART PYRAMIDS (multi-resolution chart files)
+# ==========================================
+# One symbol's daily history becomes a few small files, one per zoom level, so a
+# sparkline or a 1-month view no longer pulls the whole history:
+#   daily    the last DAILY_SESSIONS daily bars          (1D .. 3M views)
+#   weekly   one OHLCV bar per week                      (6M .. 2Y views)
+#   monthly  one OHLCV bar per calendar month            (5Y / MAX views)
+#   thumb    at most THUMBNAIL_POINTS closes             (sparklines)
+# Aggregate bars are dated by the last session they cover. Everything is computed
+# from the same frame: the aggregates in one groupby pass, the thumbnail in numpy.
+
+DAILY_SESSIONS = 66          # ~3 months of sessions
+THUMBNAIL_POINTS = 64
+WEEK_FREQ = "W-SAT"          # Sunday..Saturday weeks keep Sun-Thu and Mon-Fri exchanges in one bucket
+MONTH_FREQ = "M"
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+def _naive_index(df):
+    return df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+
+def aggregate_ohlcv(df, freq):
+    """Daily OHLCV -> one bar per `freq` period, indexed by the period's last session."""
+    if df.empty: return df
+    index = _naive_index(df)
+    keys = index.to_period(freq)
+    bars = df.groupby(keys, sort=True).agg(AGGREGATIONS)
+    bars.index = pd.DatetimeIndex(pd.Series(index, index=df.index).groupby(keys, sort=True).max().to_numpy())
+    return bars
+
+def downsample_minmax(dates, values, points=THUMBNAIL_POINTS):
+    """
+    Shape-preserving reduction to <= `points` samples: the first and last point plus the
+    min and max of each of (points - 2) // 2 equal buckets, in time order. Unlike plain
+    striding, spikes and troughs survive. NaN closes are dropped first.
+    """
+    dates = np.asarray(dates)
+    values = np.asarray(values, dtype=float)
+    keep = ~np.isnan(values)
+    dates, values = dates[keep], values[keep]
+    n = len(values)
+    if n <= points: return dates, values
+
+    inner = np.arange(1, n - 1)
+    bucket = (inner - 1) * max(1, (points - 2) // 2) // (n - 2)
+    order = np.lexsort((values[inner], bucket))       # by bucket, then value
+    starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) != 0])
+    ends = np.r_[starts[1:] - 1, len(order) - 1]
+    picks = np.unique(np.concatenate(([0], inner[order[starts]], inner[order[ends]], [n - 1])))
+    return dates[picks], values[picks]
+
+def build_pyramid(df, daily_sessions=DAILY_SESSIONS):
+    """{level: OHLCV frame} for the daily/weekly/monthly levels (the thumbnail comes from thumbnail())."""
+    return {
+        "daily": df.iloc[-daily_sessions:],
+        "weekly": aggregate_ohlcv(df, WEEK_FREQ),
+        "monthly": aggregate_ohlcv(df, MONTH_FREQ),
+    }
+
+def thumbnail(df, points=THUMBNAIL_POINTS):
+    """{"date": [...], "close": [...]} with at most `points` samples."""
+    dates, closes = downsample_minmax(_naive_index(df).strftime('%Y-%m-%d').to_numpy(), df["Close"].to_numpy(dtype=float), points)
+    return {"date": dates.tolist(), "close": closes.tolist()}
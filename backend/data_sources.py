@@ -0,0 +1,200 @@
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+import json
+import os
+import random
+import threading
+import time
+import pandas as pd
+
+# ==========================================
+# DATA SOURCES (history + profile providers)
+# ==========================================
+# ingest_master talks to market data only through a provider:
+#   download(symbols, period=, start=) -> yf.download-shaped frame (group_by='ticker')
+#   history(symbol, period=, start=)   -> single-symbol OHLCV frame
+#   info(symbol)                       -> profile metadata dict (.info)
+#   quotes(symbols)                    -> download()-shaped frame of the last few sessions only
+#                                         (latest bar = live price during the session)
+#
+# PUMP_PROVIDER selects the implementation:
+#   yfinance (default) - live Yahoo Finance
+#   record             - live Yahoo Finance, every response also saved to PUMP_FIXTURE_DIR
+#   replay             - serve saved fixtures only (no network), with simulated latency
+
+PROVIDER_NAME = os.environ.get('PUMP_PROVIDER', 'yfinance')
+FIXTURE_DIR = os.environ.get('PUMP_FIXTURE_DIR', 'tests/fixtures/yahoo')
+REPLAY_LATENCY_SECONDS = float(os.environ.get('PUMP_REPLAY_LATENCY', '0'))   # per simulated request
+REPLAY_JITTER = float(os.environ.get('PUMP_REPLAY_JITTER', '0.25'))           # +/- fraction of the latency
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+QUOTE_PERIOD = "5d"   # enough sessions to always hold the previous close across weekends/holidays
+
+class YFinanceProvider:
+    """Live Yahoo Finance via yfinance."""
+    name = "yfinance"
+
+    def __init__(self):
+        if yf is None:
+            raise ImportError("yfinance is not installed (pip install yfinance) - use PUMP_PROVIDER=replay offline")
+        # yf.download keeps its results in a module-level dict, so concurrent
+        # calls must not overlap. It already fans out internally (threads=True).
+        self._download_lock = threading.Lock()
+
+    def download(self, symbols, period="1y", start=None):
+        with self._download_lock:
+            if start is not None:
+                return yf.download(symbols, start=start, interval="1d", group_by='ticker', threads=True, progress=False)
+            return yf.download(symbols, period=period, interval="1d", group_by='ticker', threads=True, progress=False)
+
+    def history(self, symbol, period="1y", start=None):
+        if start is not None:
+            return yf.Ticker(symbol).history(start=start, interval="1d")
+        return yf.Ticker(symbol).history(period=period, interval="1d")
+
+    def info(self, symbol):
+        return yf.Ticker(symbol).info
+
+    def quotes(self, symbols):
+        # One batched request per call; yfinance keeps its HTTP session and crumb for the
+        # life of the process, so a long-running daemon skips the handshake on every tick
+        return self.download(symbols, period=QUOTE_PERIOD)
+
+class ReplayProvider:
+    """
+    Record/replay fixture store.
+    mode="record": forward to `upstream` and save every history/info response per symbol.
+    mode="replay": answer from the saved fixtures only, sleeping `latency` seconds
+    per request so pipeline throughput can be benchmarked without a network.
+    """
+    def __init__(self, fixture_dir=FIXTURE_DIR, mode="replay", upstream=None, latency=REPLAY_LATENCY_SECONDS, jitter=REPLAY_JITTER):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown ReplayProvider mode: {mode}")
+        self.fixture_dir = fixture_dir
+        self.mode = mode
+        self.upstream = upstream if upstream is not None or mode == "replay" else YFinanceProvider()
+        self.latency = latency
+        self.jitter = jitter
+        self.name = mode
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # ---- fixture files ----
+    def _path(self, symbol, kind):
+        safe_symbol = symbol.replace('^', '')
+        return os.path.join(self.fixture_dir, safe_symbol, f"{kind}.json")
+
+    def _write(self, symbol, kind, payload):
+        path = self._path(symbol, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding='utf-8') as f:
+            json.dump(payload, f, default=str)
+
+    def _read(self, symbol, kind):
+        try:
+            with open(self._path(symbol, kind), "r", encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            with self._lock: self.misses += 1
+            return None
+
+    def _save_history(self, symbol, df, start=None):
+        if df is None or df.empty: return
+        frame = df[[c for c in OHLCV_COLUMNS if c in df.columns]].astype(float)
+        frame.index = pd.to_datetime(frame.index.strftime('%Y-%m-%d'))
+        if start is not None:
+            # Delta download (incremental charts): splice onto what we already recorded
+            existing = self._load_history(symbol)
+            if not existing.empty:
+                frame = pd.concat([existing[existing.index < frame.index[0]], frame])
+        # Plain json keeps full float precision (DataFrame.to_json rounds); NaN -> null
+        self._write(symbol, "history", {
+            "index": frame.index.strftime('%Y-%m-%d').tolist(),
+            "columns": list(frame.columns),
+            "data": frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+        })
+
+    def _load_history(self, symbol, start=None):
+        payload = self._read(symbol, "history")
+        if not payload: return pd.DataFrame()
+        df = pd.DataFrame(payload["data"], index=pd.to_datetime(payload["index"]), columns=payload["columns"], dtype=float)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        return df
+
+    def _simulate_latency(self):
+        with self._lock: self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    # ---- provider interface ----
+    def download(self, symbols, period="1y", start=None):
+        if self.mode == "record":
+            data = self.upstream.download(symbols, period=period, start=start)
+            for symbol in symbols:
+                try:
+                    frame = data[symbol] if isinstance(data.columns, pd.MultiIndex) else data
+                except KeyError:
+                    continue
+                self._save_history(symbol, frame.dropna(how='all'), start)
+            return data
+
+        self._simulate_latency()
+        frames = {symbol: self._load_history(symbol, start) for symbol in symbols}
+        frames = {symbol: df for symbol, df in frames.items() if not df.empty}
+        if not frames: return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def history(self, symbol, period="1y", start=None):
+        if self.mode == "record":
+            df = self.upstream.history(symbol, period=period, start=start)
+            self._save_history(symbol, df, start)
+            return df
+
+        self._simulate_latency()
+        return self._load_history(symbol, start)
+
+    def info(self, symbol):
+        if self.mode == "record":
+            info = self.upstream.info(symbol)
+            self._write(symbol, "info", info)
+            return info
+
+        self._simulate_latency()
+        return self._read(symbol, "info") or {}
+
+    def quotes(self, symbols):
+        if self.mode == "record":
+            # Not saved: a 5-day frame would clobber the recorded year of history
+            return self.upstream.quotes(symbols)
+
+        self._simulate_latency()
+        frames = {symbol: self._load_history(symbol).tail(5) for symbol in symbols}
+        frames = {symbol: df for symbol, df in frames.items() if not df.empty}
+        if not frames: return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_provider():
+    """Process-wide provider selected by PUMP_PROVIDER."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if PROVIDER_NAME == "yfinance":
+                _provider = YFinanceProvider()
+            elif PROVIDER_NAME in ("record", "replay"):
+                _provider = ReplayProvider(mode=PROVIDER_NAME)
+            else:
+                raise ValueError(f"Unknown PUMP_PROVIDER: {PROVIDER_NAME}")
+        return _provider
+
+def set_provider(provider):
+    """Swap the active provider (tests, benchmarks, scripts)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
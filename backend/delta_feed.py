@@ -0,0 +1,165 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+# ==========================================
+# SNAPSHOT DELTA FEED
+# ==========================================
+# Polling clients shouldn't re-download every market when a few prices moved. Every run
+# that changes a market shard also emits public/data/deltas/<seq>.json with only what
+# changed per symbol since the previous run:
+#   {"seq": 42, "base": 41, "generatedAt": ..., "markets": {"SA": {"2222.SR": {"price": 27.9}, "4001.SR": null}}}
+# A changed symbol maps to its changed fields (a field that disappeared is null), a new
+# symbol to its full row, and a removed symbol to null.
+#
+# deltas/index.json keeps the last DELTA_RING_SIZE deltas. A client at sequence N applies
+# every listed delta with seq > N in order. If N < index["oldest"], it is too far behind
+# and reloads stocks.json; the shard manifest's deltaSeq says which sequence that snapshot is.
+#
+# The baseline a market is diffed against is its published shard (public/data/stocks/<code>.json)
+# as it was before this run overwrote it, read once per run on the market's first write. That
+# shard is only the state clients were brought to if the shard manifest still describes it
+# (its deltaSeq is the ring's seq and its sha1 for the market matches the shard). If not (a run
+# died between writing shards and publishing), the feed can't say what changed and publishes
+# a reset instead: the seq moves on with an empty ring, so every client reloads stocks.json.
+# Volatile keys (lastUpdated) never count as a change.
+#
+# DELTA_SNAPSHOT_DIR (gitignored .cache) keeps the last published baseline per market, tagged
+# with its seq, as a fast path: where it survives between runs (a long-lived host, the daemon)
+# and its seq is current, it is used instead of parsing the shard. CI runners start without it.
+
+DELTA_DIR = "public/data/deltas"
+DELTA_SNAPSHOT_DIR = os.environ.get('PUMP_DELTA_SNAPSHOT_DIR', '.cache/delta_snapshot')
+DELTA_RING_SIZE = int(os.environ.get('PUMP_DELTA_RING', '48')) # 48 one-minute quote ticks / ~2 days of hourly runs
+
+def _by_symbol(rows, volatile_keys):
+    return {row.get("symbol"): {k: v for k, v in row.items() if k not in volatile_keys} for row in rows}
+
+def diff_rows(previous, current):
+    """{symbol: row} before/after -> {symbol: changed fields, full row (new) or None (removed)}."""
+    changes = {}
+    for symbol, row in current.items():
+        old = previous.get(symbol)
+        if old is None:
+            changes[symbol] = row
+            continue
+        fields = {k: v for k, v in row.items() if k not in old or old[k] != v}
+        fields.update({k: None for k in old if k not in row})
+        if fields: changes[symbol] = fields
+    for symbol in previous:
+        if symbol not in current: changes[symbol] = None
+    return changes
+
+class DeltaFeed:
+    """Collects per-market changes during a run; publish() writes the delta, the ring index and the new snapshot."""
+    def __init__(self, delta_dir=DELTA_DIR, snapshot_dir=DELTA_SNAPSHOT_DIR, ring_size=DELTA_RING_SIZE, volatile_keys=()):
+        self.delta_dir = delta_dir
+        self.snapshot_dir = snapshot_dir
+        self.ring_size = ring_size
+        self.volatile_keys = volatile_keys
+        self.index_path = os.path.join(delta_dir, "index.json")
+        try:
+            with open(self.index_path, "r", encoding='utf-8') as f:
+                index = json.load(f)
+        except Exception:
+            index = {}
+        self.seq = index.get("seq", 0)
+        self.ring = index.get("deltas", [])
+        self.changes = {}
+        self.snapshots = {}
+        self.baselines = {}
+        self.reset = False
+
+    def _snapshot_path(self, code):
+        return os.path.join(self.snapshot_dir, f"{code}.json")
+
+    def _load_snapshot(self, code):
+        """The cached baseline, if it was saved at the current seq (None otherwise)."""
+        try:
+            with open(self._snapshot_path(code), "r", encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception:
+            return None
+        return snapshot.get("symbols") if snapshot.get("seq") == self.seq else None
+
+    def capture(self, code, load_published):
+        """
+        Remember a market's baseline before its shard is first overwritten this run.
+        load_published() returns (published rows or None if the market has no shard yet,
+        whether those rows are the state as of this feed's seq).
+        """
+        if code in self.baselines: return
+        baseline = self._load_snapshot(code)
+        if baseline is None:
+            rows, current = load_published()
+            if rows is not None and not current:
+                self.reset = True # The shard isn't the state the ring ends at
+            baseline = _by_symbol(rows or [], self.volatile_keys)
+        self.baselines[code] = baseline
+
+    def release(self, code):
+        """Forget a captured baseline (the market's shard didn't change)."""
+        self.baselines.pop(code, None)
+
+    def diff_market(self, code, rows):
+        """Compare a market's (JSON round-tripped) rows with its baseline. Returns the number of symbols changed."""
+        current = _by_symbol(rows, self.volatile_keys)
+        previous = self.baselines.pop(code, None)
+        if previous is None: previous = self._load_snapshot(code) or {}
+        changes = diff_rows(previous, current)
+        self.snapshots[code] = current
+        if changes: self.changes[code] = changes
+        return len(changes)
+
+    def _save_snapshot(self, code, snapshot):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, prefix=".tmp-", suffix=".json")
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            json.dump({"seq": self.seq, "symbols": snapshot}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self._snapshot_path(code))
+
+    def publish(self, writer, aliases=None):
+        """
+        Write delta seq+1 (if anything changed) through `writer` (an ArtifactWriter), update the
+        ring index and drop deltas that fell out of it. Returns the current sequence number.
+        After a reset, seq+1 is published with an empty ring instead (clients reload stocks.json).
+        """
+        if self.reset:
+            self.seq += 1
+            for entry in self.ring:
+                writer.remove(os.path.join(os.path.dirname(self.delta_dir), entry["path"]))
+            self.ring = []
+            print(f"🔺 Delta feed reset at {self.seq}: the published shards were ahead of the ring; clients reload the snapshot")
+        elif self.changes:
+            self.seq += 1
+            path = os.path.join(self.delta_dir, f"{self.seq}.json")
+            delta = {
+                "seq": self.seq,
+                "base": self.seq - 1,
+                "generatedAt": datetime.now(timezone.utc).isoformat(),
+                "markets": self.changes
+            }
+            if aliases: delta["aliases"] = aliases # e.g. Global mirrors US: apply US's changes to it too
+            writer.write(path, delta, ensure_ascii=False, separators=(",", ":"))
+            self.ring.append({
+                "seq": self.seq,
+                "path": os.path.relpath(path, os.path.dirname(self.delta_dir)),
+                "bytes": os.path.getsize(path),
+                "symbols": sum(len(changes) for changes in self.changes.values())
+            })
+            for entry in self.ring[:-self.ring_size]:
+                writer.remove(os.path.join(os.path.dirname(self.delta_dir), entry["path"]))
+            self.ring = self.ring[-self.ring_size:]
+            print(f"🔺 Delta {self.seq}: {self.ring[-1]['symbols']} symbols changed ({self.ring[-1]['bytes'] / 1024:.1f} KB)")
+
+        writer.write(self.index_path, {
+            "seq": self.seq,
+            "oldest": self.ring[0]["seq"] - 1 if self.ring else self.seq,
+            "deltas": self.ring
+        }, indent=None)
+        # Snapshots last: a crash before this only makes the next delta repeat these changes
+        for code, snapshot in self.snapshots.items():
+            self._save_snapshot(code, snapshot)
+        self.changes, self.snapshots, self.baselines, self.reset = {}, {}, {}, False
+        return self.seq
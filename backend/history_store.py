@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# PACKED PRICE HISTORY STORE
+# ==========================================
+# Every symbol's daily OHLCV bars live in one set of contiguous per-field arrays:
+#
+#   <store>/date.npy    datetime64[D]
+#   <store>/open.npy    float64      (same for high / low / close / volume)
+#   <store>/index.json  {"SYMBOL": [offset, length], ...}
+#
+# Symbol slices are sorted by symbol and by date within a symbol. Arrays are
+# opened with np.load(mmap_mode='r'), so reading a symbol touches only the pages
+# it needs and copies nothing until you ask for a frame.
+#
+# The store is the pump's own history: incremental runs merge new bars onto it, and
+# the chart JSON files are an export of it (`ingest_master.py --export-charts`
+# rewrites them from the store without touching the network).
+#
+# A run stages thousands of frames before its single commit(). spill() (called as each
+# market's shard is written) packs the frames staged so far into a segment with the same
+# layout under <store>.spill-<pid>/ and drops them from memory, so the run holds one
+# market's worth of frames at a time; commit() reads the segments back through mmaps.
+
+HISTORY_STORE_DIR = os.environ.get('PUMP_HISTORY_STORE', '.cache/history')
+
+FIELDS = ("open", "high", "low", "close", "volume")
+COLUMN_OF = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+def _load_packed(path):
+    """(index, {field: mmap}) for a packed directory; ({}, {}) if it isn't there."""
+    try:
+        with open(os.path.join(path, "index.json"), "r") as f:
+            index = json.load(f)
+        arrays = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r') for field in ("date",) + FIELDS}
+    except (OSError, ValueError):
+        return {}, {}
+    return index, arrays
+
+def _write_packed(path, symbols, views_of):
+    """Pack views_of(symbol) -> {field: array} for every symbol, in order, into `path`."""
+    columns = {field: [] for field in ("date",) + FIELDS}
+    index = {}
+    offset = 0
+    for symbol in symbols:
+        views = views_of(symbol)
+        for field in ("date",) + FIELDS:
+            columns[field].append(np.asarray(views[field]))
+        length = len(views["date"])
+        index[symbol] = [offset, length]
+        offset += length
+    os.makedirs(path)
+    for field, parts in columns.items():
+        dtype = 'datetime64[D]' if field == "date" else np.float64
+        packed = np.concatenate(parts).astype(dtype) if parts else np.array([], dtype=dtype)
+        np.save(os.path.join(path, f"{field}.npy"), packed)
+    with open(os.path.join(path, "index.json"), "w") as f:
+        json.dump(index, f)
+
+def _frame_views(frame):
+    views = {field: frame[COLUMN_OF[field]].to_numpy(dtype=float) for field in FIELDS}
+    views["date"] = frame.index.values.astype('datetime64[D]')
+    return views
+
+def _views_frame(views):
+    return pd.DataFrame({COLUMN_OF[field]: views[field] for field in FIELDS}, index=pd.DatetimeIndex(views["date"]))
+
+class HistoryStore:
+    """Memory-mapped columnar OHLCV store. stage() new frames during a run, spill() per market, commit() once at the end."""
+    def __init__(self, path=HISTORY_STORE_DIR):
+        self.path = path
+        self.index = {}
+        self.arrays = {}
+        self.staged = {}
+        self.spilled = {} # symbol -> (segment arrays, offset, length)
+        self.segments = 0
+        self.lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self.index, self.arrays = _load_packed(self.path)
+
+    def _spill_dir(self):
+        return f"{self.path}.spill-{os.getpid()}"
+
+    # ---- reads ----
+    def symbols(self):
+        with self.lock:
+            return sorted(set(self.index) | set(self.spilled) | set(self.staged))
+
+    def slices(self, symbol):
+        """Zero-copy {field: array view} for one committed symbol (None if absent)."""
+        loc = self.index.get(symbol)
+        if loc is None: return None
+        offset, length = loc
+        return {field: arr[offset:offset + length] for field, arr in self.arrays.items()}
+
+    def _staged_views(self, symbol):
+        """{field: array} for a symbol staged this run, in memory or spilled (None if not staged). Hold the lock."""
+        staged = self.staged.get(symbol)
+        if staged is not None: return _frame_views(staged)
+        spilled = self.spilled.get(symbol)
+        if spilled is None: return None
+        arrays, offset, length = spilled
+        return {field: arr[offset:offset + length] for field, arr in arrays.items()}
+
+    def get(self, symbol):
+        """OHLCV DataFrame for a symbol (staged data wins over committed). None if unknown."""
+        with self.lock:
+            staged = self.staged.get(symbol)
+            views = None if staged is not None else self._staged_views(symbol)
+        if staged is not None: return staged
+        if views is None: views = self.slices(symbol)
+        if views is None: return None
+        return _views_frame(views)
+
+    # ---- writes ----
+    def stage(self, symbol, df):
+        """Queue a symbol's latest full history for the next commit(). Returns the normalized frame."""
+        frame = pd.DataFrame(
+            {COLUMN_OF[field]: pd.to_numeric(df[COLUMN_OF[field]], errors='coerce').to_numpy(dtype=float) for field in FIELDS},
+            index=pd.DatetimeIndex(pd.to_datetime(df.index.strftime('%Y-%m-%d')))
+        )
+        frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+        with self.lock:
+            self.staged[symbol] = frame
+        return frame
+
+    def spill(self):
+        """Move every frame staged so far out of memory into a packed spill segment. Returns how many."""
+        with self.lock:
+            if not self.staged: return 0
+            if self.segments == 0: shutil.rmtree(self._spill_dir(), ignore_errors=True)
+            segment = os.path.join(self._spill_dir(), str(self.segments))
+            symbols = sorted(self.staged)
+            _write_packed(segment, symbols, lambda symbol: _frame_views(self.staged[symbol]))
+            self.segments += 1
+            index, arrays = _load_packed(segment)
+            for symbol in symbols:
+                offset, length = index[symbol]
+                self.spilled[symbol] = (arrays, offset, length)
+            self.staged = {}
+            return len(symbols)
+
+    def commit(self):
+        """Repack committed + staged (in memory or spilled) symbols into fresh arrays and swap them in atomically."""
+        with self.lock:
+            if not self.staged and not self.spilled: return 0
+            symbols = sorted(set(self.index) | set(self.spilled) | set(self.staged))
+            tmp_dir = f"{self.path}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            _write_packed(tmp_dir, symbols, lambda symbol: self._staged_views(symbol) or self.slices(symbol))
+
+            # Swap directories; readers holding the old mmaps keep valid pages until they close them
+            old_dir = f"{self.path}.old-{os.getpid()}"
+            if os.path.exists(self.path): os.replace(self.path, old_dir)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            os.replace(tmp_dir, self.path)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+            committed = len(set(self.staged) | set(self.spilled))
+            self.staged, self.spilled, self.segments = {}, {}, 0
+            shutil.rmtree(self._spill_dir(), ignore_errors=True)
+            self._open()
+            return committed
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_history_store():
+    """Process-wide HistoryStore."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -1,132 +1,948 @@
-import yfinance as yf
 try:
     import psycopg2
     from psycopg2.extras import execute_values
 except ImportError:
     psycopg2 = None
 import json
+import math
+from math import isfinite
 import time
 import os
 import random
-from datetime import datetime, timezone
+import threading
+import hashlib
+import tempfile
+import io
+import csv
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 import pandas as pd
 import numpy as np
+from data_sources import get_provider
+from history_store import get_history_store
+from analytics import compute_analytics
+from chart_pyramid import build_pyramid, thumbnail
+from symbol_registry import SymbolRegistry
+from delta_feed import DeltaFeed, DELTA_DIR, DELTA_SNAPSHOT_DIR
+from precompress import precompress, update_manifest, summarize, available_formats, load_manifest as load_compression_manifest
+from pump_metrics import get_metrics, reset_metrics, SamplingProfiler, PROFILE_OUTPUT_PATH
 
 # ==========================================
 # 1. MARKET CATALOG
 # ==========================================
 
-SAUDI_STOCKS = [
-    '2222.SR', '1120.SR', '2010.SR', '7010.SR', '2082.SR', '1180.SR',
-    '2380.SR', '4030.SR', '2350.SR', '4200.SR', '1211.SR', '4001.SR',
-    '2310.SR', '4003.SR', '2050.SR', '1150.SR', '4190.SR', '2290.SR',
-    '4002.SR', '1010.SR', '2020.SR', '2280.SR', '5110.SR', '1140.SR',
-    '1060.SR', '7200.SR', '4220.SR', '4090.SR', '4040.SR', '^TASI.SR'
-]
-
-EGYPT_STOCKS = [
-    'COMI.CA', 'EAST.CA', 'HRHO.CA', 'TMGH.CA', 'SWDY.CA', 'ETEL.CA',
-    'AMOC.CA', 'EKHO.CA', 'HELI.CA', 'ORAS.CA', 'ESRS.CA', 'ABUK.CA',
-    'MFPC.CA', 'ISPH.CA', 'PHDC.CA', 'AUTO.CA', 'CIEB.CA', 'FWRY.CA',
-    'ADIB.CA', '^CASE30'
-]
-
-US_STOCKS = [
-    '^GSPC', '^DJI', '^IXIC',
-    'AAPL', 'MSFT', 'GOOG', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX', 'AMD', 'INTC',
-    'JPM', 'V', 'MA', 'WMT', 'HD', 'PG', 'KO', 'PEP', 'DIS', 'NKE', 'BRK-B', 'LLY'
-]
+# Symbols, flags and the Global -> US alias live in data/symbol_registry.json (see symbol_registry.py).
+# A symbol listed by several markets is downloaded once and its row fanned out to each of them.
 
-INDIA_STOCKS = ['^NSEI', 'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS', 'HINDUNILVR.NS', 'ITC.NS', 'SBIN.NS', 'BHARTIARTL.NS', 'LICI.NS']
-UK_STOCKS = ['^FTSE', 'AZN.L', 'SHEL.L', 'HSBA.L', 'ULVR.L', 'BP.L', 'DGE.L', 'RIO.L', 'GSK.L', 'GLEN.L']
-GERMANY_STOCKS = ['^GDAXI', 'SAP.DE', 'SIE.DE', 'ALV.DE', 'DTE.DE', 'AIR.DE', 'BMW.DE', 'VOW3.DE', 'BAS.DE', 'ADS.DE']
-FRANCE_STOCKS = ['^FCHI', 'MC.PA', 'OR.PA', 'TTE.PA', 'SAN.PA', 'AIR.PA', 'RMS.PA', 'SU.PA', 'EL.PA', 'KER.PA']
-JAPAN_STOCKS = ['^N225', '7203.T', '6758.T', '9984.T', '6861.T', '8306.T', '9432.T', '7974.T', '6098.T', '4063.T']
-CANADA_STOCKS = ['^GSPTSE', 'RY.TO', 'TD.TO', 'SHOP.TO', 'ENB.TO', 'CNR.TO', 'CP.TO', 'BMO.TO', 'BNS.TO', 'TRP.TO']
-AUSTRALIA_STOCKS = ['^AXJO', 'BHP.AX', 'CBA.AX', 'CSL.AX', 'NAB.AX', 'WBC.AX', 'ANZ.AX', 'FMG.AX', 'WDS.AX', 'TLS.AX']
-HK_STOCKS = ['^HSI', '0700.HK', '9988.HK', '0939.HK', '1299.HK', '0941.HK', '3690.HK', '0005.HK', '0388.HK']
-SWISS_STOCKS = ['^SSMI', 'NESN.SW', 'ROG.SW', 'NOVN.SW', 'UBSG.SW', 'ABBN.SW', 'CFR.SW', 'ZURN.SW', 'LONN.SW']
-NETHERLANDS_STOCKS = ['^AEX', 'ASML.AS', 'UNA.AS', 'SHELL.AS', 'HEIA.AS', 'INGA.AS', 'PHIA.AS', 'ADYEN.AS', 'DSFIR.AS']
-SPAIN_STOCKS = ['^IBEX', 'ITX.MC', 'IBE.MC', 'BBVA.MC', 'SAN.MC', 'AMS.MC', 'TEF.MC', 'REP.MC', 'CLNX.MC']
-ITALY_STOCKS = ['FTSEMIB.MI', 'ENEL.MI', 'ISP.MI', 'STLAM.MI', 'ENI.MI', 'UCG.MI', 'RACE.MI', 'G.MI', 'MB.MI']
-BRAZIL_STOCKS = ['^BVSP', 'PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'PETR3.SA', 'ABEV3.SA', 'WEGE3.SA', 'BBAS3.SA']
-MEXICO_STOCKS = ['^MXX', 'WALMEX.MX', 'AMX.MX', 'FEMSAUBD.MX', 'GMEXICOB.MX', 'BIMBOA.MX', 'CEMEXCPO.MX', 'TLEVISACPO.MX']
-KOREA_STOCKS = ['^KS11', '005930.KS', '000660.KS', '005380.KS', '207940.KS', '051910.KS', '005490.KS']
-TAIWAN_STOCKS = ['^TWII', '2330.TW', '2317.TW', '2454.TW', '2308.TW', '2382.TW', '2881.TW']
-SINGAPORE_STOCKS = ['^STI', 'D05.SI', 'O39.SI', 'U11.SI', 'Z74.SI', 'C52.SI']
-UAE_STOCKS = ['EMAAR.AE', 'FAB.AD', 'ETISALAT.AD', 'ALDAR.AE', 'DIB.AE', 'EMIRATESNBD.AE', 'TAQA.AD']
-SOUTH_AFRICA_STOCKS = ['JSE.JO', 'NPN.JO', 'FSR.JO', 'SBK.JO', 'ABG.JO', 'SOL.JO', 'MTN.JO']
-QATAR_STOCKS = ['QNBK.QA', 'IQCD.QA', 'QIBK.QA', 'CBQK.QA', 'MARK.QA']
-
-MARKET_MAPPING = {
-    'SA': SAUDI_STOCKS, 'EG': EGYPT_STOCKS, 'US': US_STOCKS, 'Global': US_STOCKS,
-    'IN': INDIA_STOCKS, 'UK': UK_STOCKS, 'DE': GERMANY_STOCKS, 'FR': FRANCE_STOCKS,
-    'JP': JAPAN_STOCKS, 'CA': CANADA_STOCKS, 'AU': AUSTRALIA_STOCKS, 'HK': HK_STOCKS,
-    'CH': SWISS_STOCKS, 'NL': NETHERLANDS_STOCKS, 'ES': SPAIN_STOCKS, 'IT': ITALY_STOCKS,
-    'BR': BRAZIL_STOCKS, 'MX': MEXICO_STOCKS, 'KR': KOREA_STOCKS, 'TW': TAIWAN_STOCKS,
-    'SG': SINGAPORE_STOCKS, 'AE': UAE_STOCKS, 'ZA': SOUTH_AFRICA_STOCKS, 'QA': QATAR_STOCKS
+# Regular sessions: (exchange timezone, open, close, trading weekdays with Mon=0).
+# Exchange holidays and lunch breaks are not modeled; a closed-day run just refreshes nothing new.
+SUN_THU = (6, 0, 1, 2, 3)
+MON_FRI = (0, 1, 2, 3, 4)
+TRADING_CALENDAR = {
+    'SA': ('Asia/Riyadh', '10:00', '15:00', SUN_THU),
+    'EG': ('Africa/Cairo', '10:00', '14:30', SUN_THU),
+    'US': ('America/New_York', '09:30', '16:00', MON_FRI),
+    'IN': ('Asia/Kolkata', '09:15', '15:30', MON_FRI),
+    'UK': ('Europe/London', '08:00', '16:30', MON_FRI),
+    'DE': ('Europe/Berlin', '09:00', '17:30', MON_FRI),
+    'FR': ('Europe/Paris', '09:00', '17:30', MON_FRI),
+    'JP': ('Asia/Tokyo', '09:00', '15:30', MON_FRI),
+    'CA': ('America/Toronto', '09:30', '16:00', MON_FRI),
+    'AU': ('Australia/Sydney', '10:00', '16:00', MON_FRI),
+    'HK': ('Asia/Hong_Kong', '09:30', '16:00', MON_FRI),
+    'CH': ('Europe/Zurich', '09:00', '17:30', MON_FRI),
+    'NL': ('Europe/Amsterdam', '09:00', '17:30', MON_FRI),
+    'ES': ('Europe/Madrid', '09:00', '17:30', MON_FRI),
+    'IT': ('Europe/Rome', '09:00', '17:30', MON_FRI),
+    'BR': ('America/Sao_Paulo', '10:00', '17:00', MON_FRI),
+    'MX': ('America/Mexico_City', '08:30', '15:00', MON_FRI),
+    'KR': ('Asia/Seoul', '09:00', '15:30', MON_FRI),
+    'TW': ('Asia/Taipei', '09:00', '13:30', MON_FRI),
+    'SG': ('Asia/Singapore', '09:00', '17:00', MON_FRI),
+    'AE': ('Asia/Dubai', '10:00', '15:00', MON_FRI),
+    'ZA': ('Africa/Johannesburg', '09:00', '17:00', MON_FRI),
+    'QA': ('Asia/Qatar', '09:30', '13:15', SUN_THU),
 }
+TRADING_CALENDAR['Global'] = TRADING_CALENDAR['US']
 
-COUNTRY_FLAGS = {
-    'SA': '🇸🇦', 'EG': '🇪🇬', 'US': '🇺🇸', 'IN': '🇮🇳', 'UK': '🇬🇧',
-    'DE': '🇩🇪', 'FR': '🇫🇷', 'JP': '🇯🇵', 'CA': '🇨🇦', 'AU': '🇦🇺',
-    'HK': '🇭🇰', 'CH': '🇨🇭', 'NL': '🇳🇱', 'ES': '🇪🇸', 'IT': '🇮🇹',
-    'BR': '🇧🇷', 'MX': '🇲🇽', 'KR': '🇰🇷', 'TW': '🇹🇼', 'SG': '🇸🇬',
-    'AE': '🇦🇪', 'ZA': '🇿🇦', 'QA': '🇶🇦'
-}
+REGISTRY = SymbolRegistry.load(timezones={code: tz for code, (tz, _, _, _) in TRADING_CALENDAR.items()})
+MARKET_MAPPING = REGISTRY.mapping()
+COUNTRY_FLAGS = REGISTRY.flags()
 
 # ==========================================
 # 2. INGESTION ENGINE
 # ==========================================
 
+BATCH_SIZE = 8   # starting batch size; AdaptiveScheduler grows/shrinks it from here
+
+# Adaptive scheduling: grow batches and shrink delays while Yahoo answers cleanly,
+# back off exponentially (with jitter) on throttling or empty frames.
+MIN_BATCH_SIZE = 2
+MAX_BATCH_SIZE = 32
+BATCH_DELAY_SECONDS = 2.0       # starting inter-batch delay (the old fixed sleep)
+MIN_BATCH_DELAY_SECONDS = 0.25
+MAX_BATCH_DELAY_SECONDS = 60.0
+THROTTLE_EMPTY_RATIO = 0.5      # share of empty frames in a batch that counts as throttling
+MAX_FETCH_ROUNDS = 2            # batched rounds before failed symbols go to the recovery phase
+
+# Recovery phase: symbols still missing after the batched rounds get one parallel pass
+# of batched full-year downloads across all markets, capped by a wall-clock budget.
+RETRY_WORKERS = 8
+RETRY_BUDGET_SECONDS = float(os.environ.get('PUMP_RETRY_BUDGET', '90'))
+RUN_REPORT_PATH = "public/data/pump_report.json"
+
+# Concurrent mode: PUMP_WORKERS > 1 runs markets and batches on a bounded pool.
+# Every Yahoo request shares one token bucket instead of sleeping per batch.
+PUMP_WORKERS = int(os.environ.get('PUMP_WORKERS', '1'))
+YAHOO_HOST = 'query2.finance.yahoo.com'
+HOST_RATE_LIMITS = {
+    YAHOO_HOST: float(os.environ.get('PUMP_YAHOO_RPS', '4')), # requests / second
+}
+
+# Incremental charts: PUMP_INCREMENTAL=1 downloads only the bars after the last
+# stored date (plus an overlap window to catch revisions) and merges them in.
+INCREMENTAL_CHARTS = os.environ.get('PUMP_INCREMENTAL', '0') == '1'
+CHART_DIR = "public/data/charts"
+CHART_OVERLAP_DAYS = 7           # calendar days re-downloaded before the last stored bar
+CHART_MAX_DELTA_DAYS = 30        # older histories are cheaper to refetch whole
+CHART_REVISION_TOLERANCE = 1e-3  # relative close mismatch that signals a split/adjustment
+
+# PUMP_CHART_COLUMNAR=1 also writes {"date": [...], "close": [...], ...} charts (much smaller)
+CHART_COLUMNAR = os.environ.get('PUMP_CHART_COLUMNAR', '0') == '1'
+CHART_COLUMNAR_DIR = "public/data/charts_columnar"
+
+# Chart pyramids: per-symbol daily (last ~3 months) / weekly / monthly / thumbnail files
+# under CHART_PYRAMID_DIR/<level>/<symbol>.json, columnar and compact, for small clients.
+CHART_PYRAMID = os.environ.get('PUMP_CHART_PYRAMID', '1') == '1'
+CHART_PYRAMID_DIR = "public/data/charts_pyramid"
+
+# Profile cache: .info metadata is reused across runs until its field group expires.
+PROFILE_CACHE_ENABLED = os.environ.get('PUMP_PROFILE_CACHE', '1') == '1'
+PROFILE_CACHE_PATH = os.environ.get('PUMP_PROFILE_CACHE_PATH', '.cache/profile_info.json')
+PROFILE_CACHE_MAX_ENTRIES = 2000
+PROFILE_TTL_SECONDS = {
+    'static': 7 * 86400,       # names, description, sector, employees, website...
+    'fundamentals': 86400,     # statements, margins, share counts
+    'analyst': 86400,          # recommendations & price targets
+    'market': 6 * 3600,        # price-derived stats (market cap, PE, yields, ranges)
+}
+PROFILE_FIELD_GROUPS = {
+    'static': [
+        'longName', 'shortName', 'longBusinessSummary', 'sector', 'industry', 'fullTimeEmployees',
+        'website', 'city', 'country', 'currency', 'exchange'
+    ],
+    'fundamentals': [
+        'trailingEps', 'epsTrailingTwelveMonths', 'dividendRate', 'trailingAnnualDividendRate',
+        'payoutRatio', 'lastDividendValue', 'lastDividendDate', 'profitMargins', 'sharesOutstanding',
+        'floatShares', 'sharesShort', 'shortRatio', 'heldPercentInstitutions', 'heldPercentInsiders',
+        'totalRevenue', 'revenuePerShare', 'revenueGrowth', 'grossProfits', 'grossMargins',
+        'operatingMargins', 'ebitda', 'ebitdaMargins', 'netIncomeToCommon', 'earningsGrowth',
+        'returnOnEquity', 'returnOnAssets', 'operatingCashflow', 'freeCashflow', 'totalCash',
+        'totalCashPerShare', 'totalDebt', 'debtToEquity', 'currentRatio', 'quickRatio', 'bookValue'
+    ],
+    'analyst': [
+        'recommendationMean', 'recommendationKey', 'numberOfAnalystOpinions', 'targetLowPrice',
+        'targetMeanPrice', 'targetMedianPrice', 'targetHighPrice', 'recommendationTrend'
+    ],
+    # 'market' holds every other key
+}
+
+# Artifact writer: unchanged files (ignoring volatile timestamps) are not rewritten;
+# changed ones are written via temp file + rename and listed in CHANGES_MANIFEST_PATH.
+# An unchanged file keeps the lastUpdated of its last real rewrite, so when each artifact
+# written with volatile keys was last regenerated is kept in ARTIFACT_FETCHED_PATH
+# (audit_lake.py --full judges profile freshness by it).
+ARTIFACT_HASHES_PATH = '.cache/artifact_hashes.json'
+ARTIFACT_FETCHED_PATH = '.cache/artifact_fetched.json'
+CHANGES_MANIFEST_PATH = 'public/data/changes.json'
+VOLATILE_KEYS = ('lastUpdated',)
+
+# Pre-compressed siblings (.gz/.br, see precompress.py) for every artifact changed in a run;
+# per-file raw and compressed sizes are kept in PRECOMPRESS_MANIFEST_PATH.
+PRECOMPRESS = os.environ.get('PUMP_PRECOMPRESS', '1') == '1'
+PRECOMPRESS_MANIFEST_PATH = 'public/data/compression.json'
+
+# Checkpoint journal: each finished batch appends its rows to JOURNAL_PATH (one fsynced
+# JSON line), so a run that dies loses only its in-flight batches. --resume restores the
+# journaled rows, fetches only what's missing, and a completed run deletes the journal.
+JOURNAL_PATH = os.environ.get('PUMP_JOURNAL_PATH', '.cache/pump_journal.jsonl')
+
+# stocks.json shards: one file per market under STOCKS_SHARD_DIR, written as each market
+# finishes, plus STOCKS_SHARD_DIR/manifest.json. The combined stocks.json is still
+# produced (streamed from the shards) unless PUMP_STOCKS_COMBINED=0.
+STOCKS_SHARD_DIR = "public/data/stocks"
+STOCKS_COMBINED_PATH = "public/data/stocks.json"
+STOCKS_COMBINED = os.environ.get('PUMP_STOCKS_COMBINED', '1') == '1'
+
+# Delta feed (see delta_feed.py): each finish() that changed a shard also writes a
+# sequence-numbered public/data/deltas/<seq>.json of just the changed fields, so polling
+# clients can catch up without re-downloading stocks.json.
+DELTA_FEED = os.environ.get('PUMP_DELTA_FEED', '1') == '1'
+
+# Selective refresh (--only-open): a market still counts as open this long after its close,
+# so the run right after the bell picks up the final bars
+MARKET_CLOSE_GRACE_MINUTES = int(os.environ.get('PUMP_CLOSE_GRACE_MINUTES', '30'))
+
+# Daemon mode (--daemon): one long-lived process (warm HTTP session, DB connection, history
+# store and profile cache) refreshing three tiers on their own cadence:
+#   quote   - price/change for open markets every DAEMON_QUOTE_INTERVAL (batched 5-day bars)
+#   history - the full pump for a market once its session (+ grace window) has closed
+#   profile - .info sweep into the profile cache every DAEMON_PROFILE_INTERVAL, on its own thread
+# Quotes and profiles get their own worker pool and request budget; the history tier uses
+# PUMP_WORKERS and HOST_RATE_LIMITS like a one-shot run.
+DAEMON_QUOTE_INTERVAL = float(os.environ.get('PUMP_DAEMON_QUOTE_INTERVAL', '60'))
+DAEMON_QUOTE_WORKERS = int(os.environ.get('PUMP_DAEMON_QUOTE_WORKERS', '2'))
+DAEMON_QUOTE_RPS = float(os.environ.get('PUMP_DAEMON_QUOTE_RPS', '1'))
+DAEMON_QUOTE_BATCH_SIZE = 50
+DAEMON_PROFILE_INTERVAL = float(os.environ.get('PUMP_DAEMON_PROFILE_INTERVAL', str(86400)))
+DAEMON_PROFILE_WORKERS = int(os.environ.get('PUMP_DAEMON_PROFILE_WORKERS', '2'))
+DAEMON_PROFILE_RPS = float(os.environ.get('PUMP_DAEMON_PROFILE_RPS', '0.5'))
+DAEMON_STATE_PATH = '.cache/daemon_state.json'
+QUOTE_FIELDS = ("price", "change", "changePercent", "volume", "previousClose")
+
+_needs_full_history = set()   # symbols whose incremental merge hit a gap/split this run (reset by main())
+_journal = None               # CheckpointJournal of the run in progress (None outside main())
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursting to `burst`."""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveScheduler:
+    """
+    AIMD-style batch scheduler. Healthy batches add to the batch size and trim
+    the delay; throttled batches halve the size and double the delay (plus jitter).
+    When a shared RateLimiter is attached its rate follows the same signal.
+    """
+    def __init__(self, batch_size=BATCH_SIZE, delay=BATCH_DELAY_SECONDS, limiter=None):
+        self.batch_size = batch_size
+        self.delay = delay
+        self.limiter = limiter
+        self.base_rate = limiter.rate if limiter else None
+        self.throttle_events = 0
+        self.backoff_until = 0.0
+        self.lock = threading.Lock()
+
+    def on_success(self):
+        with self.lock:
+            self.batch_size = min(MAX_BATCH_SIZE, self.batch_size + 2)
+            self.delay = max(MIN_BATCH_DELAY_SECONDS, self.delay * 0.75)
+            if self.limiter: self.limiter.rate = min(self.base_rate, self.limiter.rate * 1.25)
+
+    def on_throttle(self):
+        """Shrink the schedule and sleep out the backoff window. Returns True (the caller has already waited)."""
+        with self.lock:
+            now = time.monotonic()
+            # Parallel workers hitting the same throttle window count as one event
+            if now >= self.backoff_until:
+                self.throttle_events += 1
+                self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+                self.delay = min(MAX_BATCH_DELAY_SECONDS, self.delay * 2)
+                if self.limiter: self.limiter.rate = max(self.base_rate / 16, self.limiter.rate / 2)
+                self.backoff_until = now + self.delay
+                print(f"🐢 Throttled: batch size -> {self.batch_size}, backing off {self.delay:.1f}s")
+            backoff = self.backoff_until - now
+        self.wait(backoff)
+        return True
+
+    def record(self, batch, failed):
+        """Feed one batch outcome back into the schedule. Returns True if it throttled (and backed off)."""
+        if batch and len(failed) / len(batch) >= THROTTLE_EMPTY_RATIO:
+            return self.on_throttle()
+        self.on_success()
+        return False
+
+    def wait(self, seconds=None):
+        if seconds is None: seconds = self.delay
+        time.sleep(seconds * random.uniform(0.5, 1.5))
+
+def is_throttle_error(e):
+    """yfinance surfaces throttling as YFRateLimitError or HTTP 429 text depending on version."""
+    text = f"{type(e).__name__} {e}".lower()
+    return 'ratelimit' in text or 'rate limit' in text or 'too many requests' in text or '429' in text
+
+def get_rate_limiter(host):
+    """One shared limiter per upstream host."""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter(HOST_RATE_LIMITS.get(host, 2.0))
+        return _rate_limiters[host]
+
+class ProfileCache:
+    """
+    Persistent per-symbol cache of yfinance .info dicts.
+    Each field group carries its own fetch timestamp and TTL; an entry is fresh
+    while every group it has seen is within TTL. Least recently used entries are
+    evicted past `max_entries`.
+    """
+    def __init__(self, path=PROFILE_CACHE_PATH, max_entries=PROFILE_CACHE_MAX_ENTRIES, ttls=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls or PROFILE_TTL_SECONDS
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._group_of = {k: g for g, keys in PROFILE_FIELD_GROUPS.items() for k in keys}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except Exception:
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, default=str)
+            os.replace(tmp_path, self.path)
+
+    def _is_fresh(self, entry, now):
+        fetched = entry.get("fetched") or {}
+        if not fetched: return False
+        return all(now - ts < self.ttls.get(group, self.ttls['market']) for group, ts in fetched.items())
+
+    def is_fresh(self, symbol):
+        """Like get() without the copy or the hit/miss accounting (profile tier planning)."""
+        with self.lock:
+            entry = self.entries.get(symbol)
+            return entry is not None and self._is_fresh(entry, time.time())
+
+    def get(self, symbol, allow_stale=False):
+        """Cached info dict, or None on a miss. allow_stale=True never counts as a hit/miss."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None or (not allow_stale and not self._is_fresh(entry, now)):
+                if not allow_stale: self.misses += 1
+                return None
+            entry["accessed"] = now
+            if not allow_stale: self.hits += 1
+            return dict(entry["info"])
+
+    def put(self, symbol, info):
+        if not info: return
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(symbol) or {"info": {}, "fetched": {}}
+            # Only groups that actually came back are marked fresh (throttled responses are often partial)
+            for key, value in info.items():
+                if value is None: continue
+                entry["info"][key] = value
+                entry["fetched"][self._group_of.get(key, 'market')] = now
+            entry["accessed"] = now
+            self.entries[symbol] = entry
+            self._evict()
+
+    def _evict(self):
+        overflow = len(self.entries) - self.max_entries
+        if overflow <= 0: return
+        oldest = sorted(self.entries, key=lambda s: self.entries[s].get("accessed", 0))[:overflow]
+        for symbol in oldest:
+            del self.entries[symbol]
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return f"🗄️  Profile cache: {self.hits} hits / {self.misses} misses ({rate:.0f}% hit rate, {len(self.entries)} entries)"
+
+_profile_cache = None
+
+def get_profile_cache():
+    """Process-wide ProfileCache (None when disabled)."""
+    global _profile_cache
+    if not PROFILE_CACHE_ENABLED: return None
+    if _profile_cache is None:
+        _profile_cache = ProfileCache()
+    return _profile_cache
+
 def get_country_flag(market_code):
     return COUNTRY_FLAGS.get(market_code, '🌍')
 
+def clean_value(val):
+    """
+    The one scalar sanitizer for JSON and DB output: NaN/inf -> 0.0, numpy scalars -> Python,
+    anything else that isn't JSON-native -> str. Plain Python types take the first branches.
+    """
+    t = type(val)
+    if t is float:
+        return val if math.isfinite(val) else 0.0
+    if t is str or t is int or t is bool or val is None:
+        return val
+    if isinstance(val, np.generic):
+        return clean_value(val.item())
+    if isinstance(val, float):
+        return clean_value(float(val))
+    if isinstance(val, int):
+        return int(val)
+    # Fallback for pandas/other types
+    return str(val)
+
+def _clean_dict(data):
+    # Plain scalars (nearly every value in a row or profile) are handled inline: no call per leaf
+    out = {}
+    for k, v in data.items():
+        t = type(v)
+        if t is float: out[k] = v if isfinite(v) else 0.0
+        elif t is str or t is int or v is None or t is bool: out[k] = v
+        else: out[k] = clean_data(v)
+    return out
+
 def clean_data(data):
+    """
+    clean_value over a dict/list tree. Applied once, where a record leaves the pipeline
+    (process_symbol's row, a profile, a quote-tier row): shards, JSON files and the DB
+    all take what it returns without re-checking.
+    """
+    t = type(data)
+    if t is dict: return _clean_dict(data)
+    if t is list or t is tuple: return [clean_data(v) for v in data]
+    if isinstance(data, dict): return _clean_dict(data)
+    if isinstance(data, (list, tuple)): return [clean_data(v) for v in data]
+    return clean_value(data)
+
+def load_chart_history(symbol):
+    """Stored OHLCV history for a symbol: the packed history store first, else its chart JSON (None if neither)."""
+    stored = get_history_store().get(symbol)
+    if stored is not None and not stored.empty: return stored
+    return load_chart_file(symbol)
+
+def load_chart_file(symbol):
+    """OHLCV history parsed back from a symbol's chart JSON (None if missing or empty)."""
+    safe_symbol = symbol.replace('^', '')
+    try:
+        with open(f"{CHART_DIR}/{safe_symbol}.json", "r") as f:
+            quotes = json.load(f).get("quotes") or []
+    except Exception:
+        return None
+    if not quotes: return None
+
+    df = pd.DataFrame(quotes)
+    df.index = pd.to_datetime(df.pop("date"))
+    df = df.rename(columns={"price": "Close", "open": "Open", "high": "High", "low": "Low", "volume": "Volume"})
+    df = df[["Open", "High", "Low", "Close", "Volume"]].sort_index()
+    # save_chart_data writes missing prices as 0; restore them so a re-save is identical
+    price_cols = ["Open", "High", "Low", "Close"]
+    df[price_cols] = df[price_cols].astype(float).replace(0, np.nan)
+    return df
+
+def merge_chart_history(stored, delta):
+    """
+    Append freshly downloaded bars to a stored history.
+    Returns None when the two don't line up (gap, split or re-adjusted closes),
+    in which case the caller should refetch the full year.
+    """
+    if stored is None or delta is None or delta.empty: return None
+
+    delta = delta.copy()
+    delta.index = pd.to_datetime(delta.index.strftime('%Y-%m-%d'))
+
+    # GAP: the delta must reach back to (or before) the last stored bar
+    if delta.index[0] > stored.index[-1]: return None
+
+    # SPLIT / ADJUSTMENT: overlapping closes must agree
+    overlap = stored.index.intersection(delta.index)
+    old_close = stored.loc[overlap, 'Close'].astype(float)
+    new_close = delta.loc[overlap, 'Close'].astype(float)
+    valid = (old_close != 0) & old_close.notna() & new_close.notna()
+    if valid.any():
+        drift = ((new_close[valid] - old_close[valid]) / old_close[valid]).abs()
+        if (drift > CHART_REVISION_TOLERANCE).any(): return None
+
+    merged = pd.concat([stored[stored.index < delta.index[0]], delta[["Open", "High", "Low", "Close", "Volume"]]])
+    # Keep the same rolling one-year window a period="1y" download would give
+    return merged[merged.index > merged.index[-1] - pd.DateOffset(years=1)]
+
+# (quotes key, DataFrame column) in the order the frontend has always received them
+CHART_FIELDS = (("price", "Close"), ("open", "Open"), ("high", "High"), ("low", "Low"))
+
+def _clean_price_column(values):
+    """Column-level version of the per-row NaN -> 0 / inf -> 0.0 rules (see clean_value)."""
+    arr = np.asarray(values, dtype=float)
+    out = arr.astype(object)
+    out[np.isnan(arr)] = 0
+    out[np.isinf(arr)] = 0.0
+    return out.tolist()
+
+def _clean_volume_column(values):
+    arr = np.asarray(values, dtype=float)
+    if np.isinf(arr).any(): raise OverflowError("cannot convert float infinity to integer")
+    return np.where(np.isnan(arr), 0, arr).astype(np.int64).tolist()
+
+def serialize_chart(prices_df, layout="rows"):
+    """
+    Vectorized OHLCV -> JSON-ready payload.
+    layout="rows"     -> {"quotes": [{"date", "price", "open", "high", "low", "volume"}, ...]}
+    layout="columnar" -> {"date": [...], "open": [...], "high": [...], "low": [...], "close": [...], "volume": [...]}
+    """
+    dates = prices_df.index.strftime('%Y-%m-%d').tolist()
+    columns = {key: _clean_price_column(prices_df[col]) for key, col in CHART_FIELDS}
+    volume = _clean_volume_column(prices_df['Volume'])
+
+    if layout == "columnar":
+        return {
+            "date": dates,
+            "open": columns["open"],
+            "high": columns["high"],
+            "low": columns["low"],
+            "close": columns["price"],
+            "volume": volume
+        }
+
+    # WRAP IN "quotes" KEY TO MATCH FRONTEND EXPECTATION
+    return {"quotes": [
+        {"date": d, "price": c, "open": o, "high": h, "low": l, "volume": v}
+        for d, c, o, h, l, v in zip(dates, columns["price"], columns["open"], columns["high"], columns["low"], volume)
+    ]}
+
+def _strip_volatile(data, volatile_keys):
     if isinstance(data, dict):
-        return {k: clean_data(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_data(v) for v in data]
-    elif isinstance(data, float):
-        if data != data: return 0.0
-        if data == float('inf') or data == float('-inf'): return 0.0
-        return data
-    elif isinstance(data, (int, float, str, bool, type(None))):
-        return data
-    else:
-        # Fallback for numpy/pandas types
-        return str(data)
+        return {k: _strip_volatile(v, volatile_keys) for k, v in data.items() if k not in volatile_keys}
+    if isinstance(data, list):
+        return [_strip_volatile(v, volatile_keys) for v in data]
+    return data
+
+class ArtifactWriter:
+    """
+    Change-detecting, atomic JSON writer for the data lake.
+    The content hash ignores `volatile_keys` (e.g. lastUpdated), so a file whose
+    real content didn't change is left untouched. Hashes persist between runs in
+    ARTIFACT_HASHES_PATH; changed paths are collected for CHANGES_MANIFEST_PATH.
+    The time of every write with volatile keys (changed or not) goes to `fetched_path`,
+    by default beside the hashes.
+    """
+    def __init__(self, hashes_path=ARTIFACT_HASHES_PATH, manifest_path=CHANGES_MANIFEST_PATH, fetched_path=None):
+        self.hashes_path = hashes_path
+        self.manifest_path = manifest_path
+        self.fetched_path = fetched_path or (ARTIFACT_FETCHED_PATH if hashes_path == ARTIFACT_HASHES_PATH
+                                             else os.path.join(os.path.dirname(hashes_path) or ".", "artifact_fetched.json"))
+        self.changed = []
+        self.unchanged = 0
+        self.bytes_written = 0
+        self.lock = threading.Lock()
+        try:
+            with open(hashes_path, "r") as f:
+                self.hashes = json.load(f)
+        except Exception:
+            self.hashes = {}
+        try:
+            with open(self.fetched_path, "r") as f:
+                self.fetched = json.load(f)
+        except Exception:
+            self.fetched = {}
+
+    @staticmethod
+    def _digest(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _stable_digest(self, text, payload, volatile_keys):
+        if not volatile_keys: return self._digest(text)
+        return self._digest(json.dumps(_strip_volatile(payload, volatile_keys), ensure_ascii=False))
+
+    def _previous_digest(self, path, volatile_keys):
+        with self.lock:
+            known = self.hashes.get(path)
+        if known is not None or not os.path.exists(path): return known
+        # First run with this index: hash what is already on disk
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                text = f.read()
+            return self._stable_digest(text, json.loads(text) if volatile_keys else None, volatile_keys)
+        except Exception:
+            return None
+
+    def _replace(self, path, chunks):
+        """Write chunks to a temp file beside `path`, then rename over it. Returns bytes written."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        size = 0
+        try:
+            with os.fdopen(fd, "w", encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk.encode('utf-8'))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        return size
+
+    def _record(self, path, digest, changed, size=0):
+        with self.lock:
+            self.hashes[path] = digest
+            if changed:
+                self.changed.append(path)
+                self.bytes_written += size
+            else:
+                self.unchanged += 1
+        return changed
+
+    def write(self, path, payload, volatile_keys=(), **dump_kwargs):
+        """Write payload as JSON (json.dumps kwargs pass through). Returns True if the file changed."""
+        text = json.dumps(payload, **dump_kwargs)
+        digest = self._stable_digest(text, payload, volatile_keys)
+        if volatile_keys:
+            with self.lock:
+                self.fetched[path] = datetime.now(timezone.utc).isoformat()
+        if digest == self._previous_digest(path, volatile_keys) and os.path.exists(path):
+            return self._record(path, digest, False)
+        return self._record(path, digest, True, self._replace(path, [text]))
+
+    def write_stream(self, path, chunks, digest):
+        """write() for output assembled piecewise (never held whole in memory); the caller supplies its digest."""
+        with self.lock:
+            known = self.hashes.get(path)
+        if digest == known and os.path.exists(path):
+            return self._record(path, digest, False)
+        return self._record(path, digest, True, self._replace(path, chunks))
+
+    def remove(self, path):
+        """Delete an artifact that is no longer published; it is listed as changed (precompress drops its siblings)."""
+        existed = os.path.exists(path)
+        if existed: os.remove(path)
+        with self.lock:
+            self.hashes.pop(path, None)
+            self.fetched.pop(path, None)
+            if existed: self.changed.append(path)
+        return existed
+
+    def digest(self, path):
+        """Content digest recorded for `path` (None if never written)."""
+        with self.lock:
+            return self.hashes.get(path)
+
+    def finish(self):
+        """Persist the hash index and the manifest of paths changed in this run."""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.hashes_path) or ".", exist_ok=True)
+            with open(self.hashes_path, "w") as f:
+                json.dump(self.hashes, f)
+            os.makedirs(os.path.dirname(self.fetched_path) or ".", exist_ok=True)
+            with open(self.fetched_path, "w") as f:
+                json.dump(self.fetched, f)
+            manifest = {
+                "generatedAt": datetime.now(timezone.utc).isoformat(),
+                "changed": sorted(self.changed),
+                "unchangedCount": self.unchanged
+            }
+        self.write(self.manifest_path, manifest, indent=2)
+        print(f"💾 Artifacts: {len(manifest['changed'])} changed, {manifest['unchangedCount']} unchanged ({self.bytes_written / 1024:.0f} KB written)")
+        return manifest
+
+_artifact_writer = None
+
+def precompress_artifacts(writer, manifest_path=PRECOMPRESS_MANIFEST_PATH):
+    """Compressed siblings for the writer's changed files, before writer.finish(). Returns the results."""
+    if not PRECOMPRESS or not writer.changed: return {}
+    with get_metrics().phase("precompress"):
+        results = precompress(list(writer.changed))
+    manifest = update_manifest(load_compression_manifest(manifest_path), results, os.path.dirname(manifest_path))
+    writer.write(manifest_path, {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "formats": list(available_formats()),
+        "files": dict(sorted(manifest.items()))
+    }, volatile_keys=("generatedAt",), indent=None)
+
+    files, raw, packed = summarize(results)
+    for fmt, size in packed.items():
+        get_metrics().set("precompressed_bytes", size, format=fmt)
+    if files:
+        print(f"🗜️  Precompressed {files} files ({raw / 1024:.0f} KB): " + ", ".join(f"{fmt} {size / 1024:.0f} KB" for fmt, size in packed.items()))
+    return results
+
+def get_artifact_writer():
+    """Process-wide ArtifactWriter for the current run."""
+    global _artifact_writer
+    if _artifact_writer is None:
+        _artifact_writer = ArtifactWriter()
+    return _artifact_writer
+
+class MarketShardWriter:
+    """
+    Per-market stocks.json shards. write() runs as soon as a market finishes, so its rows
+    can be dropped from memory; finish() writes the manifest and streams the combined file
+    from the shards on disk. Markets not fetched this run keep their previous shard.
+    """
+    def __init__(self, shard_dir=STOCKS_SHARD_DIR, combined_path=STOCKS_COMBINED_PATH, delta_dir=DELTA_DIR, snapshot_dir=DELTA_SNAPSHOT_DIR):
+        self.shard_dir = shard_dir
+        self.combined_path = combined_path
+        self.manifest_path = os.path.join(shard_dir, "manifest.json")
+        try:
+            with open(self.manifest_path, "r", encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception:
+            manifest = {}
+        self.markets = manifest.get("markets", {})
+        self.delta_seq = manifest.get("deltaSeq") # The delta the published shards are current as of
+        self.lock = threading.Lock()
+        self.delta_feed = DeltaFeed(delta_dir, snapshot_dir, volatile_keys=VOLATILE_KEYS) if DELTA_FEED else None
+        self.changed = set() # Markets whose shard changed since the last finish()
+
+    def path(self, code):
+        return os.path.join(self.shard_dir, f"{code}.json")
+
+    def write(self, code, rows, fetched=True):
+        """
+        Write one market's rows to its shard and update its manifest entry.
+        fetched=False (daemon quote tier) stamps quotedAt and leaves fetchedAt, the
+        full-refresh time --only-stale and the history tier go by, untouched.
+        """
+        path = self.path(code)
+        writer = get_artifact_writer()
+        if self.delta_feed is not None:
+            # The published shard is the delta baseline: read it before it is overwritten
+            self.delta_feed.capture(code, lambda: self._published_baseline(code))
+        changed = writer.write(path, rows, volatile_keys=VOLATILE_KEYS, indent=None, ensure_ascii=False)
+        now = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            if self.delta_feed is not None and not changed and code not in self.changed:
+                self.delta_feed.release(code)
+            previous = self.markets.get(code, {})
+            entry = {
+                "path": os.path.relpath(path, os.path.dirname(self.shard_dir)),
+                "count": len(rows),
+                "sha1": writer.digest(path),
+                "updatedAt": now if changed or "updatedAt" not in previous else previous["updatedAt"],
+                "fetchedAt": now if fetched else previous.get("fetchedAt")
+            }
+            if not fetched: entry["quotedAt"] = now
+            elif "quotedAt" in previous: entry["quotedAt"] = previous["quotedAt"]
+            self.markets[code] = entry
+            if changed: self.changed.add(code)
+        return changed
+
+    def _published_baseline(self, code):
+        """(published rows or None, whether the manifest still describes them as of its deltaSeq)."""
+        try:
+            with open(self.path(code), "r", encoding='utf-8') as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return None, True
+        except ValueError:
+            return [], False # Unreadable
+        digest = ArtifactWriter._digest(json.dumps(_strip_volatile(rows, VOLATILE_KEYS), ensure_ascii=False))
+        current = self.delta_seq == self.delta_feed.seq and self.markets.get(code, {}).get("sha1") == digest
+        return rows, current
+
+    def alias(self, code, target):
+        """Manifest entry for a market served by another market's shard (Global -> US)."""
+        with self.lock:
+            self.markets[code] = dict(self.markets.get(target, {}), aliasOf=target)
+
+    def read(self, code):
+        entry = self.markets.get(code, {})
+        with open(self.path(entry.get("aliasOf", code)), "r", encoding='utf-8') as f:
+            return f.read()
+
+    def merge(self, code, rows):
+        """Upsert rows into an existing shard by symbol (retry phase, --symbols runs); other rows are kept."""
+        existing = json.loads(self.read(code)) if code in self.markets else []
+        updates = {r.get("symbol"): r for r in rows}
+        merged = [updates.pop(r.get("symbol"), r) for r in existing]
+        return self.write(code, merged + [r for r in rows if r.get("symbol") in updates])
+
+    def fetched_at(self, code):
+        """When the market was last refreshed (None if never)."""
+        stamp = self.markets.get(code, {}).get("fetchedAt")
+        return datetime.fromisoformat(stamp) if stamp else None
+
+    def count(self, code):
+        return self.markets.get(code, {}).get("count", 0)
+
+    def ordered(self):
+        return [c for c in MARKET_MAPPING if c in self.markets] + [c for c in self.markets if c not in MARKET_MAPPING]
+
+    def iter_markets(self, codes=None):
+        """(code, rows) for every market (or just `codes`), loading one shard at a time."""
+        for code in self.ordered():
+            if codes is not None and code not in codes: continue
+            try:
+                yield code, json.loads(self.read(code))
+            except Exception as e:
+                print(f"⚠️ Unreadable shard for {code}: {e}")
+
+    def publish_delta(self):
+        """Diff the shards changed since the last finish() against the feed's snapshot. Returns the feed's sequence."""
+        writer = get_artifact_writer()
+        for code in [c for c in self.ordered() if c in self.changed]:
+            self.delta_feed.diff_market(code, json.loads(self.read(code)))
+        self.changed = set()
+        aliases = {code: entry["aliasOf"] for code, entry in self.markets.items() if entry.get("aliasOf")}
+        return self.delta_feed.publish(writer, aliases)
+
+    def finish(self):
+        """Write the delta, the shard manifest and (optionally) the combined stocks.json."""
+        order = self.ordered()
+        writer = get_artifact_writer()
+        manifest = {
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+            "markets": {code: self.markets[code] for code in order}
+        }
+        if self.delta_feed is not None:
+            manifest["deltaSeq"] = self.delta_seq = self.publish_delta() # The delta stocks.json is current as of
+        writer.write(self.manifest_path, manifest, volatile_keys=("generatedAt",), indent=2)
+
+        if not STOCKS_COMBINED: return
+        # Same bytes json.dumps(all_data, ensure_ascii=False) produced, but one shard in memory at a time
+        digest = ArtifactWriter._digest(" ".join(f"{code}:{self.markets[code].get('sha1')}" for code in order))
+        def chunks():
+            yield "{"
+            for i, code in enumerate(order):
+                yield (", " if i else "") + json.dumps(code, ensure_ascii=False) + ": "
+                yield self.read(code)
+            yield "}"
+        writer.write_stream(self.combined_path, chunks(), digest)
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal of completed batches: {"type": "batch", "market", "rows"}.
+    A line torn by a crash mid-write ends the replay and is cut off before appending.
+    """
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.valid_bytes = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """{market: {symbol: row}} journaled by an unfinished run ({} if there is none)."""
+        rows = {}
+        self.valid_bytes = 0
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return rows
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"): break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.valid_bytes += len(line)
+                if entry.get("type") == "batch":
+                    market = rows.setdefault(entry["market"], {})
+                    for row in entry["rows"]: market[row["symbol"]] = row
+        return rows
+
+    def open(self, resume=False):
+        """Start journaling: append after the valid part of the old journal, or start over."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock:
+            if resume and os.path.exists(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(self.valid_bytes)
+            self.file = open(self.path, "a" if resume else "w", encoding='utf-8')
+        self._append({"type": "start", "resumed": resume, "startedAt": datetime.now(timezone.utc).isoformat()})
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.file is None: return
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def record(self, market, rows):
+        if rows: self._append({"type": "batch", "market": market, "rows": rows})
+
+    def close(self):
+        with self.lock:
+            if self.file is not None: self.file.close()
+            self.file = None
+
+    def finish(self):
+        """The run completed: nothing left to resume."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
 
 def save_chart_data(symbol, prices_df):
     try:
-        chart_data = []
-        for index, row in prices_df.iterrows():
-            chart_data.append({
-                "date": index.strftime('%Y-%m-%d'),
-                "price": row['Close'] if not pd.isna(row['Close']) else 0,
-                # Add open/high/low/volume for potential candlestick charts later
-                "open": row['Open'] if not pd.isna(row['Open']) else 0,
-                "high": row['High'] if not pd.isna(row['High']) else 0,
-                "low": row['Low'] if not pd.isna(row['Low']) else 0,
-                "volume": int(row['Volume']) if not pd.isna(row['Volume']) else 0
-            })
-        
-        chart_dir = "public/data/charts"
-        os.makedirs(chart_dir, exist_ok=True)
+        output = serialize_chart(prices_df)
+
+        chart_dir = CHART_DIR
         safe_symbol = symbol.replace('^', '')
+        writer = get_artifact_writer()
         
-        # WRAP IN "quotes" KEY TO MATCH FRONTEND EXPECTATION
-        output = {"quotes": clean_data(chart_data)}
-        
-        with open(f"{chart_dir}/{safe_symbol}.json", "w") as f:
-            json.dump(output, f)
+        writer.write(f"{chart_dir}/{safe_symbol}.json", output)
+
+        # Optional compact columnar copy for clients that can use it
+        if CHART_COLUMNAR:
+            writer.write(f"{CHART_COLUMNAR_DIR}/{safe_symbol}.json", serialize_chart(prices_df, layout="columnar"), separators=(',', ':'))
+
+        if CHART_PYRAMID:
+            for level, frame in build_pyramid(prices_df).items():
+                writer.write(f"{CHART_PYRAMID_DIR}/{level}/{safe_symbol}.json", serialize_chart(frame, layout="columnar"), separators=(',', ':'))
+            thumb = thumbnail(prices_df)
+            thumb["close"] = _clean_price_column(thumb["close"])
+            writer.write(f"{CHART_PYRAMID_DIR}/thumb/{safe_symbol}.json", thumb, separators=(',', ':'))
     except Exception as e:
         # print(f"⚠️ Failed to save chart for {symbol}: {e}")
         pass
 
-def save_profile_data(symbol, info, quote_data=None):
+def export_charts(symbols=None):
+    """Re-export chart JSON files from the packed history store (all committed symbols by default)."""
+    store = get_history_store()
+    exported = 0
+    for symbol in (store.symbols() if symbols is None else symbols):
+        df = store.get(symbol)
+        if df is None or df.empty: continue
+        save_chart_data(symbol, df)
+        exported += 1
+    return exported
+
+def run_export(args):
+    """--export-charts: rewrite chart files (and their pyramids/compressed siblings) from the history store, offline."""
+    global _artifact_writer
+    _artifact_writer = ArtifactWriter()
+    symbols = args.symbols
+    if symbols is None and args.markets:
+        symbols = list(dict.fromkeys(s for code in args.markets for s in MARKET_MAPPING[code]))
+    exported = export_charts(symbols)
+    writer = get_artifact_writer()
+    precompress_artifacts(writer)
+    writer.finish()
+    print(f"📤 Exported {exported} charts from the history store ({len(writer.changed)} files changed)")
+    return exported
+
+def _local_or_info(local, key, info, info_key=None):
+    """History-derived value when we have one, else whatever .info carried."""
+    value = local.get(key)
+    return value if value is not None else info.get(info_key or key)
+
+def save_profile_data(symbol, info, quote_data=None, analytics=None):
     """Save Deep Profile Data to individual JSON file"""
     if quote_data is None: quote_data = {}
+    local = analytics or {}
     try:
         # Construct Profile Object matching Frontend Expectations
         profile = {
@@ -173,13 +989,20 @@ def save_profile_data(symbol, info, quote_data=None):
             "profitMargins": info.get('profitMargins'),
             "beta": info.get('beta'),
             
-            # Moving Averages & Range
-            "fiftyTwoWeekHigh": info.get('fiftyTwoWeekHigh'),
-            "fiftyTwoWeekLow": info.get('fiftyTwoWeekLow'),
-            "fiftyTwoWeekChange": info.get('52WeekChange'),
-            "averageVolume": info.get('averageVolume'),
-            "fiftyDayAverage": info.get('fiftyDayAverage'),
-            "twoHundredDayAverage": info.get('twoHundredDayAverage'),
+            # Moving Averages & Range (computed from our own history; .info only as a fallback)
+            "fiftyTwoWeekHigh": _local_or_info(local, 'fiftyTwoWeekHigh', info),
+            "fiftyTwoWeekLow": _local_or_info(local, 'fiftyTwoWeekLow', info),
+            "fiftyTwoWeekChange": _local_or_info(local, 'fiftyTwoWeekChange', info, '52WeekChange'),
+            "averageVolume": _local_or_info(local, 'averageVolume', info),
+            "averageVolume10days": _local_or_info(local, 'averageVolume10days', info),
+            "fiftyDayAverage": _local_or_info(local, 'fiftyDayAverage', info),
+            "twoHundredDayAverage": _local_or_info(local, 'twoHundredDayAverage', info),
+            "returns": {
+                "1w": local.get('return1w'), "1m": local.get('return1m'),
+                "3m": local.get('return3m'), "6m": local.get('return6m'),
+                "1y": local.get('fiftyTwoWeekChange')
+            },
+            "volatility30d": local.get('volatility30d'),
             
             # Ownership
             "sharesOutstanding": info.get('sharesOutstanding'),
@@ -231,158 +1054,458 @@ def save_profile_data(symbol, info, quote_data=None):
         }
         
         profile_dir = "public/data/profiles"
-        os.makedirs(profile_dir, exist_ok=True)
         safe_symbol = symbol.replace('^', '')
-        with open(f"{profile_dir}/{safe_symbol}.json", "w") as f:
-            json.dump(clean_data(profile), f)
+        get_artifact_writer().write(f"{profile_dir}/{safe_symbol}.json", clean_data(profile), volatile_keys=VOLATILE_KEYS)
             
     except Exception as e:
         print(f"⚠️ Failed to save profile for {symbol}: {e}")
 
 
-def fetch_market_data(market_code, tickers):
-    print(f"📡 {market_code}: Processing {len(tickers)} stocks...")
-    
-    BATCH_SIZE = 8
+def build_quote(df):
+    """Latest price/change/day range from the last two bars of a history frame."""
+    latest = df.iloc[-1]
+    prev = df.iloc[-2] if len(df) > 1 else latest
+
+    price = latest['Close']
+    if pd.isna(price): price = 0
+
+    return {
+        "price": price,
+        "change": (price - prev['Close']) if not pd.isna(prev['Close']) else 0,
+        "changePercent": ((price - prev['Close']) / prev['Close'] * 100) if not pd.isna(prev['Close']) and prev['Close'] != 0 else 0,
+        "volume": int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
+        "dayHigh": float(latest['High']) if not pd.isna(latest['High']) else 0,
+        "dayLow": float(latest['Low']) if not pd.isna(latest['Low']) else 0,
+        "open": float(latest['Open']) if not pd.isna(latest['Open']) else 0,
+        "previousClose": float(prev['Close']) if not pd.isna(prev['Close']) else 0
+    }
+
+def process_symbol(market_code, symbol, df, limiter=None, analytics=None):
+    """
+    Turn one symbol's price history (+ profile) into its stocks.json row and write its chart/profile files.
+    `analytics` is this symbol's compute_analytics() entry (computed here if the caller didn't batch it).
+    """
+    if analytics is None: analytics = compute_analytics({symbol: df}).get(symbol, {})
+
+    clean_symbol = symbol
+
+    # PROFILE & META
+    # Note: accessing .info triggers a request per ticker.
+    # This is unavoidable for detailed profiles but slow.
+    # We accept the slowness in the background pump for quality.
+    # The profile cache skips the request entirely while the entry is fresh.
+    profile_cache = get_profile_cache()
+    info = profile_cache.get(symbol) if profile_cache else None
+    if info is None:
+        info = {}
+        try:
+            if limiter: limiter.acquire()
+            with get_metrics().timer("info"):
+                info = get_provider().info(symbol)
+            if profile_cache: profile_cache.put(symbol, info)
+        except:
+            # Upstream failed: a stale profile beats an empty one
+            if profile_cache: info = profile_cache.get(symbol, allow_stale=True) or {}
+
+    # Merge Price info from DF if missing in Info
+    quote_data = build_quote(df)
+
+    stock_data = {
+        "symbol": clean_symbol,
+        "name": info.get('shortName') or info.get('longName') or clean_symbol,
+        "category": market_code,
+        "country": get_country_flag(market_code),
+        "sector": info.get('sector') or 'General',
+        "logo": f"https://t1.gstatic.com/faviconV2?client=SOCIAL&type=FAVICON&fallback_opts=TYPE,SIZE,URL&url=http://{clean_symbol.split('.')[0].lower()}.com&size=128",
+        "price": quote_data['price'],
+        "change": quote_data['change'],
+        "changePercent": quote_data['changePercent'],
+        "volume": quote_data['volume'],
+
+        # Added for Market Summary Columns
+        "marketCap": info.get('marketCap'),
+        "peRatio": info.get('trailingPE') or info.get('forwardPE'),
+        "dividendYield": info.get('dividendYield'),
+
+        # Derived from the price history (previously missing, so the DB got zeros)
+        "previousClose": quote_data['previousClose'],
+        "fiftyTwoWeekHigh": analytics.get('fiftyTwoWeekHigh'),
+        "fiftyTwoWeekLow": analytics.get('fiftyTwoWeekLow'),
+        "fiftyTwoWeekChange": analytics.get('fiftyTwoWeekChange'),
+        "fiftyDayAverage": analytics.get('fiftyDayAverage'),
+        "twoHundredDayAverage": analytics.get('twoHundredDayAverage'),
+        "averageVolume": analytics.get('averageVolume'),
+
+        "lastUpdated": datetime.now(timezone.utc).isoformat() + "Z"
+    }
+
+    # The history store is the source of truth; the chart JSON is exported from it
+    metrics = get_metrics()
+    with metrics.timer("save_chart"):
+        save_chart_data(clean_symbol, get_history_store().stage(symbol, df))
+    with metrics.timer("save_profile"):
+        save_profile_data(clean_symbol, info, quote_data, analytics) # SAVE PROFILE WITH QUOTE
+    with metrics.timer("clean"):
+        return clean_data(stock_data)
+
+def symbol_frame(data_batch, symbol):
+    """One symbol's frame out of a download() result (empty if the symbol is missing)."""
+    # Robust DF Extraction for both Single and Multi-Batch
+    try:
+        # If MultiIndex (Ticker, Price), this extracts the ticker's DF
+        if isinstance(data_batch.columns, pd.MultiIndex):
+            return data_batch[symbol]
+        # If flat DF (unlikely with group_by='ticker' but possible)
+        return data_batch
+    except KeyError:
+        return pd.DataFrame() # Retried later
+
+def has_price_data(df):
+    # yf.download pads missing tickers with all-NaN columns instead of omitting them
+    return not df.empty and 'Close' in df and not df['Close'].isna().all()
+
+def fetch_batch(market_code, batch, limiter=None, incremental=None, failed=None, deadline=None, refetch=None):
+    """
+    Download history + profile for one batch of symbols. Returns rows in batch order.
+    Symbols that produced no data are appended to `failed`; the caller retries them
+    in a later round and finally in the parallel recovery phase.
+    Symbols whose incremental merge hit a gap or split go to `refetch` instead (default:
+    `failed`): they need a full download, not a throttle backoff.
+    Past `deadline` (time.monotonic()), no further symbol is processed or written.
+    """
+    if incremental is None: incremental = INCREMENTAL_CHARTS
+    if failed is None: failed = []
+    if refetch is None: refetch = failed
     market_results = []
-    unique_tickers = list(set(tickers))
-    
-    for i in range(0, len(unique_tickers), BATCH_SIZE):
-        batch = unique_tickers[i:i+BATCH_SIZE]
+
+    # 0. INCREMENTAL: only ask for bars after what we already have on disk
+    stored_history = {}
+    if incremental:
+        cutoff = pd.Timestamp.now().normalize() - pd.Timedelta(days=CHART_MAX_DELTA_DAYS)
+        for symbol in batch:
+            if symbol in _needs_full_history: continue
+            hist = load_chart_history(symbol)
+            if hist is not None and hist.index[-1] >= cutoff:
+                stored_history[symbol] = hist
+        # Mixed batches (new symbols) take the full download path
+        if len(stored_history) != len(batch): stored_history = {}
+
+    # 1. DOWNLOAD PRICE HISTORY
+    provider = get_provider()
+    if limiter: limiter.acquire()
+    with get_metrics().timer("download", market=market_code):
+        if stored_history:
+            start = min(h.index[-1] for h in stored_history.values()) - pd.Timedelta(days=CHART_OVERLAP_DAYS)
+            data_batch = provider.download(batch, start=start.strftime('%Y-%m-%d'))
+        else:
+            data_batch = provider.download(batch, period="1y")
+
+    frames = {}
+    for symbol in batch:
         try:
-            # 1. DOWNLOAD PRICE HISTORY
-            data_batch = yf.download(batch, period="1y", interval="1d", group_by='ticker', threads=True, progress=False)
-            
-            # 2. DOWNLOAD META INFO (This is slow, so we do it per ticker or via Tickers object)
-            tickers_obj = yf.Tickers(" ".join(batch))
-            
-            for symbol in batch:
-                try:
-                    # History
-                    # Robust DF Extraction for both Single and Multi-Batch
-                    try:
-                        # If MultiIndex (Ticker, Price), this extracts the ticker's DF
-                        if isinstance(data_batch.columns, pd.MultiIndex):
-                            df = data_batch[symbol]
-                        else:
-                            # If flat DF (unlikely with group_by='ticker' but possible)
-                            df = data_batch
-                    except KeyError:
-                        # print(f"KeyError for {symbol}")
-                        df = pd.DataFrame() # Trigger fallback
-
-                    # FALLBACK Mechanism for Failed Batch Downloads
-                    if df.empty:
-                        try:
-                            # print(f"⚠️ Batch failed for {symbol}, attempting individual fetch...")
-                            fallback = yf.Ticker(symbol).history(period="1y", interval="1d")
-                            if not fallback.empty:
-                                df = fallback
-                                # print(f"✅ Fallback recovered data for {symbol}")
-                        except Exception:
-                            pass
-                    
-                    if df.empty: continue
-                    
-                    latest = df.iloc[-1]
-                    prev = df.iloc[-2] if len(df) > 1 else latest
-                    
-                    clean_symbol = symbol
-                    
-                    # PROFILE & META
-                    # Note: accessing .info triggers a request per ticker. 
-                    # This is unavoidable for detailed profiles but slow.
-                    # We accept the slowness in the background pump for quality.
-                    info = {}
-                    try:
-                        info = tickers_obj.tickers[symbol].info
-                    except:
-                        pass
-                    
-                    # Merge Price info from DF if missing in Info
-                    price = latest['Close']
-                    if pd.isna(price): price = 0
-                    
-                    quote_data = {
-                        "price": price,
-                        "change": (price - prev['Close']) if not pd.isna(prev['Close']) else 0,
-                        "changePercent": ((price - prev['Close']) / prev['Close'] * 100) if not pd.isna(prev['Close']) and prev['Close'] != 0 else 0,
-                        "volume": int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
-                        "dayHigh": float(latest['High']) if not pd.isna(latest['High']) else 0,
-                        "dayLow": float(latest['Low']) if not pd.isna(latest['Low']) else 0,
-                        "open": float(latest['Open']) if not pd.isna(latest['Open']) else 0,
-                        "previousClose": float(prev['Close']) if not pd.isna(prev['Close']) else 0
-                    }
-
-                    stock_data = {
-                        "symbol": clean_symbol,
-                        "name": info.get('shortName') or info.get('longName') or clean_symbol,
-                        "category": market_code,
-                        "country": get_country_flag(market_code),
-                        "sector": info.get('sector') or 'General',
-                        "logo": f"https://t1.gstatic.com/faviconV2?client=SOCIAL&type=FAVICON&fallback_opts=TYPE,SIZE,URL&url=http://{clean_symbol.split('.')[0].lower()}.com&size=128",
-                        "price": quote_data['price'],
-                        "change": quote_data['change'],
-                        "changePercent": quote_data['changePercent'],
-                        "volume": quote_data['volume'],
-                        
-                        # Added for Market Summary Columns
-                        "marketCap": info.get('marketCap'),
-                        "peRatio": info.get('trailingPE') or info.get('forwardPE'), 
-                        "dividendYield": info.get('dividendYield'),
-                        
-                        "lastUpdated": datetime.now(timezone.utc).isoformat() + "Z"
-                    }
-                    
-                    market_results.append(stock_data)
-                    save_chart_data(clean_symbol, df)
-                    save_profile_data(clean_symbol, info, quote_data) # SAVE PROFILE WITH QUOTE
-                    
-                except Exception as inner_e:
-                   pass
-            
-            time.sleep(2) # Increased delay for Profile fetching safety
-            
-        except Exception as e:
-            print(f"Batch Error: {e}")
+            # History (a batch spanning two exchanges' holidays pads each symbol with all-NaN bars)
+            df = symbol_frame(data_batch, symbol).dropna(how='all')
+            if not has_price_data(df):
+                failed.append(symbol) # Empty response: the throttle signal
+                continue
 
+            if symbol in stored_history:
+                merged = merge_chart_history(stored_history[symbol], df)
+                if merged is None:
+                    # Gap or split detected -> next attempt downloads the full year
+                    _needs_full_history.add(symbol)
+                    refetch.append(symbol)
+                    continue
+                df = merged
+            frames[symbol] = df
+
+        except Exception as inner_e:
+            failed.append(symbol)
+
+    # 2. ANALYTICS for the whole batch in one vectorized pass
+    with get_metrics().timer("analytics"):
+        analytics = compute_analytics(frames)
+
+    # 3. PROFILE & QUOTE (meta info is fetched per ticker inside)
+    for symbol, df in frames.items():
+        if deadline is not None and time.monotonic() >= deadline:
+            failed.append(symbol)
+            continue
+        try:
+            market_results.append(process_symbol(market_code, symbol, df, limiter, analytics.get(symbol, {})))
+        except Exception as inner_e:
+            failed.append(symbol)
+
+    if _journal is not None: _journal.record(market_code, market_results)
     return market_results
 
-import numpy as np
+def _recover_batch(market_code, batch, limiter, deadline):
+    """Recovery worker: one full-year download for a batch. Returns (rows, failed symbols)."""
+    failed = []
+    if time.monotonic() >= deadline: return [], list(batch)
+    try:
+        return fetch_batch(market_code, batch, limiter, incremental=False, failed=failed, deadline=deadline), failed
+    except Exception:
+        return [], list(batch)
 
-def sanitize_for_db(val):
-    """Converts numpy types to native python types and handles NaN."""
-    if val is None:
-        return None
-    if isinstance(val, (float, np.float64, np.float32)):
-        if np.isnan(val) or np.isinf(val):
-            return 0.0
-        return float(val)
-    if isinstance(val, (int, np.int64, np.int32)):
-        return int(val)
-    return val
+def recover_failed_symbols(failed_by_market, limiter=None, budget=None):
+    """
+    Phase 2: one parallel pass of batched downloads over everything phase 1 gave up on,
+    across all markets, bounded by a wall-clock budget. Jobs still queued at the deadline
+    are cancelled and in-flight ones are waited for (they stop writing at the deadline),
+    so nothing lands after the export phase has started.
+    Returns ({market: [rows]}, {"recovered": [...], "dropped": [...]}).
+    """
+    if budget is None: budget = RETRY_BUDGET_SECONDS
+    jobs = [(code, batch) for code, symbols in failed_by_market.items()
+            for batch in plan_batches(list(dict.fromkeys(symbols)), BATCH_SIZE, batch_group(code))]
+    outcome = {"recovered": [], "dropped": []}
+    if not jobs: return {}, outcome
 
-def ensure_db_schema(cur):
-    """Ensures the DB schema can handle longer strings."""
+    symbols = sum(len(batch) for _, batch in jobs)
+    markets = len([c for c in failed_by_market if failed_by_market[c]])
+    print(f"🩹 Retry phase: {symbols} symbols across {markets} markets in {len(jobs)} batches ({budget:.0f}s budget)")
+    deadline = time.monotonic() + budget
+    results = {}
+
+    pool = ThreadPoolExecutor(max_workers=RETRY_WORKERS)
+    futures = {pool.submit(_recover_batch, code, batch, limiter, deadline): idx for idx, (code, batch) in enumerate(jobs)}
     try:
-        # We blindly attempt to widen columns. 
-        # Postgres is smart enough to handle this instantly if they are already wide enough? 
-        # Actually, standard SQL: ALTER COLUMN ... TYPE ...
-        queries = [
-            "ALTER TABLE stocks ALTER COLUMN ticker TYPE VARCHAR(50);",
-            "ALTER TABLE stocks ALTER COLUMN name TYPE VARCHAR(255);",
-            "ALTER TABLE stocks ALTER COLUMN sector TYPE VARCHAR(100);",
-            "ALTER TABLE stocks ALTER COLUMN category TYPE VARCHAR(50);"
-        ]
-        for q in queries:
+        for future in as_completed(futures, timeout=budget):
+            results[futures[future]] = future.result()
+    except FuturesTimeoutError:
+        print(f"⏱️ Retry phase budget exhausted after {budget:.0f}s")
+    pool.shutdown(wait=True, cancel_futures=True)
+    for future, idx in futures.items():
+        if idx not in results and future.done() and not future.cancelled(): results[idx] = future.result()
+
+    recovered = {}
+    for idx, (code, batch) in enumerate(jobs):
+        rows = {row["symbol"]: row for row in results.get(idx, ([], batch))[0]}
+        for symbol in batch:
+            if symbol in rows:
+                recovered.setdefault(code, []).append(rows[symbol])
+                outcome["recovered"].append({"market": code, "symbol": symbol})
+            else:
+                outcome["dropped"].append({"market": code, "symbol": symbol})
+
+    print(f"🩹 Retry phase: recovered {len(outcome['recovered'])}, dropped {len(outcome['dropped'])}")
+    return recovered, outcome
+
+def batch_group(market_code):
+    """Download-group key for symbols fetched under `market_code`: (timezone, exchange)."""
+    return lambda symbol: REGISTRY.group(symbol, market_code)
+
+def plan_batches(symbols, batch_size=BATCH_SIZE, key=None):
+    """
+    Split an already de-duplicated symbol list into download batches, preserving order.
+    With `key`, a batch never spans two groups, so one download's bars share a calendar.
+    """
+    batches = []
+    for symbol in symbols:
+        if batches and len(batches[-1]) < batch_size and (key is None or key(batches[-1][0]) == key(symbol)):
+            batches[-1].append(symbol)
+        else:
+            batches.append([symbol])
+    return batches
+
+def fetch_market_data(market_code, tickers, scheduler=None, failed=None):
+    """Batched fetch for one market. Symbols still failing after MAX_FETCH_ROUNDS are appended to `failed`."""
+    print(f"📡 {market_code}: Processing {len(tickers)} stocks...")
+    if scheduler is None: scheduler = AdaptiveScheduler()
+
+    market_results = []
+    pending = list(dict.fromkeys(tickers)) # De-dupe in catalog order: stable shard content run to run
+    group = batch_group(market_code)
+
+    for round_no in range(1, MAX_FETCH_ROUNDS + 1):
+        if not pending: break
+        if round_no > 1:
+            print(f"🔁 {market_code}: Retry round {round_no} for {len(pending)} symbols")
+        retry = []
+        i = 0
+        while i < len(pending):
+            batch = plan_batches(pending[i:i+scheduler.batch_size], scheduler.batch_size, group)[0]
+            i += len(batch)
+            batch_failed, batch_refetch = [], []
+            backed_off = False
             try:
-                cur.execute(q)
-            except Exception:
-                # Ignore if fails (e.g. locks or permission), we hope for the best
-                cur.connection.rollback()
-                continue
+                market_results.extend(fetch_batch(market_code, batch, failed=batch_failed, refetch=batch_refetch))
+                backed_off = scheduler.record(batch, batch_failed)
+            except Exception as e:
+                print(f"Batch Error: {e}")
+                batch_failed, batch_refetch = list(batch), []
+                if is_throttle_error(e): backed_off = scheduler.on_throttle()
+            retry.extend(batch_failed + batch_refetch)
+            # A throttled batch already slept out its backoff; don't add the regular delay on top
+            if (i < len(pending) or retry) and not backed_off: scheduler.wait()
+        pending = retry
+
+    if pending:
+        print(f"⚠️ {market_code}: {len(pending)} symbols still missing after {MAX_FETCH_ROUNDS} rounds: {', '.join(sorted(pending))}")
+        if failed is not None: failed.extend(pending)
+
+    return market_results
+
+def _run_batch_job(market_code, batch, limiter, scheduler):
+    """Worker-side wrapper: never raises, returns (rows, failed symbols)."""
+    failed, refetch = [], []
+    try:
+        rows = fetch_batch(market_code, batch, limiter, failed=failed, refetch=refetch)
+        scheduler.record(batch, failed) # Gap/split refetches aren't a throttle signal
+        return rows, failed + refetch
+    except Exception as e:
+        print(f"Batch Error: {e}")
+        if is_throttle_error(e): scheduler.on_throttle()
+        return [], list(batch)
+
+def fetch_all_markets_concurrent(market_mapping, max_workers=None, failed=None, on_market_done=None, started=None):
+    """
+    Run every (market, batch) job on one bounded worker pool.
+    The per-batch sleep is replaced by the shared per-host rate limiter (whose
+    rate the AdaptiveScheduler tunes), failed symbols are retried in later rounds,
+    and results are reassembled in catalog/batch order so outputs match a serial run.
+    Symbols still failing afterwards are collected per market into `failed`.
+    With on_market_done(code, rows), each market is handed off (and released) the
+    moment its last batch lands instead of being returned. `started` (a dict) gets
+    the time each market's first batch began.
+    """
+    if max_workers is None: max_workers = PUMP_WORKERS
+    if started is None: started = {}
+
+    def run_job(code, batch):
+        started.setdefault(code, time.time())
+        return _run_batch_job(code, batch, limiter, scheduler)
+    limiter = get_rate_limiter(YAHOO_HOST)
+    scheduler = AdaptiveScheduler(limiter=limiter)
+
+    pending = {}
+    for code, tickers in market_mapping.items():
+        if code == 'Global' and 'US' in market_mapping: continue # Aliased after the run
+        print(f"📡 {code}: Processing {len(tickers)} stocks...")
+        pending[code] = list(dict.fromkeys(tickers)) # De-dupe in catalog order: stable shard content run to run
+
+    batch_results = {}
+    handed_off = set()
+
+    def collect(code):
+        keys = sorted(k for k in batch_results if k[0] == code)
+        return [row for k in keys for row in batch_results.pop(k)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for round_no in range(1, MAX_FETCH_ROUNDS + 1):
+            jobs = [
+                (code, round_no, idx, batch)
+                for code, symbols in pending.items()
+                for idx, batch in enumerate(plan_batches(symbols, scheduler.batch_size, batch_group(code)))
+            ]
+            if not jobs: break
+            if round_no > 1:
+                print(f"🔁 Retry round {round_no} for {sum(len(v) for v in pending.values())} symbols")
+
+            futures = {pool.submit(run_job, code, batch): (code, r, idx) for code, r, idx, batch in jobs}
+            outstanding = {}
+            for code, _, _, _ in jobs: outstanding[code] = outstanding.get(code, 0) + 1
+            round_failed = {}
+            for future in as_completed(futures):
+                key = futures[future]
+                batch_results[key], round_failed[key] = future.result()
+                code = key[0]
+                outstanding[code] -= 1
+                if on_market_done and outstanding[code] == 0:
+                    market_failed = any(round_failed[k] for k in round_failed if k[0] == code)
+                    if not market_failed or round_no == MAX_FETCH_ROUNDS:
+                        on_market_done(code, collect(code))
+                        handed_off.add(code)
+
+            pending = {}
+            for key in sorted(round_failed):
+                if round_failed[key]: pending.setdefault(key[0], []).extend(round_failed[key])
+
+    for code, symbols in pending.items():
+        print(f"⚠️ {code}: {len(symbols)} symbols still missing after {MAX_FETCH_ROUNDS} rounds: {', '.join(sorted(symbols))}")
+        if failed is not None: failed.setdefault(code, []).extend(symbols)
+
+    all_results = {}
+    for code in market_mapping:
+        if code in handed_off: continue
+        if code == 'Global' and 'US' in market_mapping:
+            if 'US' in all_results: all_results['Global'] = all_results['US']
+            continue
+        all_results[code] = collect(code)
+    return all_results
+
+# Versioned schema migrations. Each entry runs once per database and is recorded
+# in schema_migrations, so routine pumps don't take ALTER TABLE locks.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        "ALTER TABLE stocks ALTER COLUMN ticker TYPE VARCHAR(50);",
+        "ALTER TABLE stocks ALTER COLUMN name TYPE VARCHAR(255);",
+        "ALTER TABLE stocks ALTER COLUMN sector TYPE VARCHAR(100);",
+        "ALTER TABLE stocks ALTER COLUMN category TYPE VARCHAR(50);"
+    ]),
+    (2, [
+        # Daily bars. The (ticker, trade_date) primary key is the range-scan index:
+        # WHERE ticker = %s AND trade_date BETWEEN %s AND %s walks one contiguous span.
+        """
+        CREATE TABLE IF NOT EXISTS stock_history (
+            ticker VARCHAR(50) NOT NULL,
+            trade_date DATE NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            volume BIGINT,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (ticker, trade_date)
+        );
+        """,
+        # Cross-sectional scans ("every ticker on date X", "since date X")
+        "CREATE INDEX IF NOT EXISTS stock_history_trade_date_idx ON stock_history (trade_date);"
+    ]),
+]
+
+# Column order shared by the staged COPY and the legacy execute_values upsert
+DB_STOCK_COLUMNS = [
+    "ticker", "name", "current_price", "change_percent", "volume",
+    "market_cap", "pe_ratio", "dividend_yield", "fifty_two_week_high",
+    "fifty_two_week_low", "previous_close", "currency", "country", "sector", "category", "last_updated_ts"
+]
+# Columns refreshed on conflict; a row is only rewritten when one of them differs
+DB_UPDATE_COLUMNS = [
+    "current_price", "change_percent", "volume", "market_cap", "pe_ratio", "dividend_yield",
+    "fifty_two_week_high", "fifty_two_week_low", "previous_close", "name", "country", "sector"
+]
+
+def ensure_db_schema(cur):
+    """Applies pending SCHEMA_MIGRATIONS (version-tracked, so each runs only once)."""
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+        cur.execute("SELECT version FROM schema_migrations;")
+        applied = {row[0] for row in cur.fetchall()}
         cur.connection.commit()
-        print("✅ DB Schema Verified/Updated.")
+
+        pending = [(v, queries) for v, queries in SCHEMA_MIGRATIONS if v not in applied]
+        for version, queries in pending:
+            complete = True
+            for q in queries:
+                try:
+                    cur.execute(q)
+                    cur.connection.commit()
+                except Exception:
+                    # Ignore if fails (e.g. locks or permission), we hope for the best - retried next run
+                    cur.connection.rollback()
+                    complete = False
+            if complete:
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s) ON CONFLICT DO NOTHING;", (version,))
+                cur.connection.commit()
+        if pending:
+            print(f"✅ DB Schema migrated to v{pending[-1][0]}.")
     except Exception as e:
         print(f"⚠️ Schema Update Check Failed (Non-Critical): {e}")
         try:
@@ -390,107 +1513,674 @@ def ensure_db_schema(cur):
         except:
             pass
 
-def sync_to_db(all_data):
-    """Syncs the collected JSON data to the Postgres Database if configured."""
+def build_db_records(all_data):
+    """
+    Flattens stocks.json-shaped data (dict or (market, rows) pairs) into DB_STOCK_COLUMNS tuples (one per ticker).
+    Rows are taken as already sanitized: clean_data ran once where each row was produced.
+    """
+    records = []
+    seen = set()
+    now = datetime.now(timezone.utc)
+    markets = all_data.items() if isinstance(all_data, dict) else all_data # or an iterable of (market, rows)
+    for market, stocks in markets:
+        if market == 'Global': continue # Duplicate of US often
+        for s in stocks:
+            # Map fields to DB - Ensure robustness for missing keys
+            try:
+                if s.get('symbol') in seen: continue # ON CONFLICT can't touch a row twice per statement
+                seen.add(s.get('symbol'))
+                records.append((
+                    s.get('symbol'),
+                    s.get('name'),
+                    s.get('price', 0),
+                    s.get('changePercent', 0),
+                    s.get('volume', 0),
+                    s.get('marketCap', 0),
+                    s.get('peRatio', 0),
+                    s.get('dividendYield', 0),
+                    s.get('fiftyTwoWeekHigh', 0),
+                    s.get('fiftyTwoWeekLow', 0),
+                    s.get('previousClose', 0),
+                    s.get('currency', 'USD'),
+                    s.get('country', '🌍'),
+                    s.get('sector', 'General'),
+                    s.get('category', market),
+                    now
+                ))
+            except Exception as row_err:
+                print(f"⚠️ Skipping row {s.get('symbol')}: {row_err}")
+                continue
+    return records
+
+def records_to_csv(records):
+    """CSV body for COPY ... FROM STDIN (FORMAT csv): None -> unquoted empty field (NULL)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for record in records:
+        writer.writerow(['' if v is None else (v.isoformat() if isinstance(v, datetime) else v) for v in record])
+    buffer.seek(0)
+    return buffer
+
+def bulk_upsert_stocks(cur, records):
+    """
+    COPY records into a temp staging table, then merge with one INSERT ... ON CONFLICT
+    whose WHERE clause skips rows whose values are unchanged. Returns rows written.
+    """
+    columns = ", ".join(DB_STOCK_COLUMNS)
+    # Column types only: no constraints or serial defaults to trip over
+    cur.execute(f"CREATE TEMP TABLE stocks_staging ON COMMIT DROP AS SELECT {columns} FROM stocks WITH NO DATA;")
+    cur.copy_expert(f"COPY stocks_staging ({columns}) FROM STDIN WITH (FORMAT csv)", records_to_csv(records))
+
+    updates = ",\n                ".join(f"{c} = EXCLUDED.{c}" for c in DB_UPDATE_COLUMNS + ["last_updated_ts"])
+    current = ", ".join(f"stocks.{c}" for c in DB_UPDATE_COLUMNS)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in DB_UPDATE_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO stocks ({columns})
+        SELECT {columns} FROM stocks_staging
+        ON CONFLICT (ticker) DO UPDATE SET
+                {updates}
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """)
+    return cur.rowcount
+
+def upsert_stocks_row_by_row(cur, records):
+    """Legacy execute_values upsert (every row rewritten). Fallback when COPY/temp tables are unavailable."""
+    query = """
+        INSERT INTO stocks (
+            ticker, name, current_price, change_percent, volume, 
+            market_cap, pe_ratio, dividend_yield, fifty_two_week_high, 
+            fifty_two_week_low, previous_close, currency, country, sector, category, last_updated_ts
+        ) VALUES %s
+        ON CONFLICT (ticker) DO UPDATE SET
+            current_price = EXCLUDED.current_price,
+            change_percent = EXCLUDED.change_percent,
+            volume = EXCLUDED.volume,
+            market_cap = EXCLUDED.market_cap,
+            pe_ratio = EXCLUDED.pe_ratio,
+            dividend_yield = EXCLUDED.dividend_yield,
+            fifty_two_week_high = EXCLUDED.fifty_two_week_high,
+            fifty_two_week_low = EXCLUDED.fifty_two_week_low,
+            previous_close = EXCLUDED.previous_close,
+            last_updated_ts = EXCLUDED.last_updated_ts,
+            name = EXCLUDED.name, -- Update metadata too if changed
+            country = EXCLUDED.country,
+            sector = EXCLUDED.sector
+    """
+    execute_values(cur, query, records)
+    return len(records)
+
+HISTORY_DB_COLUMNS = ["ticker", "trade_date", "open", "high", "low", "close", "volume"]
+HISTORY_DB_OVERLAP_DAYS = CHART_OVERLAP_DAYS # Re-send this many days before the DB's last bar (late revisions)
+
+def fetch_history_tails(cur):
+    """{ticker: (last trade_date, close)} from stock_history - one backward walk of the primary key per ticker."""
+    cur.execute("""
+        SELECT DISTINCT ON (ticker) ticker, trade_date, close
+        FROM stock_history
+        ORDER BY ticker, trade_date DESC;
+    """)
+    return {ticker: (trade_date, close) for ticker, trade_date, close in cur.fetchall()}
+
+def build_history_records(symbols, tails=None):
+    """
+    (ticker, trade_date, open, high, low, close, volume) rows that may be new or revised.
+    Tickers already in the DB send only the bars from their last stored date minus
+    HISTORY_DB_OVERLAP_DAYS; a ticker whose last stored close no longer matches the
+    store (split/dividend re-adjustment) or that was re-downloaded in full sends everything.
+    """
+    tails = tails or {}
+    store = get_history_store()
+    records = []
+    for symbol in symbols:
+        df = store.get(symbol)
+        if df is None or df.empty: continue
+        tail = tails.get(symbol)
+        if tail is not None and symbol not in _needs_full_history:
+            last_date, last_close = pd.Timestamp(tail[0]), tail[1]
+            current = df['Close'].get(last_date)
+            revised = (
+                last_close is not None and current is not None and not pd.isna(current) and
+                abs(current - last_close) > CHART_REVISION_TOLERANCE * max(abs(last_close), 1e-9)
+            )
+            if not revised:
+                df = df[df.index >= last_date - pd.Timedelta(days=HISTORY_DB_OVERLAP_DAYS)]
+        if df.empty: continue
+
+        prices = df[['Open', 'High', 'Low', 'Close']].to_numpy(dtype=float)
+        prices = np.where(np.isfinite(prices), prices, np.nan).astype(object)
+        prices[pd.isna(prices)] = None # NULL, not 0: a missing bar is not a zero price
+        volume = df['Volume'].to_numpy(dtype=float)
+        volume = [int(v) if np.isfinite(v) else None for v in volume]
+        dates = df.index.strftime('%Y-%m-%d')
+        records.extend(
+            (symbol, d, o, h, l, c, v)
+            for d, (o, h, l, c), v in zip(dates, prices.tolist(), volume)
+        )
+    return records
+
+def bulk_upsert_history(cur, records):
+    """COPY bars into staging and merge on (ticker, trade_date); unchanged bars are not rewritten."""
+    columns = ", ".join(HISTORY_DB_COLUMNS)
+    values = [c for c in HISTORY_DB_COLUMNS if c not in ("ticker", "trade_date")]
+    cur.execute(f"CREATE TEMP TABLE stock_history_staging ON COMMIT DROP AS SELECT {columns} FROM stock_history WITH NO DATA;")
+    cur.copy_expert(f"COPY stock_history_staging ({columns}) FROM STDIN WITH (FORMAT csv)", records_to_csv(records))
+
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in values)
+    current = ", ".join(f"stock_history.{c}" for c in values)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in values)
+    cur.execute(f"""
+        INSERT INTO stock_history ({columns})
+        SELECT {columns} FROM stock_history_staging
+        ON CONFLICT (ticker, trade_date) DO UPDATE SET
+                {updates}, updated_at = NOW()
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """)
+    return cur.rowcount
+
+def sync_history_to_db(cur, symbols):
+    """Incrementally appends new/revised daily bars for `symbols` to stock_history."""
+    records = build_history_records(symbols, fetch_history_tails(cur))
+    if not records: return 0, 0
+    return bulk_upsert_history(cur, records), len(records)
+
+_db_conn = None
+
+def get_db_connection(db_url):
+    """Reuses one connection per process (the daemon and repeated syncs skip the handshake)."""
+    global _db_conn
+    if _db_conn is None or _db_conn.closed:
+        _db_conn = psycopg2.connect(db_url)
+    return _db_conn
+
+def sync_to_db(all_data, conn=None, history=True):
+    """Syncs the collected JSON data to the Postgres Database if configured (history=False skips stock_history)."""
     db_url = os.environ.get('DATABASE_URL')
-    if not db_url or not psycopg2:
+    if conn is None and (not db_url or not psycopg2):
         print("⚠️  Skipping DB Sync (Missing DATABASE_URL or psycopg2)")
         return
 
     print("🔌 Connecting to Database for Sync...")
     try:
-        conn = psycopg2.connect(db_url)
+        if conn is None: conn = get_db_connection(db_url)
         cur = conn.cursor()
         
-        # 1. Ensure Schema
+        # 1. Ensure Schema (no-op once migrations are recorded)
         ensure_db_schema(cur)
         
         # Flatten data for batch insert
         print("📦 Preparing batch upsert...", end="")
-        records = []
-        for market, stocks in all_data.items():
-            if market == 'Global': continue # Duplicate of US often
-            for s in stocks:
-                # Map fields to DB - Ensure robustness for missing keys
-                try:
-                    records.append((
-                        s.get('symbol'),
-                        s.get('name'),
-                        sanitize_for_db(s.get('price', 0)),
-                        sanitize_for_db(s.get('changePercent', 0)),
-                        sanitize_for_db(s.get('volume', 0)),
-                        sanitize_for_db(s.get('marketCap', 0)),
-                        sanitize_for_db(s.get('peRatio', 0)),
-                        sanitize_for_db(s.get('dividendYield', 0)),
-                        sanitize_for_db(s.get('fiftyTwoWeekHigh', 0)),
-                        sanitize_for_db(s.get('fiftyTwoWeekLow', 0)),
-                        sanitize_for_db(s.get('previousClose', 0)),
-                        s.get('currency', 'USD'),
-                        s.get('country', '🌍'),
-                        s.get('sector', 'General'),
-                        s.get('category', market),
-                        datetime.now(timezone.utc)
-                    ))
-                except Exception as row_err:
-                    print(f"⚠️ Skipping row {s.get('symbol')}: {row_err}")
-                    continue
-        
+        records = build_db_records(all_data)
         print(f" {len(records)} records.")
 
-        query = """
-            INSERT INTO stocks (
-                ticker, name, current_price, change_percent, volume, 
-                market_cap, pe_ratio, dividend_yield, fifty_two_week_high, 
-                fifty_two_week_low, previous_close, currency, country, sector, category, last_updated_ts
-            ) VALUES %s
-            ON CONFLICT (ticker) DO UPDATE SET
-                current_price = EXCLUDED.current_price,
-                change_percent = EXCLUDED.change_percent,
-                volume = EXCLUDED.volume,
-                market_cap = EXCLUDED.market_cap,
-                pe_ratio = EXCLUDED.pe_ratio,
-                dividend_yield = EXCLUDED.dividend_yield,
-                fifty_two_week_high = EXCLUDED.fifty_two_week_high,
-                fifty_two_week_low = EXCLUDED.fifty_two_week_low,
-                previous_close = EXCLUDED.previous_close,
-                last_updated_ts = EXCLUDED.last_updated_ts,
-                name = EXCLUDED.name, -- Update metadata too if changed
-                country = EXCLUDED.country,
-                sector = EXCLUDED.sector
-        """
-        
-        execute_values(cur, query, records)
+        try:
+            written = bulk_upsert_stocks(cur, records)
+        except Exception as copy_err:
+            print(f"⚠️ Staged COPY failed ({copy_err}), falling back to row upsert")
+            conn.rollback()
+            written = upsert_stocks_row_by_row(cur, records)
         conn.commit()
+        print(f"✅ Database Sync Complete: {written} of {len(records)} stocks changed.")
+
+        if not history:
+            cur.close()
+            return
+        try:
+            bars_written, bars_sent = sync_history_to_db(cur, [r[0] for r in records])
+            conn.commit()
+            print(f"📈 Price History Sync: {bars_written} of {bars_sent} bars new or revised.")
+        except Exception as hist_err:
+            print(f"⚠️ Price History Sync Failed: {hist_err}")
+            conn.rollback()
         cur.close()
-        conn.close()
-        print(f"✅ Database Sync Complete: Updated {len(records)} stocks.")
         
     except Exception as e:
         print(f"❌ Database Sync Failed: {e}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+def write_run_report(report):
+    os.makedirs(os.path.dirname(RUN_REPORT_PATH), exist_ok=True)
+    with open(RUN_REPORT_PATH, "w", encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+def is_market_open(code, now=None, grace_minutes=None):
+    """True while `code` is in its regular session (or within the post-close grace window)."""
+    if grace_minutes is None: grace_minutes = MARKET_CLOSE_GRACE_MINUTES
+    calendar = TRADING_CALENDAR.get(code)
+    if calendar is None: return True # Unknown exchange: never skip it
+    tz_name, open_at, close_at, weekdays = calendar
+    local = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(tz_name))
+    if local.weekday() not in weekdays: return False
+    session_open = local.replace(hour=int(open_at[:2]), minute=int(open_at[3:]), second=0, microsecond=0)
+    session_close = local.replace(hour=int(close_at[:2]), minute=int(close_at[3:]), second=0, microsecond=0)
+    return session_open <= local <= session_close + timedelta(minutes=grace_minutes)
+
+def parse_age(text):
+    """'90' / '90s' / '15m' / '2h' / '1d' -> seconds."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    text = str(text).strip().lower()
+    try:
+        if text and text[-1] in units: return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid age: {text!r} (use e.g. 90s, 15m, 2h, 1d)")
+
+def _csv_list(text):
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+def select_markets(catalog, markets=None, only_open=False, only_stale=None, symbols=None, shards=None, now=None):
+    """
+    Narrow the catalog for a selective refresh. Returns ({market: tickers}, partial) where
+    `partial` holds the markets limited by --symbols (their shards get merged, not replaced).
+    Global is folded into US: it is served from the US shard either way.
+    """
+    now = now or datetime.now(timezone.utc)
+    wanted = ['US' if m == 'Global' else m for m in markets] if markets else [c for c in catalog if not (c == 'Global' and 'US' in catalog)]
+    selected = {code: list(catalog[code]) for code in dict.fromkeys(wanted) if code in catalog}
+
+    partial = set()
+    if symbols:
+        requested = set(symbols)
+        narrowed = {}
+        for code, tickers in selected.items():
+            matched = [t for t in tickers if t in requested]
+            if matched:
+                narrowed[code] = matched
+                partial.add(code)
+            requested -= set(matched)
+        if requested: print(f"⚠️ Unknown symbols skipped: {', '.join(sorted(requested))}")
+        selected = narrowed
+
+    skipped = []
+    for code in list(selected):
+        if only_open and not is_market_open(code, now):
+            skipped.append(f"{code} (closed)")
+            del selected[code]
+        elif only_stale is not None and shards is not None:
+            fetched = shards.fetched_at(code)
+            if fetched is not None and (now - fetched).total_seconds() < only_stale:
+                skipped.append(f"{code} (fresh)")
+                del selected[code]
+    if skipped: print(f"⏭️  Skipping {len(skipped)} markets: {', '.join(skipped)}")
+    return selected, partial & set(selected)
+
+# ==========================================
+# DAEMON MODE (--daemon)
+# ==========================================
+
+def last_session_close(code, now=None):
+    """Most recent regular-session close of `code` at or before `now` (None for unknown exchanges)."""
+    calendar = TRADING_CALENDAR.get(code)
+    if calendar is None: return None
+    tz_name, _, close_at, weekdays = calendar
+    local = (now or datetime.now(timezone.utc)).astimezone(ZoneInfo(tz_name))
+    for days_back in range(8):
+        day = local - timedelta(days=days_back)
+        if day.weekday() not in weekdays: continue
+        session_close = day.replace(hour=int(close_at[:2]), minute=int(close_at[3:]), second=0, microsecond=0)
+        if session_close <= local: return session_close
+    return None
+
+def history_due(codes, shards, now=None):
+    """
+    Markets whose last session closed (past the grace window) after their last full refresh,
+    plus markets never fetched at all (the quote tier needs a shard to patch).
+    """
+    now = now or datetime.now(timezone.utc)
+    due = []
+    for code in codes:
+        fetched = shards.fetched_at(code)
+        if fetched is None:
+            due.append(code)
+            continue
+        if is_market_open(code, now): continue
+        session_close = last_session_close(code, now)
+        if session_close is not None and fetched < session_close + timedelta(minutes=MARKET_CLOSE_GRACE_MINUTES):
+            due.append(code)
+    return due
+
+def _fetch_quotes(code, batch, limiter):
+    try:
+        if limiter: limiter.acquire()
+        with get_metrics().timer("quote", market=code):
+            data_batch = get_provider().quotes(batch)
+    except Exception as e:
+        print(f"⚠️ {code}: quote batch failed ({e})")
+        return {}
+    quotes = {}
+    for symbol in batch:
+        df = symbol_frame(data_batch, symbol).dropna(how='all')
+        if has_price_data(df): quotes[symbol] = build_quote(df)
+    return quotes
+
+def refresh_quotes(codes, limiter=None, shards=None, workers=None):
+    """
+    Quote tier: patch price/change/volume into the existing shards of `codes` from one
+    batched 5-day download per DAEMON_QUOTE_BATCH_SIZE symbols. Charts and profiles are
+    left to the history tier. Returns {market: symbols quoted}.
+    """
+    if shards is None: shards = MarketShardWriter()
+    rows_by_market = dict(shards.iter_markets([c for c in codes if c != 'Global']))
+    fetch_plan, _ = REGISTRY.plan({code: [r["symbol"] for r in rows] for code, rows in rows_by_market.items()})
+    jobs = [(code, batch) for code, symbols in fetch_plan.items()
+            for batch in plan_batches(symbols, DAEMON_QUOTE_BATCH_SIZE, batch_group(code))]
+    if not jobs: return {}
+
+    quotes = {}
+    with ThreadPoolExecutor(max_workers=workers or DAEMON_QUOTE_WORKERS) as pool:
+        for result in pool.map(lambda job: _fetch_quotes(job[0], job[1], limiter), jobs):
+            quotes.update(result)
+
+    quoted = {}
+    stamp = datetime.now(timezone.utc).isoformat() + "Z"
+    for code, rows in rows_by_market.items():
+        hits = 0
+        for row in rows:
+            quote = quotes.get(row.get("symbol"))
+            if quote is None: continue
+            row.update({field: quote[field] for field in QUOTE_FIELDS}, lastUpdated=stamp)
+            hits += 1
+        if not hits: continue
+        shards.write(code, clean_data(rows), fetched=False)
+        quoted[code] = hits
+    for alias, target in REGISTRY.aliases.items():
+        if target in quoted and alias in MARKET_MAPPING: shards.alias(alias, target)
+    if quoted: shards.finish()
+    return quoted
+
+def refresh_profiles(symbols, limiter=None, workers=None):
+    """Profile tier: fetch .info for every symbol whose cache entry has expired. Returns symbols refreshed."""
+    profile_cache = get_profile_cache()
+    if profile_cache is None: return 0
+    due = [s for s in dict.fromkeys(symbols) if not profile_cache.is_fresh(s)]
+    if not due: return 0
+    print(f"🗂️  Profile tier: refreshing {len(due)} of {len(symbols)} profiles")
+
+    def fetch(symbol):
+        try:
+            if limiter: limiter.acquire()
+            with get_metrics().timer("info"):
+                profile_cache.put(symbol, get_provider().info(symbol))
+            return True
+        except Exception:
+            return False # Stale entry stays; the history tier falls back to it
 
-def main():
+    with ThreadPoolExecutor(max_workers=workers or DAEMON_PROFILE_WORKERS) as pool:
+        refreshed = sum(pool.map(fetch, due))
+    profile_cache.save()
+    print(f"🗂️  Profile tier: {refreshed} refreshed, {len(due) - refreshed} failed")
+    return refreshed
+
+def load_daemon_state(path=DAEMON_STATE_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_daemon_state(state, path=DAEMON_STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def run_quote_tier(codes, limiter):
+    global _artifact_writer
+    _artifact_writer = ArtifactWriter()
+    metrics = get_metrics()
+    with metrics.phase("quote"):
+        quoted = refresh_quotes(codes, limiter)
+    if not quoted: return quoted
+    precompress_artifacts(get_artifact_writer())
+    get_artifact_writer().finish()
+    shards = MarketShardWriter()
+    sync_to_db(shards.iter_markets(list(quoted)), history=False) # Bars only move at close (history tier)
+    metrics.inc("quotes", sum(quoted.values()))
+    metrics.write_prometheus()
+    print(f"💹 Quotes: " + ", ".join(f"{code} {n}" for code, n in quoted.items()))
+    return quoted
+
+def run_daemon(args, max_ticks=None, now_fn=None, sleep=time.sleep):
+    """
+    Tier scheduler. Quote and history tiers share the main loop (both write the shards);
+    the profile sweep runs on a background thread so it never delays a quote tick.
+    """
+    now_fn = now_fn or (lambda: datetime.now(timezone.utc))
+    catalog, _ = select_markets(MARKET_MAPPING, args.markets)
+    codes = list(catalog)
+    quote_limiter = RateLimiter(DAEMON_QUOTE_RPS)
+    profile_limiter = RateLimiter(DAEMON_PROFILE_RPS)
+    state = load_daemon_state()
+    profile_thread = None
+    print(f"🛰️  Pump daemon: {len(codes)} markets | quotes every {DAEMON_QUOTE_INTERVAL:.0f}s | "
+          f"history at session close | profiles every {DAEMON_PROFILE_INTERVAL / 3600:.0f}h")
+
+    def profile_sweep(started):
+        refresh_profiles([s for code in codes for s in catalog[code]], profile_limiter)
+        state["profileAt"] = started
+        save_daemon_state(state)
+
+    ticks = 0
+    while max_ticks is None or ticks < max_ticks:
+        tick_started = time.monotonic()
+        now = now_fn()
+        try:
+            if (profile_thread is None or not profile_thread.is_alive()) and \
+                    now.timestamp() - state.get("profileAt", 0) >= DAEMON_PROFILE_INTERVAL:
+                profile_thread = threading.Thread(target=profile_sweep, args=(now.timestamp(),), name="pump-profiles", daemon=True)
+                profile_thread.start()
+
+            due = history_due(codes, MarketShardWriter(), now)
+            if due:
+                print(f"🔔 Sessions closed: {', '.join(due)} -> history refresh")
+                main(parse_args(["--markets", ",".join(due)]))
+
+            open_codes = [code for code in codes if is_market_open(code, now)]
+            if open_codes: run_quote_tier(open_codes, quote_limiter)
+        except Exception as e:
+            print(f"❌ Daemon tick failed: {e}") # Keep the process (and its warm sessions) alive
+        ticks += 1
+        if max_ticks is None or ticks < max_ticks:
+            sleep(max(0.0, DAEMON_QUOTE_INTERVAL - (time.monotonic() - tick_started)))
+    if profile_thread is not None: profile_thread.join()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Data & chart & profile pump")
+    parser.add_argument("--markets", type=_csv_list, default=None, help="comma-separated market codes (e.g. SA,EG); default: all")
+    parser.add_argument("--only-open", action="store_true", help="skip markets outside their trading session (+ close grace window)")
+    parser.add_argument("--only-stale", type=parse_age, default=None, metavar="AGE", help="skip markets refreshed within AGE (e.g. 15m, 2h)")
+    parser.add_argument("--symbols", type=_csv_list, default=None, help="comma-separated tickers; only these are refreshed")
+    parser.add_argument("--profile", action="store_true", help="run under the sampling profiler and dump the hottest functions")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its checkpoint journal")
+    parser.add_argument("--daemon", action="store_true", help="keep running: quotes every minute, history at session close, profiles daily")
+    parser.add_argument("--export-charts", action="store_true", help="rewrite chart files from the history store without fetching (--markets/--symbols narrow it)")
+    args = parser.parse_args(argv)
+    if args.daemon and (args.symbols or args.only_open or args.only_stale is not None):
+        parser.error("--daemon schedules its own refreshes; only --markets applies")
+    if args.export_charts and (args.daemon or args.resume or args.only_open or args.only_stale is not None):
+        parser.error("--export-charts only reads the history store; only --markets/--symbols apply")
+    unknown = [m for m in args.markets or [] if m not in MARKET_MAPPING]
+    if unknown: parser.error(f"unknown market(s): {', '.join(unknown)} (choose from {', '.join(MARKET_MAPPING)})")
+    return args
+
+def relabel(row, code):
+    """A row fetched under its home market, as listed by market `code`."""
+    if row.get("category") == code: return row
+    return dict(row, category=code, country=get_country_flag(code))
+
+def fan_out(rows, owners):
+    """Rows fetched once -> {market: rows} for every market listing each symbol (see SymbolRegistry.plan)."""
+    by_market = {}
+    for row in rows:
+        for code in owners.get(row.get("symbol"), [row.get("category")]):
+            by_market.setdefault(code, []).append(relabel(row, code))
+    return by_market
+
+def restore_from_journal(journaled, mapping):
+    """
+    Split the selection into journaled rows and what still has to be fetched:
+    ({market: rows restored}, {market: pending tickers}). Restored symbols' histories
+    are staged back from their chart files, so the history store commit sees them.
+    """
+    restored, pending = {}, {}
+    done = {symbol: row for rows in journaled.values() for symbol, row in rows.items()} # Journaled under the home market
+    for code, tickers in mapping.items():
+        restored[code] = [relabel(done[t], code) for t in tickers if t in done]
+        remaining = [t for t in tickers if t not in done]
+        if remaining: pending[code] = remaining
+    store = get_history_store()
+    for symbol in {row["symbol"] for rows in restored.values() for row in rows}:
+        df = load_chart_file(symbol)
+        if df is not None: store.stage(symbol, df)
+    return {code: rows for code, rows in restored.items() if rows}, pending
+
+def main(args=None):
+    global _artifact_writer, _journal
+    if args is None: args = parse_args([])
+    _needs_full_history.clear() # A gap/split forces one full refetch, not every later run (daemon)
     print("🚀 Starting Data & Chart & Profile Pump...")
     start_time = time.time()
-    all_data = {}
-    
-    for code, tickers in MARKET_MAPPING.items():
-        if code == 'Global' and 'US' in all_data:
-            all_data['Global'] = all_data['US']
-            continue
-            
-        data = fetch_market_data(code, tickers)
-        all_data[code] = clean_data(data)
-        print(f"✅ {code}: Processed {len(data)} stocks.")
-    
-    output_dir = "public/data"
-    os.makedirs(output_dir, exist_ok=True)
-    with open(os.path.join(output_dir, "stocks.json"), "w", encoding='utf-8') as f:
-        json.dump(all_data, f, indent=None, ensure_ascii=False)
+    shards = MarketShardWriter()
+    mapping, partial = select_markets(MARKET_MAPPING, args.markets, args.only_open, args.only_stale, args.symbols, shards)
+    if not mapping:
+        print("😴 Nothing to refresh (all selected markets closed or fresh).")
+        return
+    metrics = reset_metrics()
+    _artifact_writer = ArtifactWriter() # Fresh change list for this run
+    failed = {}
+    market_started = {}
+
+    journal = CheckpointJournal()
+    if _journal is not None: _journal.close() # Left open by a run that raised (daemon)
+    journaled = journal.load() if args.resume else {}
+    restored, pending = restore_from_journal(journaled, mapping) if journaled else ({}, mapping)
+    if journaled:
+        print(f"♻️  Resuming: {sum(len(r) for r in restored.values())} symbols restored from the journal, "
+              f"{sum(len(t) for t in pending.values())} left to fetch")
+    elif args.resume:
+        print("♻️  Nothing to resume (no unfinished run journaled); starting fresh.")
+    journal.open(resume=bool(journaled))
+    _journal = journal
+
+    # Every unique symbol is fetched once, under its home market; `feeds` tracks which
+    # home markets a shard is still waiting on before it can be written.
+    fetch_plan, owners = REGISTRY.plan(pending)
+    feeds, collected = {}, {}
+    for home, symbols in fetch_plan.items():
+        for symbol in symbols:
+            for code in owners[symbol]: feeds.setdefault(code, set()).add(home)
+    sources = {code: set(homes) for code, homes in feeds.items()} # A market's clock starts with its first home's
+
+    def market_seconds(code):
+        begun = [market_started[home] for home in sources.get(code, ()) if home in market_started]
+        return round(time.time() - min(begun, default=start_time), 3)
+
+    def market_done(code, rows):
+        # Journaled rows + fanned-out rows, back in catalog order
+        position = {t: i for i, t in enumerate(mapping[code])}
+        rows = sorted(restored.pop(code, []) + rows, key=lambda r: position.get(r.get("symbol"), len(position)))
+        # Shard goes out now; the rows aren't kept around for the rest of the run
+        if code in partial: shards.merge(code, rows)
+        else: shards.write(code, rows)
+        get_history_store().spill() # ...nor are their history frames (packed to disk until the commit)
+        metrics.inc("symbols", len(rows), market=code, outcome="ok")
+        metrics.set("market_seconds", market_seconds(code), market=code)
+        print(f"✅ {code}: Processed {len(rows)} stocks.")
+
+    def home_done(home, rows):
+        for code, code_rows in fan_out(rows, owners).items():
+            collected.setdefault(code, []).extend(code_rows)
+        for code in [c for c, homes in feeds.items() if home in homes]:
+            feeds[code].discard(home)
+            if not feeds[code]:
+                del feeds[code]
+                market_done(code, collected.pop(code, []))
     
+    # PHASE 1: batched downloads
+    with metrics.phase("fetch"):
+        for code in [c for c in restored if c not in pending]:
+            market_done(code, []) # Finished before the interruption
+        if PUMP_WORKERS > 1:
+            print(f"⚡ Concurrent mode: {PUMP_WORKERS} workers, {HOST_RATE_LIMITS[YAHOO_HOST]} req/s to Yahoo")
+            leftover = fetch_all_markets_concurrent(fetch_plan, failed=failed, on_market_done=home_done, started=market_started)
+            for home, rows in leftover.items(): home_done(home, rows)
+        else:
+            scheduler = AdaptiveScheduler() # Shared so what we learn about the upstream carries across markets
+            for home, symbols in fetch_plan.items():
+                market_started[home] = time.time()
+                home_done(home, fetch_market_data(home, symbols, scheduler, failed.setdefault(home, [])))
+
+    # PHASE 2: one parallel recovery pass for everything phase 1 missed
+    with metrics.phase("retry"):
+        recovered, retry_outcome = recover_failed_symbols(failed, get_rate_limiter(YAHOO_HOST))
+        for code, rows in fan_out([row for rows in recovered.values() for row in rows], owners).items():
+            shards.merge(code, rows)
+            print(f"✅ {code}: +{len(rows)} recovered ({shards.count(code)} stocks).")
+        for alias, target in REGISTRY.aliases.items():
+            if alias in MARKET_MAPPING and target in mapping:
+                shards.alias(alias, target) # Served from the target's shard instead of a duplicate list
+    for outcome in ("recovered", "dropped"):
+        for item in retry_outcome[outcome]:
+            metrics.inc("symbols", market=item["market"], outcome=outcome)
+
+    with metrics.phase("export"):
+        shards.finish()
+        
+        committed = get_history_store().commit()
+        print(f"🗃️  History store: {committed} symbols committed ({len(get_history_store().index)} total)")
+
+        writer = get_artifact_writer()
+        precompress_artifacts(writer)
+        writer.finish()
+        metrics.set("bytes_written", writer.bytes_written)
+        metrics.set("artifacts", len(writer.changed), state="changed")
+        metrics.set("artifacts", writer.unchanged, state="unchanged")
+
+        profile_cache = get_profile_cache()
+        if profile_cache:
+            profile_cache.save()
+            print(profile_cache.report())
+            metrics.set("profile_cache_requests", profile_cache.hits, result="hit")
+            metrics.set("profile_cache_requests", profile_cache.misses, result="miss")
+
     # --- NEW DB SYNC STEP ---
-    sync_to_db(all_data)
+    with metrics.phase("db_sync"):
+        sync_to_db(shards.iter_markets(mapping)) # Streams this run's shards back one market at a time
+
+    run_metrics = metrics.report()
+    print("⏱️  Phases: " + " | ".join(f"{name} {seconds:.1f}s" for name, seconds in run_metrics["phasesSeconds"].items()))
+    for name, stats in run_metrics["latency"].items():
+        if "count" in stats: # Unlabeled; per-market series stay in the report
+            print(f"   {name}: {stats['count']} calls, p50 {stats['p50Seconds']}s, p95 {stats['p95Seconds']}s, max {stats['maxSeconds']}s")
+
+    metrics.set("run_seconds", round(time.time() - start_time, 3))
+    write_run_report({
+        "startedAt": datetime.fromtimestamp(start_time, timezone.utc).isoformat(),
+        "durationSeconds": round(time.time() - start_time, 2),
+        "markets": list(mapping),
+        "stocks": {code: shards.count(code) for code in mapping},
+        "retry": retry_outcome,
+        "metrics": metrics.report()
+    })
+    metrics.write_prometheus()
+    journal.finish()
+    _journal = None
         
     print(f"\n🎉 PUMP COMPLETE in {time.time() - start_time:.2f}s")
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    run = run_daemon if args.daemon else run_export if args.export_charts else main
+    if args.profile:
+        with SamplingProfiler() as profiler:
+            try:
+                run(args)
+            except KeyboardInterrupt:
+                pass # Ctrl-C ends a profiled daemon and still dumps its profile
+        print(f"\n🔥 Sampling profile (saved to {PROFILE_OUTPUT_PATH}):")
+        print(profiler.dump())
+    else:
+        run(args)
@@ -0,0 +1,293 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# ==========================================
+# NEWS ARCHIVE INDEXER
+# ==========================================
+# news_archive_<MARKET>.json files are single-line JSON arrays of full scraped articles.
+# This tool streams them one article at a time (never the whole file in memory),
+# drops duplicates by URL/title hash and writes:
+#   <out>/<MARKET>/<YYYY-MM-DD>-<n>.json   full articles of one day, newest first, at most
+#                                          NEWS_SHARD_MAX_ARTICLES / NEWS_SHARD_MAX_BYTES each
+#   <out>/<MARKET>/page-<n>.json           headline index pages (no bodies), newest first
+#   <out>/manifest.json                    per market: counts, pages, newest date, shards
+# A headline entry names the shard holding its body, so a reader pages headlines first and
+# fetches one small shard only for the article it opens.
+#
+# Usage: python backend/news_indexer.py [news_archive_SA.json ...] [--out DIR]
+
+NEWS_ARCHIVE_GLOB = 'news_archive_*.json'
+NEWS_INDEX_DIR = os.environ.get('PUMP_NEWS_INDEX_DIR', 'public/data/news_index')
+NEWS_SHARD_MAX_ARTICLES = 50
+NEWS_SHARD_MAX_BYTES = 256 * 1024
+NEWS_INDEX_PAGE_SIZE = int(os.environ.get('PUMP_NEWS_PAGE_SIZE', '100'))
+READ_CHUNK_CHARS = 64 * 1024
+UNDATED = "undated"
+BODY_FIELDS = ("content",)   # left out of the headline index
+
+# ==========================================
+# STREAMING PARSER
+# ==========================================
+_WS_COMMA = re.compile(r'[\s,]*')
+
+def iter_json_array(f, chunk_chars=READ_CHUNK_CHARS):
+    """Yield the elements of a top-level JSON array from a text stream, one at a time."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    while not buf:
+        chunk = f.read(chunk_chars)
+        if not chunk: return
+        buf = chunk.lstrip()
+    if buf[0] != '[': raise ValueError("expected a JSON array")
+    pos, eof, need = 1, False, chunk_chars
+    while True:
+        pos = _WS_COMMA.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == ']': return
+        if pos < len(buf):
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # A number could still continue in the next chunk; anything else is complete
+                if end < len(buf) or eof or not isinstance(item, (int, float)):
+                    yield item
+                    pos = end
+                    continue
+            except json.JSONDecodeError:
+                if eof: raise
+        elif eof:
+            raise ValueError("unterminated JSON array")
+        # Element spans the chunk boundary: drop what's consumed, read at least one more chunk
+        buf = buf[pos:]
+        pos = 0
+        more = f.read(need)
+        if not more: eof = True
+        else:
+            buf += more
+            need = max(chunk_chars, len(buf)) # large element: grow geometrically, not chunk by chunk
+
+# ==========================================
+# ARTICLES
+# ==========================================
+
+def market_of(path):
+    """news_archive_SA.json -> SA"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.rsplit('_', 1)[-1] if '_' in name else name
+
+def parse_published(text):
+    """RFC 2822 ('Sun, 07 Dec 2025 20:32:00 GMT', 'Mon Dec 08 00:18:48 UTC 2025') or ISO -> aware UTC datetime."""
+    if not text: return None
+    try:
+        published = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        try:
+            published = datetime.fromisoformat(str(text).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if published.tzinfo is None: published = published.replace(tzinfo=timezone.utc)
+    return published.astimezone(timezone.utc)
+
+def _normalize_url(url):
+    url = (url or '').strip().lower()
+    url = re.sub(r'^https?://(www\.)?', '', url)
+    return url.split('#', 1)[0].rstrip('/')
+
+def _normalize_title(title):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', (title or '').lower()).split())
+
+def article_keys(article):
+    """Hashes an article is known by: its URL and its title (either one repeating = duplicate)."""
+    keys = []
+    for kind, value in (("url", _normalize_url(article.get("url"))), ("title", _normalize_title(article.get("title")))):
+        if value: keys.append(hashlib.sha1(f"{kind}:{value}".encode('utf-8')).hexdigest()[:16])
+    return keys
+
+class _Spool:
+    """Per-(market, day) JSONL spill files, so partitioning never holds article bodies in memory."""
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix="news-spool-")
+        self.files = {}
+
+    def append(self, key, article):
+        f = self.files.get(key)
+        if f is None:
+            f = self.files[key] = open(os.path.join(self.dir, f"{len(self.files)}.jsonl"), "w+", encoding='utf-8')
+        f.write(json.dumps(article, ensure_ascii=False) + "\n")
+
+    def read(self, key):
+        f = self.files[key]
+        f.seek(0)
+        return [json.loads(line) for line in f]
+
+    def close(self):
+        for f in self.files.values(): f.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+# ==========================================
+# OUTPUT
+# ==========================================
+
+def _write_if_changed(path, payload):
+    """Atomic JSON write that leaves an identical file untouched. Returns True if written."""
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            if f.read() == text: return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    return True
+
+def split_bounded(articles, max_articles=NEWS_SHARD_MAX_ARTICLES, max_bytes=NEWS_SHARD_MAX_BYTES):
+    """Cut an ordered article list into runs under both bounds (an oversized article gets a shard of its own)."""
+    shards, current, size = [], [], 0
+    for article in articles:
+        article_bytes = len(json.dumps(article, ensure_ascii=False).encode('utf-8')) + 1
+        if current and (len(current) >= max_articles or size + article_bytes > max_bytes):
+            shards.append(current)
+            current, size = [], 0
+        current.append(article)
+        size += article_bytes
+    if current: shards.append(current)
+    return shards
+
+_OWNED_NAME = re.compile(r'^(\d{4}-\d{2}-\d{2}-\d+|undated-\d+|page-\d+)\.json$')
+
+def load_manifest(out_dir):
+    """The previous run's manifest.json ({} if missing or not written by this tool)."""
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), "r", encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    markets = manifest.get("markets") if isinstance(manifest, dict) else None
+    if not isinstance(markets, dict) or not all(isinstance(m, dict) and "shards" in m for m in markets.values()): return {}
+    return manifest
+
+def owned_files(manifest):
+    """Relative paths of the shards and pages a manifest lists, limited to <market>/<indexer file name>."""
+    files = set()
+    for market, entry in manifest.get("markets", {}).items():
+        files.update(entry.get("shards", []))
+        files.update(f"{market}/page-{n}.json" for n in range(1, int(entry.get("pages", 0)) + 1))
+    return {rel for rel in files
+            if rel.count("/") == 1 and ".." not in rel and _OWNED_NAME.match(rel.split("/")[1])}
+
+def _sort_key(entry):
+    return entry.get("publishedAt") or ""
+
+def build_index(archives, out_dir=NEWS_INDEX_DIR, page_size=NEWS_INDEX_PAGE_SIZE,
+                max_articles=NEWS_SHARD_MAX_ARTICLES, max_bytes=NEWS_SHARD_MAX_BYTES):
+    """Stream `archives` into day shards + headline pages under `out_dir`. Returns the manifest."""
+    previous = load_manifest(out_dir)
+    if not previous and os.path.exists(os.path.join(out_dir, "manifest.json")):
+        raise ValueError(f"{out_dir}/manifest.json was not written by the news indexer; pick another --out")
+    seen = set()
+    headlines = {}     # market -> {day: [metadata]}; bodies stay in the spool
+    stats = {"read": 0, "duplicates": 0}
+    spool = _Spool()
+    try:
+        for path in archives:
+            default_market = market_of(path)
+            with open(path, "r", encoding='utf-8') as f:
+                for article in iter_json_array(f):
+                    if not isinstance(article, dict): continue
+                    stats["read"] += 1
+                    keys = article_keys(article)
+                    if not keys or any(k in seen for k in keys):
+                        stats["duplicates"] += 1
+                        continue
+                    seen.update(keys)
+
+                    market = article.get("country") or default_market
+                    published = parse_published(article.get("published_at"))
+                    day = published.strftime('%Y-%m-%d') if published else UNDATED
+                    meta = {k: v for k, v in article.items() if k not in BODY_FIELDS}
+                    meta["id"] = keys[0]
+                    meta["publishedAt"] = published.isoformat() if published else None
+                    spool.append((market, day), dict(article, id=meta["id"], publishedAt=meta["publishedAt"]))
+                    headlines.setdefault(market, {}).setdefault(day, []).append(meta)
+
+        written, kept = 0, set()
+        manifest = {"generatedAt": datetime.now(timezone.utc).isoformat(), "markets": {}}
+        for market in sorted(headlines):
+            market_dir = os.path.join(out_dir, market)
+            entries, shard_paths = [], []
+            # Newest day first; undated articles last
+            for day in sorted(headlines[market], key=lambda d: (d != UNDATED, d), reverse=True):
+                articles = sorted(spool.read((market, day)), key=_sort_key, reverse=True)
+                order = {a["id"]: i for i, a in enumerate(articles)}
+                metas = sorted(headlines[market][day], key=lambda m: order[m["id"]])
+                start = 0
+                for n, shard in enumerate(split_bounded(articles, max_articles, max_bytes), start=1):
+                    rel = f"{market}/{day}-{n}.json"
+                    written += _write_if_changed(os.path.join(out_dir, rel), shard)
+                    kept.add(rel)
+                    shard_paths.append(rel)
+                    for meta in metas[start:start + len(shard)]: meta["shard"] = rel
+                    start += len(shard)
+                entries.extend(metas)
+
+            pages = [entries[i:i + page_size] for i in range(0, len(entries), page_size)] or [[]]
+            for n, page in enumerate(pages, start=1):
+                rel = f"{market}/page-{n}.json"
+                written += _write_if_changed(os.path.join(out_dir, rel), {
+                    "market": market, "page": n, "pages": len(pages), "articles": page
+                })
+                kept.add(rel)
+            manifest["markets"][market] = {
+                "articles": len(entries),
+                "pages": len(pages),
+                "pageSize": page_size,
+                "newest": next((e["publishedAt"] for e in entries if e["publishedAt"]), None),
+                "shards": shard_paths
+            }
+    finally:
+        spool.close()
+
+    # Shards/pages a previous run produced that this run no longer does. Only files that
+    # run listed and that carry the indexer's own names: --out may be a shared directory.
+    removed = 0
+    for rel in sorted(owned_files(previous) - kept):
+        path = os.path.join(out_dir, rel)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    manifest.update(read=stats["read"], duplicates=stats["duplicates"])
+    _write_if_changed(os.path.join(out_dir, "manifest.json"), manifest)
+    print(f"📰 News index: {stats['read']} articles read, {stats['duplicates']} duplicates dropped, "
+          f"{sum(m['articles'] for m in manifest['markets'].values())} indexed across {len(manifest['markets'])} markets "
+          f"({written} files written, {removed} removed)")
+    return manifest
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index and compact news_archive_*.json into day shards + headline pages")
+    parser.add_argument("archives", nargs="*", help=f"archive files (default: {NEWS_ARCHIVE_GLOB})")
+    parser.add_argument("--out", default=NEWS_INDEX_DIR, help="output directory")
+    parser.add_argument("--page-size", type=int, default=NEWS_INDEX_PAGE_SIZE, help="headlines per index page")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    archives = args.archives or sorted(glob.glob(NEWS_ARCHIVE_GLOB))
+    if not archives:
+        print(f"⚠️ No archives matching {NEWS_ARCHIVE_GLOB}")
+    else:
+        build_index(archives, args.out, args.page_size)
@@ -0,0 +1,126 @@
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+import gzip
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# PRE-COMPRESSED ARTIFACTS
+# ==========================================
+# After a run, every changed artifact gets compressed siblings next to it
+# (stocks.json -> stocks.json.gz / .br / .zst) so the static host can serve them
+# as-is with Content-Encoding instead of compressing per request (or not at all).
+# Compression runs once per changed file, in a process pool, at the highest level
+# that stays cheap for the file's size. Output is deterministic (gzip mtime=0), so
+# an unchanged artifact never produces a changed sibling.
+#
+# PUMP_PRECOMPRESS_FORMATS picks the encodings; br/zst are skipped when their
+# module (brotli / zstandard) is not installed.
+
+PRECOMPRESS_FORMATS = tuple(f for f in os.environ.get('PUMP_PRECOMPRESS_FORMATS', 'gz,br').split(",") if f)
+PRECOMPRESS_WORKERS = int(os.environ['PUMP_PRECOMPRESS_WORKERS']) if os.environ.get('PUMP_PRECOMPRESS_WORKERS') else None
+PRECOMPRESS_MIN_BYTES = 1024      # below ~1 KB the headers cost more than compression saves
+PRECOMPRESS_INLINE_FILES = 16     # fewer changed files than this: no pool start-up
+LARGE_FILE_BYTES = 1 << 20        # brotli 11 is ~10x slower than 9 for little gain on big files
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+BROTLI_LARGE_QUALITY = 9
+ZSTD_LEVEL = 19
+ALL_FORMATS = ("gz", "br", "zst")
+
+def available_formats(formats=PRECOMPRESS_FORMATS):
+    """Requested encodings that can actually be produced here."""
+    usable = {"gz": True, "br": brotli is not None, "zst": zstandard is not None}
+    return tuple(f for f in formats if usable.get(f))
+
+def _compress(data, fmt):
+    large = len(data) >= LARGE_FILE_BYTES
+    if fmt == "gz":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if fmt == "br":
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_LARGE_QUALITY if large else BROTLI_QUALITY)
+    if fmt == "zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unknown compression format: {fmt}")
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def compress_file(job):
+    """
+    Worker: (path, formats, min_bytes) -> (path, {"bytes": n, fmt: n, ...} or None).
+    Siblings that are missing from the result (file too small, no gain, format dropped)
+    are deleted, so a stale .gz can never outlive the JSON it was made from.
+    """
+    path, formats, min_bytes = job
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = None
+
+    sizes = {"bytes": len(data)} if data is not None else None
+    for fmt in ALL_FORMATS:
+        sibling = f"{path}.{fmt}"
+        if sizes is not None and fmt in formats and len(data) >= min_bytes:
+            packed = _compress(data, fmt)
+            if len(packed) < len(data):
+                _write_atomic(sibling, packed)
+                sizes[fmt] = len(packed)
+                continue
+        if os.path.exists(sibling): os.remove(sibling)
+    return path, sizes
+
+def precompress(paths, formats=None, workers=PRECOMPRESS_WORKERS, min_bytes=PRECOMPRESS_MIN_BYTES):
+    """Build compressed siblings for `paths`. Returns {path: sizes or None (file gone)}."""
+    formats = available_formats(PRECOMPRESS_FORMATS if formats is None else formats)
+    jobs = [(path, formats, min_bytes) for path in dict.fromkeys(paths)]
+    if len(jobs) < PRECOMPRESS_INLINE_FILES:
+        return dict(map(compress_file, jobs))
+    chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(compress_file, jobs, chunksize=chunksize))
+
+def update_manifest(manifest, results, root):
+    """Fold precompress() results into a {relative path: sizes} manifest (in place)."""
+    for path, sizes in results.items():
+        key = os.path.relpath(path, root)
+        if sizes and len(sizes) > 1:
+            manifest[key] = sizes
+        else:
+            manifest.pop(key, None)
+    return manifest
+
+def summarize(results):
+    """(files, raw bytes, {fmt: compressed bytes}) over the files that got siblings."""
+    files, raw, packed = 0, 0, {}
+    for sizes in results.values():
+        if not sizes or len(sizes) == 1: continue
+        files += 1
+        raw += sizes["bytes"]
+        for fmt in ALL_FORMATS:
+            if fmt in sizes: packed[fmt] = packed.get(fmt, 0) + sizes[fmt]
+    return files, raw, packed
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            return json.load(f).get("files", {})
+    except Exception:
+        return {}
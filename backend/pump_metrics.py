@@ -0,0 +1,249 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# ==========================================
+# PUMP INSTRUMENTATION
+# ==========================================
+# One process-wide Metrics registry:
+#   phase(name)                 wall time of a pump phase (fetch, retry, export, db_sync, ...)
+#   timer(name, **labels)       latency histogram of a repeated operation (download, info, save_chart, ...)
+#   inc(name, value, **labels)  counters (symbols by outcome, ...)
+#   set(name, value, **labels)  gauges (bytes written, per-market wall time, ...)
+# report() feeds the JSON run report; to_prometheus() renders a node_exporter textfile.
+
+PROM_TEXTFILE_PATH = os.environ.get('PUMP_PROM_TEXTFILE', '.cache/pump_metrics.prom')
+PROFILE_OUTPUT_PATH = os.environ.get('PUMP_PROFILE_OUTPUT', '.cache/pump_profile.txt')
+PROFILE_INTERVAL_SECONDS = float(os.environ.get('PUMP_PROFILE_INTERVAL', '0.005'))
+
+# Seconds; covers a 1ms JSON write up to a throttled 30s download
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def _label_text(labels):
+    if not labels: return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus semantics: cumulative `le` buckets)."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-th observation, capped at the observed max."""
+        if not self.count: return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sumSeconds": round(self.sum, 4),
+            "meanSeconds": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50Seconds": round(self.quantile(0.5), 4),
+            "p95Seconds": round(self.quantile(0.95), 4),
+            "maxSeconds": round(self.max, 4)
+        }
+
+class Metrics:
+    """Thread-safe registry for phases, latency histograms, counters and gauges."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None: hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    # ---- export ----
+    @staticmethod
+    def _nest(items, value_fn):
+        out = {}
+        for (name, labels), value in sorted(items):
+            if labels:
+                out.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value_fn(value)
+            else:
+                out[name] = value_fn(value)
+        return out
+
+    def report(self):
+        with self.lock:
+            return {
+                "phasesSeconds": {k: round(v, 3) for k, v in self.phases.items()},
+                "latency": self._nest(self.histograms.items(), Histogram.summary),
+                "counters": self._nest(self.counters.items(), lambda v: v),
+                "gauges": self._nest(self.gauges.items(), lambda v: v)
+            }
+
+    def to_prometheus(self, prefix="pump"):
+        lines = []
+        with self.lock:
+            lines.append(f"# TYPE {prefix}_phase_seconds gauge")
+            for name, seconds in self.phases.items():
+                lines.append(f'{prefix}_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+
+            for (name, labels), hist in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}_seconds"
+                if f"# TYPE {metric} histogram" not in lines: lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {hist.sum:.6f}")
+                lines.append(f"{metric}_count{_label_text(labels)} {hist.count}")
+
+            for kind, items in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in sorted(items.items()):
+                    metric = f"{prefix}_{name}_total" if kind == "counter" else f"{prefix}_{name}"
+                    if f"# TYPE {metric} {kind}" not in lines: lines.append(f"# TYPE {metric} {kind}")
+                    lines.append(f"{metric}{_label_text(labels)} {value}")
+
+            lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+            lines.append(f"{prefix}_last_run_timestamp_seconds {self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=PROM_TEXTFILE_PATH):
+        """Atomic write, so the textfile collector never scrapes a half-written file."""
+        if not path: return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+def reset_metrics():
+    """Fresh registry for a new run."""
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+# ==========================================
+# SAMPLING PROFILER (--profile)
+# ==========================================
+# Leaf frames in these files are parked pool workers / lock waits, not work
+IDLE_FILES = ("threading.py", "queue.py", "thread.py", "selectors.py")
+
+class SamplingProfiler:
+    """
+    Stdlib-only wall-clock sampler: a background thread snapshots every thread's
+    stack via sys._current_frames() each `interval` seconds and counts the functions
+    on it. Overhead stays flat regardless of how many calls the pump makes.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.own = Counter()        # samples where the function was executing (leaf frame)
+        self.inclusive = Counter()  # samples where the function was anywhere on the stack
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me or os.path.basename(frame.f_code.co_filename) in IDLE_FILES: continue
+                self.samples += 1
+                self.own[self._label(frame.f_code)] += 1
+                seen = set()
+                while frame is not None:
+                    label = self._label(frame.f_code)
+                    if label not in seen:
+                        self.inclusive[label] += 1
+                        seen.add(label)
+                    frame = frame.f_back
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="pump-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def render(self, top=25):
+        if not self.samples: return "No samples collected."
+        lines = [f"{self.samples} stack samples every {self.interval * 1000:.0f}ms (busy threads only)", ""]
+        for title, counter in (("Hottest functions (self)", self.own), ("Hottest functions (inclusive)", self.inclusive)):
+            lines.append(title)
+            for label, count in counter.most_common(top):
+                lines.append(f"  {100.0 * count / self.samples:6.2f}%  {label}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def dump(self, path=PROFILE_OUTPUT_PATH, top=25):
+        text = self.render(top)
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        return text
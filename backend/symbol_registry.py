@@ -0,0 +1,112 @@
+import json
+import os
+from collections import Counter
+
+# ==========================================
+# SYMBOL REGISTRY
+# ==========================================
+# The market catalog lives in data/symbol_registry.json, not in code:
+#   {"markets": {"SA": {"name", "flag", "symbols": [...], "indices": [...]}, "Global": {"aliasOf": "US"}, ...}}
+# Market order and each market's symbol order are the catalog order (shards keep it).
+# "indices" only lists index symbols without the usual ^ prefix (e.g. FTSEMIB.MI).
+#
+# A symbol may be listed by several markets. It is fetched once, under its home market
+# (the first market listing it), and its row is fanned back out to every other listing.
+# Symbols are indexed by market, exchange and asset type. The exchange is the Yahoo
+# suffix (2222.SR -> SR); suffix-less symbols (^CASE30, AAPL) take their home market's
+# main suffix, so an index batches with its constituents.
+
+REGISTRY_PATH = os.environ.get('PUMP_SYMBOL_REGISTRY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbol_registry.json'))
+
+def _suffix(symbol):
+    base = symbol.lstrip('^')
+    return base.rsplit('.', 1)[1].upper() if '.' in base else ''
+
+class SymbolRegistry:
+    """Market catalog indexed by market, exchange and asset type, with fetch planning."""
+    def __init__(self, markets, timezones=None):
+        self.markets = markets
+        self.timezones = timezones or {}
+        self.aliases = {code: spec["aliasOf"] for code, spec in markets.items() if spec.get("aliasOf")}
+        self.by_market = {}
+        self.home = {}
+        self.listings = {}
+        explicit_indices = set()
+        for code, spec in markets.items():
+            if code in self.aliases: continue
+            symbols = list(dict.fromkeys(spec.get("symbols", [])))
+            self.by_market[code] = symbols
+            explicit_indices.update(spec.get("indices", []))
+            for symbol in symbols:
+                self.home.setdefault(symbol, code)
+                self.listings.setdefault(symbol, []).append(code)
+
+        # Suffix-less symbols inherit their home market's most common suffix
+        self.main_suffix = {
+            code: (Counter(s for s in map(_suffix, symbols) if s).most_common(1) or [("", 0)])[0][0]
+            for code, symbols in self.by_market.items()
+        }
+        self.by_exchange = {}
+        self.by_type = {"index": [], "equity": []}
+        for symbol, code in self.home.items():
+            self.by_exchange.setdefault(self.exchange(symbol), []).append(symbol)
+            self.by_type["index" if symbol.startswith('^') or symbol in explicit_indices else "equity"].append(symbol)
+        self._index_symbols = set(self.by_type["index"])
+
+    @classmethod
+    def load(cls, path=REGISTRY_PATH, timezones=None):
+        with open(path, "r", encoding='utf-8') as f:
+            return cls(json.load(f)["markets"], timezones)
+
+    # ---- lookups ----
+    def mapping(self):
+        """{market: symbols} in catalog order; aliases share their target's list."""
+        return {code: self.by_market[self.aliases.get(code, code)] for code in self.markets}
+
+    def flags(self):
+        return {code: spec["flag"] for code, spec in self.markets.items() if spec.get("flag")}
+
+    def exchange(self, symbol, market=None):
+        suffix = _suffix(symbol)
+        if suffix: return suffix
+        return self.main_suffix.get(market or self.home.get(symbol), '')
+
+    def asset_type(self, symbol):
+        return "index" if symbol in self._index_symbols or symbol.startswith('^') else "equity"
+
+    def symbols(self, market=None, exchange=None, asset_type=None):
+        """Unique symbols matching every given filter, in catalog order."""
+        pool = self.by_market.get(self.aliases.get(market, market), []) if market else list(self.home)
+        return [s for s in pool
+                if (exchange is None or self.exchange(s) == exchange)
+                and (asset_type is None or self.asset_type(s) == asset_type)]
+
+    def group(self, symbol, market=None):
+        """(timezone, exchange) download group: one batch never mixes two trading calendars."""
+        home = market or self.home.get(symbol)
+        return (self.timezones.get(home), self.exchange(symbol, home))
+
+    # ---- planning ----
+    def plan(self, selection):
+        """
+        Fetch plan for a selection {market: tickers} -> (fetch, owners).
+        fetch  = {home market: symbols}, every unique symbol exactly once, with each
+                 (timezone, exchange) group contiguous (in order of first appearance);
+        owners = {symbol: [selected markets listing it]} for fanning rows back out.
+        """
+        owners = {}
+        for code, tickers in selection.items():
+            if code in self.aliases: continue
+            for symbol in dict.fromkeys(tickers):
+                owners.setdefault(symbol, []).append(code)
+
+        fetch = {}
+        for symbol, markets in owners.items():
+            home = self.home.get(symbol)
+            fetch.setdefault(home if home in markets else markets[0], []).append(symbol)
+
+        for home, symbols in fetch.items():
+            first_seen = {}
+            for symbol in symbols: first_seen.setdefault(self.group(symbol, home), len(first_seen))
+            symbols.sort(key=lambda s: first_seen[self.group(s, home)]) # stable: catalog order within a group
+        return fetch, owners
@@ -0,0 +1,282 @@
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+from data_sources import ReplayProvider, set_provider
+from analytics import compute_analytics
+
+# ==========================================
+# OFFLINE PUMP BENCHMARKS
+# ==========================================
+# Synthetic OHLCV histories and .info dicts at a chosen scale (10 .. 10,000 symbols,
+# 1 .. 10 years) drive the pump's hot paths with no network:
+#   clean_data, compute_analytics (one run-wide panel), analytics_per_batch (what
+#   fetch_batch does: one panel per BATCH_SIZE download batch), save_chart_data, save_profile_data,
+#   db_records (what sync_to_db prepares before COPY), db_history_records,
+#   fetch_market_data (end to end, served by a ReplayProvider over recorded fixtures)
+# Every benchmark runs `repeat` times in a fresh scratch directory (so change
+# detection never skips a write) and keeps the best time.
+#
+# Results are compared with a baseline per scale, committed in scripts/bench_baseline.json
+# so a fresh checkout has one. A benchmark slower than baseline * (1 + threshold) is a
+# regression and the script exits 1; so does a scale with no baseline, unless
+# --save-baseline asks to record this run as it.
+#
+#   python scripts/bench_pump.py --symbols 500 --years 2            # run + compare
+#   python scripts/bench_pump.py --symbols 500 --years 2 --save-baseline
+
+BASELINE_PATH = os.environ.get('PUMP_BENCH_BASELINE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json'))
+RESULTS_PATH = os.environ.get('PUMP_BENCH_RESULTS', '.cache/bench_results.json')
+DEFAULT_THRESHOLD = 0.25
+THRESHOLDS = {
+    "fetch_market_data": 0.40,   # threads + disk: the noisiest number here
+    "save_chart_data": 0.35,
+}
+MIN_REGRESSION_SECONDS = 0.005   # below this, differences are timer noise
+MARKET = "US"
+SESSIONS_PER_YEAR = 252
+
+# ---- synthetic data ----
+def make_history(years, seed):
+    rng = np.random.default_rng(seed)
+    days = max(2, int(SESSIONS_PER_YEAR * years))
+    index = pd.bdate_range(end="2025-06-30", periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    spread = close * rng.uniform(0.002, 0.02, days)
+    df = pd.DataFrame({
+        "Open": close + rng.normal(0, 0.5, days) * spread, "High": close + spread, "Low": close - spread,
+        "Close": close, "Volume": rng.integers(1_000, 5_000_000, days).astype(float)
+    }, index=index)
+    # The holes upstream really sends
+    holes = rng.integers(0, days, max(1, days // 200))
+    df.iloc[holes, rng.integers(0, 5)] = np.nan
+    return df
+
+def make_info(symbol, seed):
+    """A .info-shaped dict with every field the profile cache knows about, plus the usual noise."""
+    rng = np.random.default_rng(seed)
+    info = {}
+    for group, keys in ingest_master.PROFILE_FIELD_GROUPS.items():
+        for key in keys:
+            info[key] = f"{key} of {symbol} " * (20 if key == 'longBusinessSummary' else 1) if group == 'static' else float(rng.normal())
+    info.update({
+        "marketCap": int(rng.integers(10**8, 10**12)), "trailingPE": float(rng.uniform(5, 60)),
+        "forwardPE": float("nan"), "dividendYield": float(rng.uniform(0, 0.06)), "beta": float("inf"),
+        "recommendationTrend": [{"period": f"-{m}m", "strongBuy": m, "buy": 3, "hold": 2, "sell": 0} for m in range(4)],
+        "companyOfficers": [{"name": f"Officer {m}", "title": "Director", "totalPay": float(m) * 1e6, "age": 50 + m} for m in range(8)],
+    })
+    info.update({f"extra{k}": float(rng.normal()) for k in range(40)}) # .info carries ~150 keys
+    return info
+
+class SyntheticProvider:
+    """In-memory upstream; only used to record the replay fixtures."""
+    name = "synthetic"
+
+    def __init__(self, frames, infos):
+        self.frames = frames
+        self.infos = infos
+
+    def download(self, symbols, period="1y", start=None):
+        return pd.concat({s: self.frames[s] for s in symbols if s in self.frames}, axis=1)
+
+    def history(self, symbol, period="1y", start=None):
+        return self.frames.get(symbol, pd.DataFrame())
+
+    def info(self, symbol):
+        return self.infos.get(symbol, {})
+
+def make_dataset(symbols, years, seed=0):
+    names = [f"SYN{i:05d}" for i in range(symbols)]
+    frames = {s: make_history(years, seed + i) for i, s in enumerate(names)}
+    infos = {s: make_info(s, seed + i) for i, s in enumerate(names)}
+    return names, frames, infos
+
+def record_fixtures(fixture_dir, frames, infos):
+    recorder = ReplayProvider(fixture_dir, mode="record", upstream=SyntheticProvider(frames, infos))
+    symbols = list(frames)
+    for i in range(0, len(symbols), 500):
+        recorder.download(symbols[i:i + 500])
+    for symbol in symbols:
+        recorder.info(symbol)
+
+# ---- harness ----
+def reset_pump_state():
+    """Forget every process-wide cache, so each repeat starts cold."""
+    ingest_master._artifact_writer = ingest_master.ArtifactWriter()
+    ingest_master._profile_cache = None
+    ingest_master._needs_full_history.clear()
+    history_store._store = None
+
+@contextmanager
+def scratch_dir():
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix="pump-bench-")
+    os.chdir(path)
+    try:
+        reset_pump_state()
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+def best_of(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        with scratch_dir():
+            state = setup() if setup else None
+            start = time.perf_counter()
+            fn(state)
+            times.append(time.perf_counter() - start)
+    return min(times)
+
+def run_suite(symbols=100, years=1, repeat=3, latency=0.0, only=None, seed=0):
+    """Run every benchmark (or `only` those names). Returns the results dict."""
+    names, frames, infos = make_dataset(symbols, years, seed)
+    analytics = compute_analytics(frames)
+    quotes = {s: ingest_master.build_quote(frames[s]) for s in names}
+    rows = [
+        dict(ingest_master.clean_data({"symbol": s, "name": infos[s]["shortName"], "price": quotes[s]["price"],
+                                       "changePercent": quotes[s]["changePercent"], "volume": quotes[s]["volume"],
+                                       "marketCap": infos[s]["marketCap"], "peRatio": infos[s]["trailingPE"],
+                                       "dividendYield": infos[s]["dividendYield"], "previousClose": quotes[s]["previousClose"]}),
+             **{k: analytics[s][k] for k in ("fiftyTwoWeekHigh", "fiftyTwoWeekLow")})
+        for s in names
+    ]
+
+    def stage_histories():
+        store = history_store.get_history_store()
+        for s in names: store.stage(s, frames[s])
+        store.commit()
+
+    fixture_dir = tempfile.mkdtemp(prefix="pump-bench-fixtures-")
+    record_fixtures(fixture_dir, frames, infos)
+    replay = ReplayProvider(fixture_dir, mode="replay", latency=latency)
+
+    def fetch_end_to_end(_):
+        # Pacing sleeps are politeness toward Yahoo, not pump work: off for the benchmark
+        scheduler = ingest_master.AdaptiveScheduler(delay=0)
+        got = ingest_master.fetch_market_data(MARKET, names, scheduler)
+        if len(got) != len(names): raise RuntimeError(f"fetch_market_data returned {len(got)} of {len(names)} rows")
+
+    benchmarks = {
+        "clean_data": (lambda _: [ingest_master.clean_data(infos[s]) for s in names], None),
+        "compute_analytics": (lambda _: compute_analytics(frames), None),
+        "analytics_per_batch": (lambda _: [compute_analytics({s: frames[s] for s in batch})
+                                           for batch in ingest_master.plan_batches(names, ingest_master.BATCH_SIZE)], None),
+        "save_chart_data": (lambda _: [ingest_master.save_chart_data(s, frames[s]) for s in names], None),
+        "save_profile_data": (lambda _: [ingest_master.save_profile_data(s, infos[s], quotes[s], analytics[s]) for s in names], None),
+        "db_records": (lambda _: ingest_master.records_to_csv(ingest_master.build_db_records({MARKET: rows})), None),
+        "db_history_records": (lambda _: ingest_master.build_history_records(names), stage_histories),
+        "fetch_market_data": (fetch_end_to_end, None),
+    }
+    unknown = set(only or ()) - set(benchmarks)
+    if unknown: raise ValueError(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    saved_delay = ingest_master.MIN_BATCH_DELAY_SECONDS
+    ingest_master.MIN_BATCH_DELAY_SECONDS = 0
+    set_provider(replay)
+    results = {}
+    try:
+        for name, (fn, setup) in benchmarks.items():
+            if only and name not in only: continue
+            seconds = best_of(fn, repeat, setup)
+            results[name] = {"seconds": round(seconds, 5), "perSymbolMs": round(seconds / len(names) * 1000, 4)}
+            print(f"⏱️  {name:<20} {seconds * 1000:9.1f}ms  ({results[name]['perSymbolMs']:.3f}ms / symbol)")
+    finally:
+        ingest_master.MIN_BATCH_DELAY_SECONDS = saved_delay
+        set_provider(None)
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    return {
+        "scale": scale_key(symbols, years),
+        "symbols": symbols,
+        "years": years,
+        "repeat": repeat,
+        "replayLatencySeconds": latency,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results
+    }
+
+# ---- baseline ----
+def scale_key(symbols, years):
+    return f"{symbols}x{years:g}y"
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_json(payload, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+def compare(results, baseline, threshold=None):
+    """[(name, baseline seconds, current seconds, allowed ratio)] for every regressed benchmark."""
+    reference = baseline.get(results["scale"], {}).get("benchmarks", {})
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        base = reference.get(name)
+        if base is None: continue
+        allowed = 1 + (threshold if threshold is not None else THRESHOLDS.get(name, DEFAULT_THRESHOLD))
+        if current["seconds"] > base["seconds"] * allowed and current["seconds"] - base["seconds"] > MIN_REGRESSION_SECONDS:
+            regressions.append((name, base["seconds"], current["seconds"], allowed))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pump benchmarks with a regression baseline")
+    parser.add_argument("--symbols", type=int, default=100, help="synthetic symbols (10 .. 10000)")
+    parser.add_argument("--years", type=float, default=1, help="years of daily bars per symbol (1 .. 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the best one counts")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per replayed request (end-to-end only)")
+    parser.add_argument("--only", type=lambda t: [x for x in t.split(",") if x], default=None, help="comma-separated benchmark names")
+    parser.add_argument("--threshold", type=float, default=None, help="allowed slowdown for every benchmark (default: per benchmark)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", "--update-baseline", dest="save_baseline", action="store_true",
+                        help="store this run as the baseline for its scale (commit the file)")
+    return parser.parse_args(argv)
+
+def main(args):
+    """Run, then compare with (or save) the baseline. Returns the exit code."""
+    print(f"🧪 Pump benchmarks: {args.symbols} symbols x {args.years:g} years, best of {args.repeat}")
+    results = run_suite(args.symbols, args.years, args.repeat, args.latency, args.only)
+    save_json(results, RESULTS_PATH)
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        baseline[results["scale"]] = results
+        save_json(baseline, args.baseline)
+        print(f"📌 Baseline for {results['scale']} saved to {args.baseline}")
+        return 0
+    if results["scale"] not in baseline:
+        # Nothing to compare with is a failure, not a pass: CI would never catch a regression
+        print(f"❌ No {results['scale']} baseline in {args.baseline}; run with --save-baseline and commit it")
+        return 1
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, allowed in regressions:
+        print(f"❌ {name}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms (allowed x{allowed:.2f})")
+    if regressions: return 1
+    print(f"✅ No regressions against the {results['scale']} baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
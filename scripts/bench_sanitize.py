@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+import statistics
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+
+# Per-run sanitization cost: the old pipeline walked every profile, walked every
+# stocks.json row again per market in main(), then re-checked the DB columns
+# with sanitize_for_db. Now each record is sanitized once, where it is produced
+# (clean_data, which handles plain scalars inline), and the DB takes it as is.
+#
+#   python scripts/bench_sanitize.py [stocks] [repeat]     # median of `repeat` runs
+
+def legacy_clean_data(data):
+    if isinstance(data, dict):
+        return {k: legacy_clean_data(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [legacy_clean_data(v) for v in data]
+    elif isinstance(data, float):
+        if data != data: return 0.0
+        if data == float('inf') or data == float('-inf'): return 0.0
+        return data
+    elif isinstance(data, (int, float, str, bool, type(None))):
+        return data
+    else:
+        return str(data)
+
+def legacy_sanitize_for_db(val):
+    if val is None:
+        return None
+    if isinstance(val, (float, np.float64, np.float32)):
+        if np.isnan(val) or np.isinf(val):
+            return 0.0
+        return float(val)
+    if isinstance(val, (int, np.int64, np.int32)):
+        return int(val)
+    return val
+
+DB_FIELDS = ('price', 'changePercent', 'volume', 'marketCap', 'peRatio', 'dividendYield',
+             'fiftyTwoWeekHigh', 'fiftyTwoWeekLow', 'previousClose')
+
+def make_run(stocks=400, seed=3):
+    rng = np.random.default_rng(seed)
+    rows, profiles = [], []
+    for i in range(stocks):
+        rows.append({
+            "symbol": f"SYM{i}", "name": f"Company {i}", "category": "US", "country": "🇺🇸", "sector": "General",
+            "logo": "https://example.com/logo.png", "price": np.float64(rng.random() * 100),
+            "change": float(rng.standard_normal()), "changePercent": float("nan") if i % 50 == 0 else float(rng.standard_normal()),
+            "volume": int(rng.integers(1, 10**7)), "marketCap": int(rng.integers(1, 10**12)), "peRatio": None,
+            "dividendYield": float(rng.random()), "lastUpdated": "2025-06-30T00:00:00+00:00Z"
+        })
+        profile = {f"field{k}": float(rng.random()) for k in range(70)}
+        profile.update({f"text{k}": "x" * 20 for k in range(10)})
+        profile["recommendationTrend"] = [{"period": f"-{m}m", "strongBuy": int(m), "buy": 3, "hold": 2, "sell": 0} for m in range(4)]
+        profile["companyOfficers"] = [{"name": "A", "totalPay": float(m) * 1e6, "age": 50} for m in range(8)]
+        profiles.append(profile)
+    return rows, profiles
+
+def legacy_run(rows, profiles):
+    for profile in profiles: legacy_clean_data(profile)
+    cleaned = [legacy_clean_data(r) for r in rows]             # process_symbol (via save path)
+    for _ in ("US", "Global"): legacy_clean_data(cleaned)      # main() per market, Global re-walks US
+    for r in cleaned:
+        for f in DB_FIELDS: legacy_sanitize_for_db(r.get(f, 0))
+
+def single_pass_run(rows, profiles):
+    for profile in profiles: ingest_master.clean_data(profile)   # once, in save_profile_data
+    [ingest_master.clean_data(r) for r in rows]                    # once, in process_symbol; build_db_records trusts it
+
+def cpu_seconds(fn, *args):
+    start = time.process_time()
+    fn(*args)
+    return time.process_time() - start
+
+def compare(stocks=400, repeat=25):
+    """(legacy, single-pass) median CPU seconds over `repeat` runs, interleaved so drift hits both alike."""
+    rows, profiles = make_run(stocks)
+    legacy, single = [], []
+    for _ in range(repeat):
+        legacy.append(cpu_seconds(legacy_run, rows, profiles))
+        single.append(cpu_seconds(single_pass_run, rows, profiles))
+    return statistics.median(legacy), statistics.median(single)
+
+if __name__ == "__main__":
+    stocks = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    before, after = compare(stocks, repeat)
+    print(f"🧪 Sanitize {stocks} stocks (median of {repeat}): legacy {before * 1000:.1f}ms, single-pass {after * 1000:.1f}ms "
+          f"({before / after:.1f}x, {(before - after) * 1000:.1f}ms CPU saved per run)")
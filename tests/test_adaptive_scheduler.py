@@ -0,0 +1,67 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+
+def test_throttled_batch_backs_off_once(monkeypatch):
+    waits = []
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: waits.append(seconds))
+    outcomes = iter([['A', 'B'], [], []])   # first batch comes back empty: throttled
+
+    def fake_fetch_batch(market_code, batch, limiter=None, incremental=None, failed=None, deadline=None, refetch=None):
+        missing = next(outcomes)
+        failed.extend(missing)
+        return [{"symbol": s} for s in batch if s not in missing]
+
+    monkeypatch.setattr(ingest_master, "fetch_batch", fake_fetch_batch)
+    scheduler = ingest_master.AdaptiveScheduler(batch_size=2, delay=1.0)
+    rows = ingest_master.fetch_market_data('US', ['A', 'B', 'C', 'D'], scheduler)
+
+    assert [r["symbol"] for r in rows] == ['C', 'D', 'A', 'B']
+    assert scheduler.throttle_events == 1
+    # backoff (explicit seconds) after batch 1, then the regular delay (None) before the retry round only
+    assert len([w for w in waits if w is not None]) == 1 and waits.count(None) == 1
+
+def test_merge_refetch_is_not_a_throttle(tmp_path, monkeypatch):
+    import pandas as pd
+    import history_store
+    import data_sources
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_master, "INCREMENTAL_CHARTS", True)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master, "_journal", None)
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter())
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+    monkeypatch.setattr(history_store, "_store", None)
+    ingest_master._needs_full_history.clear()
+
+    days = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=40)
+    frame = pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 1.0}, index=days)
+    monkeypatch.setattr(ingest_master, "load_chart_history", lambda symbol: frame.iloc[:20])
+
+    class GapProvider:
+        """Deltas skip ten sessions (a holiday gap for the whole market); the full year is fine."""
+        name = "fake"
+        def __init__(self): self.calls = []
+        def download(self, symbols, period="1y", start=None):
+            self.calls.append("delta" if start else "full")
+            bars = frame.iloc[30:] if start else frame
+            return pd.concat({s: bars for s in symbols}, axis=1)
+        def info(self, symbol): return {}
+
+    provider = GapProvider()
+    data_sources.set_provider(provider)
+    try:
+        scheduler = ingest_master.AdaptiveScheduler(batch_size=4)
+        rows = ingest_master.fetch_market_data('US', ['A', 'B'], scheduler)
+    finally:
+        data_sources.set_provider(None)
+
+    assert provider.calls == ["delta", "full"] and [r["symbol"] for r in rows] == ['A', 'B']
+    assert scheduler.throttle_events == 0
+    assert ingest_master._needs_full_history == {'A', 'B'}
+    ingest_master.main(ingest_master.parse_args(["--markets", "US", "--symbols", "ZZZ"]))  # nothing selected
+    assert ingest_master._needs_full_history == set()   # a new run starts clean
@@ -0,0 +1,51 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import analytics
+
+def make_history(days, end="2025-06-30", seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=end, periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(1_000, 1_000_000, days).astype(float)}, index=index)
+
+def test_panel_metrics_match_per_symbol_pandas():
+    frames = {"LONG": make_history(300, seed=1), "SHORT": make_history(40, seed=2), "LAGGING": make_history(251, end="2025-06-20", seed=3)}
+    frames["LONG"].iloc[-3, 3] = np.nan  # a hole in the closes
+    result = analytics.compute_analytics(frames)
+
+    df = frames["LONG"]
+    year = df[df.index > df.index[-1] - pd.Timedelta(days=365)]
+    got = result["LONG"]
+    assert got["previousClose"] == pytest.approx(df["Close"].iloc[-2])
+    assert got["fiftyTwoWeekHigh"] == pytest.approx(year["High"].max())
+    assert got["fiftyTwoWeekLow"] == pytest.approx(year["Low"].min())
+    assert got["fiftyTwoWeekChange"] == pytest.approx(df["Close"].iloc[-1] / year["Close"].iloc[0] - 1)
+    assert got["fiftyDayAverage"] == pytest.approx(df["Close"].iloc[-50:].mean())
+    assert got["twoHundredDayAverage"] == pytest.approx(df["Close"].iloc[-200:].mean())
+    assert got["averageVolume"] == pytest.approx(df["Volume"].iloc[-63:].mean())
+    assert got["return1m"] == pytest.approx(df["Close"].iloc[-1] / df["Close"].iloc[-22] - 1)
+    log_returns = np.log(df["Close"].iloc[-22:]).diff().dropna()
+    assert got["volatility30d"] == pytest.approx(log_returns.std() * np.sqrt(252))
+
+    lagging = frames["LAGGING"]
+    assert result["LAGGING"]["fiftyDayAverage"] == pytest.approx(lagging["Close"].iloc[-50:].mean())
+
+    # Not enough history -> None rather than a misleading partial window
+    assert result["SHORT"]["twoHundredDayAverage"] is None
+    assert result["SHORT"]["return3m"] is None
+    assert result["SHORT"]["fiftyTwoWeekHigh"] == pytest.approx(frames["SHORT"]["High"].max())
+    assert set(result["SHORT"]) == set(analytics.ANALYTICS_FIELDS)
+
+def test_empty_and_tz_aware_input():
+    assert analytics.compute_analytics({}) == {}
+    df = make_history(30)
+    df.index = df.index.tz_localize("Asia/Riyadh")
+    assert analytics.compute_analytics({"X": df})["X"]["previousClose"] == pytest.approx(df["Close"].iloc[-2])
@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+from datetime import datetime, timedelta, timezone
+
+# audit_lake.py lives at the repo root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import audit_lake
+import ingest_master
+
+NOW = datetime(2025, 7, 2, tzinfo=timezone.utc)
+
+def bar(date, price=10.0):
+    return {"date": date, "price": price, "open": price, "high": price, "low": price, "volume": 100}
+
+def test_audit_chart_flags_order_nan_and_zero_bars():
+    errors, warnings, last = audit_lake.audit_chart({"quotes": [bar("2025-06-30"), bar("2025-06-27"), bar("2025-07-01", float("nan")), bar("2025-07-02", 0)]})
+    assert any(e.startswith("dates:") for e in errors)
+    assert any(e.startswith("nan:") for e in errors)
+    assert "zero: latest bar has a 0 price" in warnings
+    assert last == "2025-07-02"
+    assert audit_lake.audit_chart({"quotes": [bar("2025-06-30"), bar("2025-07-01")]})[:2] == ([], [])
+
+def test_profile_staleness_uses_last_updated():
+    profile = {"symbol": "AAPL", "name": "Apple", "sector": "Technology", "currency": "USD",
+               "marketCap": 0, "description": "x" * 60, "lastUpdated": "2025-06-20T08:00:00+00:00Z"}
+    errors, warnings, ts = audit_lake.audit_profile(profile)
+    assert errors == [] and warnings == ["basic: no marketCap"]   # marketCap 0 is not "rich"
+    assert audit_lake.staleness({"kind": "profile", "errors": [], "timestamp": ts}, NOW).startswith("stale:")
+    assert audit_lake.staleness({"kind": "chart", "errors": [], "timestamp": "2025-07-01"}, NOW) is None
+
+def test_full_audit_only_rechecks_changed_files(tmp_path, monkeypatch):
+    charts = tmp_path / "charts"
+    charts.mkdir()
+    for sym in ("AAA", "BBB"):
+        (charts / f"{sym}.json").write_text(json.dumps({"quotes": [bar("2025-06-30"), bar("2025-07-01")]}))
+    monkeypatch.setattr(audit_lake, "CHART_GLOB", str(charts / "*.json"))
+    monkeypatch.setattr(audit_lake, "PROFILE_GLOB", str(tmp_path / "none" / "*.json"))
+    kwargs = dict(workers=2, report_path=str(tmp_path / "report.json"), manifest_path=str(tmp_path / "manifest.json"), now=NOW)
+
+    report = audit_lake.full_audit(**kwargs)
+    assert report["ok"] and report["audited"] == 2
+
+    (charts / "BBB.json").write_text("{not json")
+    report = audit_lake.full_audit(**kwargs)
+    assert report["audited"] == 1 and report["cached"] == 1
+    assert not report["ok"]
+    assert list(report["files"]) == [str(charts / "BBB.json")]
+    assert json.load(open(tmp_path / "report.json"))["summary"]["chart"]["errors"] == 1
+
+def test_unchanged_profile_is_fresh_by_its_last_regeneration(tmp_path, monkeypatch):
+    profiles = tmp_path / "profiles"
+    path = str(profiles / "AAPL.json")
+    profile = {"symbol": "AAPL", "name": "Apple", "sector": "Technology", "currency": "USD",
+               "marketCap": 1, "description": "x" * 60, "lastUpdated": "2025-06-20T08:00:00+00:00Z"}
+    writer = ingest_master.ArtifactWriter(hashes_path=str(tmp_path / "cache" / "hashes.json"), manifest_path=str(tmp_path / "changes.json"))
+    writer.write(path, profile, volatile_keys=ingest_master.VOLATILE_KEYS)
+    writer.finish()
+    # Refetched today with the same content: the file (and its lastUpdated) is left as it was
+    writer = ingest_master.ArtifactWriter(hashes_path=str(tmp_path / "cache" / "hashes.json"), manifest_path=str(tmp_path / "changes.json"))
+    assert not writer.write(path, dict(profile, lastUpdated="2025-07-01T08:00:00+00:00Z"), volatile_keys=ingest_master.VOLATILE_KEYS)
+    writer.finish()
+    assert json.load(open(path))["lastUpdated"] == profile["lastUpdated"]
+
+    monkeypatch.setattr(audit_lake, "CHART_GLOB", str(tmp_path / "none" / "*.json"))
+    monkeypatch.setattr(audit_lake, "PROFILE_GLOB", str(profiles / "*.json"))
+    kwargs = dict(workers=1, report_path=None, manifest_path=str(tmp_path / "manifest.json"),
+                  now=datetime.now(timezone.utc) + timedelta(days=3))
+    assert audit_lake.full_audit(fetched_path=str(tmp_path / "cache" / "artifact_fetched.json"), **kwargs)["summary"]["profile"]["stale"] == 0
+    assert audit_lake.full_audit(fetched_path=str(tmp_path / "none.json"), use_cache=False, **kwargs)["summary"]["profile"]["stale"] == 1
@@ -0,0 +1,39 @@
+import sys
+import os
+
+# Add scripts (and, through it, backend) to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import bench_pump
+
+def test_suite_runs_offline_at_small_scale(tmp_path):
+    cwd = os.getcwd()
+    results = bench_pump.run_suite(symbols=10, years=1, repeat=1)
+    assert os.getcwd() == cwd
+    assert results["scale"] == "10x1y"
+    assert set(results["benchmarks"]) == {"clean_data", "compute_analytics", "analytics_per_batch", "save_chart_data", "save_profile_data",
+                                          "db_records", "db_history_records", "fetch_market_data"}
+    assert all(b["seconds"] > 0 for b in results["benchmarks"].values())
+
+def test_compare_flags_only_real_regressions():
+    def run(**seconds):
+        return {"scale": "10x1y", "benchmarks": {k: {"seconds": v} for k, v in seconds.items()}}
+    baseline = {"10x1y": run(clean_data=0.100, save_chart_data=0.100, db_records=0.001)}
+    current = run(clean_data=0.130, save_chart_data=0.130, db_records=0.003, new_bench=1.0)
+    assert [r[0] for r in bench_pump.compare(current, baseline)] == ["clean_data"]   # chart allows 35%; 2ms is noise
+    assert [r[0] for r in bench_pump.compare(current, baseline, threshold=0.5)] == []
+    assert bench_pump.compare(current, {}) == []
+
+def test_missing_baseline_fails_unless_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bench_pump, "RESULTS_PATH", str(tmp_path / "results.json"))
+    argv = ["--symbols", "10", "--repeat", "1", "--only", "clean_data", "--baseline", str(tmp_path / "baseline.json")]
+    assert bench_pump.main(bench_pump.parse_args(argv)) == 1
+    assert not os.path.exists(tmp_path / "baseline.json")
+    assert bench_pump.main(bench_pump.parse_args(argv + ["--save-baseline"])) == 0
+    assert bench_pump.main(bench_pump.parse_args(argv + ["--threshold", "100"])) == 0
+
+def test_committed_baseline_covers_the_default_scale():
+    args = bench_pump.parse_args([])
+    assert args.baseline == os.path.join(os.path.dirname(bench_pump.__file__), "bench_baseline.json")
+    assert bench_pump.scale_key(args.symbols, args.years) in bench_pump.load_baseline(args.baseline)
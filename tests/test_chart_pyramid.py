@@ -0,0 +1,64 @@
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import chart_pyramid
+import ingest_master
+
+def make_history(days=260, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=days)
+    close = 100 + rng.standard_normal(days).cumsum()
+    return pd.DataFrame({"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": rng.integers(1_000, 1_000_000, days).astype(float)}, index=index)
+
+def test_weekly_and_monthly_bars_match_per_period_loop():
+    df = make_history()
+    for freq in ("W-SAT", "M"):
+        bars = chart_pyramid.aggregate_ohlcv(df, freq)
+        for (_, period), (date, bar) in zip(df.groupby(df.index.to_period(freq)), bars.iterrows()):
+            assert date == period.index[-1]
+            assert bar["Open"] == period["Open"].iloc[0] and bar["Close"] == period["Close"].iloc[-1]
+            assert bar["High"] == period["High"].max() and bar["Low"] == period["Low"].min()
+            assert bar["Volume"] == period["Volume"].sum()
+    assert len(chart_pyramid.aggregate_ohlcv(df, "M")) == 12  # Jul 2024 .. Jun 2025
+
+def test_sunday_to_thursday_sessions_share_a_week():
+    index = pd.to_datetime(["2025-06-29", "2025-06-30", "2025-07-01", "2025-07-02", "2025-07-03", "2025-07-06"]) # Sun..Thu, Sun
+    df = pd.DataFrame({"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": 1.5, "Volume": 10.0}, index=index)
+    weekly = chart_pyramid.aggregate_ohlcv(df, chart_pyramid.WEEK_FREQ)
+    assert [d.strftime('%Y-%m-%d') for d in weekly.index] == ["2025-07-03", "2025-07-06"]
+    assert weekly["Volume"].tolist() == [50.0, 10.0]
+
+def test_thumbnail_keeps_extremes_and_endpoints():
+    df = make_history(500)
+    df.iloc[123, 3] = 1000.0   # spike
+    df.iloc[321, 3] = -1000.0  # trough
+    df.iloc[7, 3] = np.nan
+    thumb = chart_pyramid.thumbnail(df, points=40)
+    assert len(thumb["close"]) <= 40
+    assert thumb["date"] == sorted(thumb["date"])
+    assert thumb["date"][0] == df.index[0].strftime('%Y-%m-%d') and thumb["date"][-1] == df.index[-1].strftime('%Y-%m-%d')
+    assert 1000.0 in thumb["close"] and -1000.0 in thumb["close"]
+    short = make_history(10)
+    assert chart_pyramid.thumbnail(short)["close"] == short["Close"].tolist()
+
+def test_save_chart_data_writes_pyramid(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter(
+        hashes_path=str(tmp_path / "hashes.json"), manifest_path=str(tmp_path / "changes.json")))
+    monkeypatch.setattr(ingest_master, "CHART_DIR", str(tmp_path / "charts"))
+    monkeypatch.setattr(ingest_master, "CHART_PYRAMID_DIR", str(tmp_path / "pyramid"))
+    df = make_history()
+    ingest_master.save_chart_data("^TASI.SR", df)
+
+    daily = json.load(open(tmp_path / "pyramid" / "daily" / "TASI.SR.json"))
+    assert len(daily["close"]) == chart_pyramid.DAILY_SESSIONS and daily["date"][-1] == "2025-06-30"
+    weekly = json.load(open(tmp_path / "pyramid" / "weekly" / "TASI.SR.json"))
+    assert list(weekly) == ["date", "open", "high", "low", "close", "volume"]
+    thumb_size = os.path.getsize(tmp_path / "pyramid" / "thumb" / "TASI.SR.json")
+    assert thumb_size * 10 < os.path.getsize(tmp_path / "charts" / "TASI.SR.json")
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+
+def legacy_quotes(prices_df):
+    """The original iterrows + clean_data serializer, kept here as the reference output."""
+    chart_data = []
+    for index, row in prices_df.iterrows():
+        chart_data.append({
+            "date": index.strftime('%Y-%m-%d'),
+            "price": row['Close'] if not pd.isna(row['Close']) else 0,
+            "open": row['Open'] if not pd.isna(row['Open']) else 0,
+            "high": row['High'] if not pd.isna(row['High']) else 0,
+            "low": row['Low'] if not pd.isna(row['Low']) else 0,
+            "volume": int(row['Volume']) if not pd.isna(row['Volume']) else 0
+        })
+    return {"quotes": ingest_master.clean_data(chart_data)}
+
+def make_history(days=260, seed=7):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=days)
+    close = 100 + rng.standard_normal(days).cumsum()
+    df = pd.DataFrame({
+        "Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, days).astype(float)
+    }, index=index)
+    # Holes the upstream really sends us
+    df.iloc[3, 0] = np.nan
+    df.iloc[5, 3] = np.nan
+    df.iloc[8, 4] = np.nan
+    df.iloc[9, 1] = np.inf
+    df.iloc[10, 2] = -np.inf
+    return df
+
+def test_rows_layout_matches_legacy_bytes():
+    df = make_history()
+    assert json.dumps(ingest_master.serialize_chart(df)) == json.dumps(legacy_quotes(df))
+
+def test_rows_layout_matches_legacy_bytes_tz_aware():
+    df = make_history(seed=11)
+    df.index = df.index.tz_localize('Asia/Riyadh')
+    assert json.dumps(ingest_master.serialize_chart(df)) == json.dumps(legacy_quotes(df))
+
+def test_columnar_layout():
+    df = make_history(days=20)
+    cols = ingest_master.serialize_chart(df, layout="columnar")
+    rows = ingest_master.serialize_chart(df)["quotes"]
+
+    assert list(cols) == ["date", "open", "high", "low", "close", "volume"]
+    assert cols["date"] == [q["date"] for q in rows]
+    assert cols["close"] == [q["price"] for q in rows]
+    assert cols["volume"] == [q["volume"] for q in rows]
@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+import data_sources
+
+CATALOG = {'SA': ['1111.SR', '2222.SR', '3333.SR'], 'EG': ['COMI.CA', 'HRHO.CA']}
+
+def make_history(seed):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=30)
+    close = 100 + rng.standard_normal(30).cumsum()
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=index)
+
+class FlakyProvider:
+    """Serves every catalog symbol; dies (like a killed process) when asked for `crash_on`."""
+    name = "fake"
+    def __init__(self, crash_on=None):
+        self.crash_on = crash_on
+        self.downloaded = []
+    def download(self, symbols, period="1y", start=None):
+        if self.crash_on in symbols: raise KeyboardInterrupt
+        self.downloaded.extend(symbols)
+        return pd.concat({s: make_history(i) for i, s in enumerate(symbols)}, axis=1)
+    def history(self, symbol, period="1y", start=None):
+        return make_history(0)
+    def info(self, symbol):
+        return {"shortName": f"Name {symbol}"}
+
+def test_journal_skips_torn_tail(tmp_path):
+    journal = ingest_master.CheckpointJournal(str(tmp_path / "journal.jsonl"))
+    journal.open()
+    journal.record('SA', [{"symbol": "1111.SR", "price": 1.0}])
+    journal.close()
+    with open(tmp_path / "journal.jsonl", "a") as f: f.write('{"type": "batch", "market": "SA", "rows": [{"sym')
+
+    assert journal.load() == {'SA': {"1111.SR": {"symbol": "1111.SR", "price": 1.0}}}
+    journal.open(resume=True)   # cuts the torn line before appending
+    journal.record('EG', [{"symbol": "COMI.CA"}])
+    journal.close()
+    assert set(journal.load()) == {'SA', 'EG'}
+    journal.finish()
+    assert not os.path.exists(tmp_path / "journal.jsonl")
+
+def test_resume_fetches_only_unfinished_batches(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setattr(ingest_master, "MARKET_MAPPING", CATALOG)
+    monkeypatch.setattr(ingest_master, "PUMP_WORKERS", 1)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+    monkeypatch.setattr(history_store, "_store", None)
+
+    crashing = FlakyProvider(crash_on='COMI.CA')
+    data_sources.set_provider(crashing)
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            ingest_master.main(ingest_master.parse_args([]))
+        assert os.path.exists(ingest_master.JOURNAL_PATH)
+
+        # New process: nothing survives but the files on disk
+        monkeypatch.setattr(history_store, "_store", None)
+        monkeypatch.setattr(ingest_master, "_profile_cache", None)
+        resumed = FlakyProvider()
+        data_sources.set_provider(resumed)
+        ingest_master.main(ingest_master.parse_args(["--resume"]))
+    finally:
+        data_sources.set_provider(None)
+
+    assert set(resumed.downloaded) == {'COMI.CA', 'HRHO.CA'}   # SA came from the journal
+    assert not os.path.exists(ingest_master.JOURNAL_PATH)
+    with open("public/data/stocks.json", encoding='utf-8') as f:
+        stocks = json.load(f)
+    assert [r["symbol"] for r in stocks['SA']] == CATALOG['SA']
+    assert [r["symbol"] for r in stocks['EG']] == CATALOG['EG']
+    assert set(history_store.get_history_store().symbols()) == set(CATALOG['SA'] + CATALOG['EG'])
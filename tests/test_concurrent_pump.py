@@ -0,0 +1,140 @@
+import sys
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+import data_sources
+from ingest_master import RateLimiter
+from symbol_registry import SymbolRegistry
+
+MARKETS = {
+    'US': {"name": "United States", "flag": "🇺🇸", "symbols": ['^GSPC', 'AAPL', 'MSFT', 'NVDA', 'AMZN', 'META', 'TSLA', 'JPM']},
+    'Global': {"name": "Global", "aliasOf": "US"},
+    'AE': {"name": "United Arab Emirates", "flag": "🇦🇪", "symbols": ['EMAAR.AE', 'FAB.AD', 'AAPL', 'DIB.AE', 'ADNOCDIST.AD', 'ALDAR.AD']},
+}
+TIMEZONES = {'US': 'America/New_York', 'AE': 'Asia/Dubai'}
+
+class SyntheticUpstream:
+    """Deterministic histories and .info dicts, recorded once into replay fixtures."""
+    name = "synthetic"
+    def frame(self, symbol):
+        rng = np.random.default_rng(sum(map(ord, symbol)))
+        index = pd.bdate_range(end="2025-06-30", periods=60)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))
+        return pd.DataFrame({"Open": close * 0.99, "High": close * 1.01, "Low": close * 0.98, "Close": close,
+                             "Volume": rng.integers(1_000, 100_000, 60).astype(float)}, index=index)
+    def download(self, symbols, period="1y", start=None):
+        return pd.concat({s: self.frame(s) for s in symbols}, axis=1)
+    def history(self, symbol, period="1y", start=None):
+        return self.frame(symbol)
+    def info(self, symbol):
+        return {"shortName": f"Name {symbol}", "sector": "Tech", "marketCap": float(len(symbol) * 1e9), "trailingPE": 20.5}
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2025, 7, 1, 12, 0, tzinfo=tz or timezone.utc)
+
+def run_pump(workdir, workers, fixture_dir, monkeypatch):
+    os.makedirs(workdir)
+    monkeypatch.chdir(workdir)
+    monkeypatch.setattr(ingest_master, "PUMP_WORKERS", workers)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master, "_journal", None)
+    monkeypatch.setattr(ingest_master, "_rate_limiters", {})
+    monkeypatch.setattr(history_store, "_store", None)
+    data_sources.set_provider(data_sources.ReplayProvider(fixture_dir, mode="replay", latency=0))
+    try:
+        ingest_master.main(ingest_master.parse_args([]))
+    finally:
+        data_sources.set_provider(None)
+
+def published(workdir):
+    """{relative path: bytes} for stocks.json, charts and profiles."""
+    files = {}
+    for sub in ("stocks.json", "charts", "profiles"):
+        root = os.path.join(workdir, "public", "data", sub)
+        paths = [root] if os.path.isfile(root) else [os.path.join(root, n) for n in os.listdir(root)]
+        for path in paths:
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, workdir)] = f.read()
+    return files
+
+def test_concurrent_run_matches_serial_run(tmp_path, monkeypatch):
+    fixture_dir = str(tmp_path / "fixtures")
+    recorder = data_sources.ReplayProvider(fixture_dir, mode="record", upstream=SyntheticUpstream())
+    symbols = list(dict.fromkeys(s for spec in MARKETS.values() for s in spec.get("symbols", [])))
+    recorder.download(symbols)
+    for symbol in symbols: recorder.info(symbol)
+
+    registry = SymbolRegistry(MARKETS, TIMEZONES)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setattr(ingest_master, "REGISTRY", registry)
+    monkeypatch.setattr(ingest_master, "MARKET_MAPPING", registry.mapping())
+    monkeypatch.setattr(ingest_master, "COUNTRY_FLAGS", registry.flags())
+    monkeypatch.setattr(ingest_master, "BATCH_SIZE", 3)   # several batches per market
+    monkeypatch.setattr(ingest_master, "HOST_RATE_LIMITS", {ingest_master.YAHOO_HOST: 1000.0})
+    monkeypatch.setattr(ingest_master, "datetime", FrozenDatetime)
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+
+    pool_runs = []
+    concurrent_fetch = ingest_master.fetch_all_markets_concurrent
+    monkeypatch.setattr(ingest_master, "fetch_all_markets_concurrent",
+                        lambda *a, **kw: pool_runs.append(a[0]) or concurrent_fetch(*a, **kw))
+
+    run_pump(str(tmp_path / "serial"), 1, fixture_dir, monkeypatch)
+    assert pool_runs == []
+    run_pump(str(tmp_path / "concurrent"), 4, fixture_dir, monkeypatch)
+    assert len(pool_runs) == 1 and sorted(pool_runs[0]) == ['AE', 'US']
+
+    serial, concurrent = published(str(tmp_path / "serial")), published(str(tmp_path / "concurrent"))
+    for sub in ("charts", "profiles"):   # (plus their precompressed siblings)
+        assert len([p for p in serial if f"/{sub}/" in p and p.endswith(".json")]) == len(symbols)
+    assert sorted(serial) == sorted(concurrent)
+    assert [p for p in serial if serial[p] != concurrent[p]] == []
+
+class FakeClock:
+    """monotonic() that only moves when sleep() is called."""
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+    def monotonic(self):
+        return self.now
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+def test_rate_limiter_refills_tokens_at_its_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ingest_master, "time", clock)
+    limiter = RateLimiter(rate=4, burst=2)
+
+    limiter.acquire(); limiter.acquire()   # the burst: no waiting
+    assert clock.sleeps == []
+    limiter.acquire()                      # bucket empty: one token takes 1/rate
+    assert clock.sleeps == [0.25]
+    clock.now += 10                        # idle time refills up to the burst, no further
+    for _ in range(3): limiter.acquire()
+    assert clock.sleeps == [0.25, 0.25]
+    assert abs(clock.now - 110.5) < 1e-9   # 10s idle + two paced tokens
+
+def test_rate_limiters_are_per_host(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ingest_master, "time", clock)
+    monkeypatch.setattr(ingest_master, "_rate_limiters", {})
+    monkeypatch.setattr(ingest_master, "HOST_RATE_LIMITS", {"a.example": 1.0, "b.example": 1.0})
+    a, b = ingest_master.get_rate_limiter("a.example"), ingest_master.get_rate_limiter("b.example")
+    assert a is ingest_master.get_rate_limiter("a.example") and a is not b
+
+    a.acquire()
+    b.acquire()                            # a's spent token doesn't slow b down
+    assert clock.sleeps == []
+    a.acquire()
+    assert clock.sleeps == [1.0]
+    assert ingest_master.get_rate_limiter("c.example").rate == 2.0   # unknown hosts get the default
@@ -0,0 +1,62 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import data_sources
+
+class StaticUpstream:
+    """Stands in for the live provider: fixed frames and info dicts, counts calls."""
+    def __init__(self, frames, infos):
+        self.frames = frames
+        self.infos = infos
+        self.calls = 0
+
+    def download(self, symbols, period="1y", start=None):
+        self.calls += 1
+        return pd.concat({s: self.frames[s] for s in symbols if s in self.frames}, axis=1)
+
+    def history(self, symbol, period="1y", start=None):
+        self.calls += 1
+        return self.frames[symbol]
+
+    def info(self, symbol):
+        self.calls += 1
+        return self.infos[symbol]
+
+def make_frame(seed):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=30)
+    close = 50 + rng.standard_normal(30).cumsum()
+    df = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": rng.integers(1, 10**6, 30).astype(float)}, index=index)
+    df.iloc[4, 0] = np.nan
+    return df
+
+def test_record_then_replay_round_trip(tmp_path):
+    frames = {"AAPL": make_frame(1), "^TASI.SR": make_frame(2)}
+    infos = {"AAPL": {"shortName": "Apple", "marketCap": 3.1e12}, "^TASI.SR": {"shortName": "TASI"}}
+    upstream = StaticUpstream(frames, infos)
+
+    recorder = data_sources.ReplayProvider(str(tmp_path), mode="record", upstream=upstream)
+    recorded = recorder.download(["AAPL", "^TASI.SR"])
+    recorder.info("AAPL")
+
+    replayer = data_sources.ReplayProvider(str(tmp_path), mode="replay", latency=0)
+    replayed = replayer.download(["AAPL", "^TASI.SR"])
+
+    pd.testing.assert_frame_equal(replayed["AAPL"], recorded["AAPL"], check_freq=False)
+    pd.testing.assert_frame_equal(replayer.history("^TASI.SR"), frames["^TASI.SR"], check_freq=False)
+    assert replayer.info("AAPL") == infos["AAPL"]
+    assert replayer.history("AAPL", start="2025-06-20").index[0] >= pd.Timestamp("2025-06-20")
+    assert replayer.requests == 4
+    quotes = replayer.quotes(["AAPL"])
+    pd.testing.assert_frame_equal(quotes["AAPL"], recorded["AAPL"].tail(5), check_freq=False)
+
+def test_replay_missing_fixture_is_empty(tmp_path):
+    replayer = data_sources.ReplayProvider(str(tmp_path), mode="replay", latency=0)
+    assert replayer.download(["NOPE"]).empty
+    assert replayer.info("NOPE") == {}
+    assert replayer.misses == 2
@@ -0,0 +1,142 @@
+import sys
+import os
+import csv
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+
+RAW_SAMPLE = {
+    'US': [
+        {"symbol": "AAPL", "name": "Apple, Inc. \"Common\"", "price": np.float64(190.5), "changePercent": np.nan,
+         "volume": np.int64(1200), "marketCap": None, "peRatio": 30.1, "sector": "Technology", "country": "🇺🇸"},
+        {"symbol": "MSFT", "name": "Microsoft", "price": 410.0, "changePercent": 0.5, "volume": 10},
+    ],
+    'Global': [
+        {"symbol": "AAPL", "name": "dupe of US", "price": 1.0},
+    ],
+    'SA': [
+        {"symbol": "2222.SR", "name": "Saudi Aramco", "price": np.float32(27.5), "changePercent": np.inf},
+        {"symbol": "MSFT", "name": "listed twice", "price": 1.0},
+    ],
+}
+# What sync_to_db reads back from the shards: sanitized once, where process_symbol produced the rows
+SAMPLE = ingest_master.clean_data(RAW_SAMPLE)
+
+def test_build_db_records_skips_global_and_duplicates():
+    records = ingest_master.build_db_records(SAMPLE)
+    tickers = [r[0] for r in records]
+    assert tickers == ["AAPL", "MSFT", "2222.SR"]
+    assert all(len(r) == len(ingest_master.DB_STOCK_COLUMNS) for r in records)
+
+    aapl = records[0]
+    assert aapl[2] == 190.5 and type(aapl[2]) is float
+    assert aapl[3] == 0.0          # NaN change
+    assert aapl[4] == 1200 and type(aapl[4]) is int
+    assert aapl[5] is None         # missing market cap stays NULL
+    assert records[2][3] == 0.0    # inf change
+
+def test_clean_value_is_shared_by_json_and_db():
+    row = {"price": np.float32(27.5), "volume": np.int64(5), "changePercent": -np.inf, "flag": np.bool_(True),
+           "marketCap": None, "trend": ({"buy": np.int32(3)},)}
+    cleaned = ingest_master.clean_data(row)
+    assert cleaned == {"price": 27.5, "volume": 5, "changePercent": 0.0, "flag": True,
+                       "marketCap": None, "trend": [{"buy": 3}]}
+    assert type(cleaned["volume"]) is int and type(cleaned["price"]) is float
+    db = ingest_master.build_db_records({'US': [dict(cleaned, symbol="X")]})[0]
+    assert db[2:6] == (cleaned["price"], cleaned["changePercent"], cleaned["volume"], cleaned["marketCap"])
+
+def _bars(days=30, scale=1.0):
+    index = pd.bdate_range(end="2025-06-30", periods=days)
+    close = np.linspace(100, 130, days) * scale
+    df = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                       "Volume": np.full(days, 1000.0)}, index=index)
+    df.iloc[2, 0] = np.nan
+    return df
+
+def test_build_history_records_sends_only_the_tail(tmp_path, monkeypatch):
+    store = history_store.HistoryStore(str(tmp_path / "history"))
+    monkeypatch.setattr(history_store, "_store", store)
+    df = store.stage("AAPL", _bars())
+
+    full = ingest_master.build_history_records(["AAPL", "MISSING"])
+    assert len(full) == len(df)
+    assert full[2][2] is None      # NaN open -> NULL
+    assert full[0][6] == 1000 and type(full[0][6]) is int
+
+    last = df.index[-5]
+    tails = {"AAPL": (last.date(), float(df.at[last, "Close"]))}
+    since = (last - pd.Timedelta(days=ingest_master.HISTORY_DB_OVERLAP_DAYS)).strftime('%Y-%m-%d')
+    tail = ingest_master.build_history_records(["AAPL"], tails)
+    assert 0 < len(tail) < len(df)
+    assert [r[1] for r in tail] == [d for d in df.index.strftime('%Y-%m-%d') if d >= since]
+
+    # Stored close no longer matches (e.g. split re-adjustment) -> resend everything
+    store.stage("AAPL", _bars(scale=0.5))
+    assert len(ingest_master.build_history_records(["AAPL"], tails)) == len(df)
+
+def test_records_to_csv_round_trips_quotes_and_nulls():
+    records = ingest_master.build_db_records(SAMPLE)
+    rows = list(csv.reader(ingest_master.records_to_csv(records)))
+    assert len(rows) == 3
+    assert rows[0][1] == 'Apple, Inc. "Common"'
+    assert rows[0][5] == ''        # NULL
+    assert rows[0][-1].startswith(str(records[0][-1].year))
+
+@pytest.mark.skipif(not os.environ.get('TEST_DATABASE_URL') or ingest_master.psycopg2 is None,
+                    reason="set TEST_DATABASE_URL to a scratch Postgres to run the live sync test")
+def test_bulk_upsert_only_touches_changed_rows(tmp_path, monkeypatch):
+    conn = ingest_master.psycopg2.connect(os.environ['TEST_DATABASE_URL'])
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS stocks; DROP TABLE IF EXISTS stock_history; DROP TABLE IF EXISTS schema_migrations;")
+    cur.execute("""
+        CREATE TABLE stocks (
+            id SERIAL, ticker VARCHAR(20) PRIMARY KEY, name VARCHAR(100), current_price DOUBLE PRECISION,
+            change_percent DOUBLE PRECISION, volume BIGINT, market_cap DOUBLE PRECISION, pe_ratio DOUBLE PRECISION,
+            dividend_yield DOUBLE PRECISION, fifty_two_week_high DOUBLE PRECISION, fifty_two_week_low DOUBLE PRECISION,
+            previous_close DOUBLE PRECISION, currency VARCHAR(10), country VARCHAR(20), sector VARCHAR(50),
+            category VARCHAR(20), last_updated_ts TIMESTAMPTZ
+        );
+    """)
+    conn.commit()
+
+    ingest_master.ensure_db_schema(cur)
+    ingest_master.ensure_db_schema(cur) # second call must be a no-op
+    cur.execute("SELECT version FROM schema_migrations;")
+    assert [r[0] for r in cur.fetchall()] == [v for v, _ in ingest_master.SCHEMA_MIGRATIONS]
+
+    records = ingest_master.build_db_records(SAMPLE)
+    assert ingest_master.bulk_upsert_stocks(cur, records) == 3
+    conn.commit()
+    assert ingest_master.bulk_upsert_stocks(cur, ingest_master.build_db_records(SAMPLE)) == 0
+    conn.commit()
+
+    changed = {'US': [dict(SAMPLE['US'][0], price=191.0)]}
+    assert ingest_master.bulk_upsert_stocks(cur, ingest_master.build_db_records(changed)) == 1
+    conn.commit()
+    cur.execute("SELECT current_price FROM stocks WHERE ticker = 'AAPL';")
+    assert cur.fetchone()[0] == 191.0
+
+    # Price history: second sync writes nothing, a revised bar rewrites one row
+    store = history_store.HistoryStore(str(tmp_path / "history"))
+    monkeypatch.setattr(history_store, "_store", store)
+    store.stage("AAPL", _bars())
+    written, sent = ingest_master.sync_history_to_db(cur, ["AAPL"])
+    assert written == sent == 30
+    conn.commit()
+    assert ingest_master.sync_history_to_db(cur, ["AAPL"])[0] == 0
+    conn.commit()
+    revised = _bars()
+    revised.iloc[-1, 4] = 2000.0
+    store.stage("AAPL", revised)
+    assert ingest_master.sync_history_to_db(cur, ["AAPL"])[0] == 1
+    conn.commit()
+    cur.execute("SELECT volume FROM stock_history WHERE ticker = 'AAPL' AND trade_date = %s;", (datetime.date(2025, 6, 30),))
+    assert cur.fetchone()[0] == 2000
+    conn.close()
@@ -0,0 +1,127 @@
+import sys
+import os
+import json
+import shutil
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+from delta_feed import diff_rows
+
+def make_shards(tmp_path, monkeypatch, ring_size=3):
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter(
+        hashes_path=str(tmp_path / "hashes.json"), manifest_path=str(tmp_path / "changes.json")))
+    shards = ingest_master.MarketShardWriter(str(tmp_path / "stocks"), str(tmp_path / "stocks.json"),
+                                             str(tmp_path / "deltas"), str(tmp_path / "snapshot"))
+    shards.delta_feed.ring_size = ring_size
+    return shards
+
+def apply_delta(snapshot, delta):
+    """What a polling client does with one delta file."""
+    for code, changes in delta["markets"].items():
+        rows = {r["symbol"]: r for r in snapshot.get(code, [])}
+        for symbol, fields in changes.items():
+            if fields is None: rows.pop(symbol, None)
+            else: rows[symbol] = {k: v for k, v in dict(rows.get(symbol, {}), **fields).items() if v is not None}
+        snapshot[code] = list(rows.values())
+    return snapshot
+
+def test_diff_rows_lists_only_changed_fields():
+    before = {"AAPL": {"symbol": "AAPL", "price": 1.0, "peRatio": 30}, "GONE": {"symbol": "GONE", "price": 2.0}}
+    after = {"AAPL": {"symbol": "AAPL", "price": 1.5}, "NEW": {"symbol": "NEW", "price": 3.0}}
+    assert diff_rows(before, after) == {
+        "AAPL": {"price": 1.5, "peRatio": None},
+        "NEW": {"symbol": "NEW", "price": 3.0},
+        "GONE": None
+    }
+    assert diff_rows(after, after) == {}
+
+def test_client_catches_up_from_the_ring(tmp_path, monkeypatch):
+    rows = [{"symbol": "AAPL", "price": 1.0, "volume": 10, "lastUpdated": "t0"},
+            {"symbol": "MSFT", "price": 5.0, "volume": 20, "lastUpdated": "t0"}]
+    shards = make_shards(tmp_path, monkeypatch)
+    shards.write('US', rows)
+    shards.write('SA', [{"symbol": "2222.SR", "price": 27.5, "lastUpdated": "t0"}])
+    shards.finish()
+    with open(tmp_path / "stocks.json", encoding='utf-8') as f:
+        client = json.load(f)  # client holds the snapshot at seq 1
+    with open(tmp_path / "stocks" / "manifest.json") as f:
+        assert json.load(f)["deltaSeq"] == 1
+
+    for run, price in enumerate((1.1, 1.2, 1.3), start=2):
+        shards = make_shards(tmp_path, monkeypatch)
+        shards.write('US', [dict(rows[0], price=price, lastUpdated=f"t{run}"), dict(rows[1], lastUpdated=f"t{run}")])
+        shards.write('SA', [{"symbol": "2222.SR", "price": 27.5, "lastUpdated": f"t{run}"}])  # only lastUpdated moved
+        shards.finish()
+
+        with open(tmp_path / "deltas" / f"{run}.json", encoding='utf-8') as f:
+            delta = json.load(f)
+        assert delta["base"] == run - 1 and delta["markets"] == {'US': {"AAPL": {"price": price}}}
+
+    with open(tmp_path / "deltas" / "index.json") as f:
+        index = json.load(f)
+    assert index["seq"] == 4 and index["oldest"] == 1 and [d["seq"] for d in index["deltas"]] == [2, 3, 4]
+    for entry in index["deltas"]:
+        with open(tmp_path / entry["path"], encoding='utf-8') as f:
+            apply_delta(client, json.load(f))
+    assert client['US'][0] == {"symbol": "AAPL", "price": 1.3, "volume": 10, "lastUpdated": "t0"}
+
+    # One more change pushes delta 2 out: a client still at seq 1 must reload the snapshot
+    shards = make_shards(tmp_path, monkeypatch)
+    shards.write('US', [dict(rows[0], price=1.4)])
+    shards.finish()
+    with open(tmp_path / "deltas" / "index.json") as f:
+        index = json.load(f)
+    assert index["oldest"] == 2 and [d["seq"] for d in index["deltas"]] == [3, 4, 5]
+    assert not os.path.exists(tmp_path / "deltas" / "2.json")
+    assert os.path.join(str(tmp_path), "deltas", "2.json") in ingest_master.get_artifact_writer().changed
+    with open(tmp_path / "deltas" / "5.json", encoding='utf-8') as f:
+        assert json.load(f)["markets"] == {'US': {"AAPL": {"price": 1.4}, "MSFT": None}}
+
+def run_once(tmp_path, monkeypatch, rows):
+    shards = make_shards(tmp_path, monkeypatch)
+    for code, market_rows in rows.items(): shards.write(code, market_rows)
+    shards.finish()
+    with open(tmp_path / "deltas" / "index.json") as f:
+        return json.load(f)
+
+def read_delta(tmp_path, seq):
+    with open(tmp_path / "deltas" / f"{seq}.json", encoding='utf-8') as f:
+        return json.load(f)["markets"]
+
+def test_baseline_comes_from_the_published_shard(tmp_path, monkeypatch):
+    rows = [{"symbol": "AAPL", "price": 1.0, "lastUpdated": "t0"}, {"symbol": "MSFT", "price": 5.0, "lastUpdated": "t0"}]
+    run_once(tmp_path, monkeypatch, {'US': rows})
+
+    # Fresh CI runner: only public/data (shards, manifest, deltas) survived
+    shutil.rmtree(tmp_path / "snapshot")
+    index = run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.1, lastUpdated="t1"), rows[1]]})
+    assert index["seq"] == 2 and read_delta(tmp_path, 2) == {'US': {"AAPL": {"price": 1.1}}}
+
+    # A cached snapshot from an older seq is ignored: the shard (seq 2) is the baseline
+    shutil.copytree(tmp_path / "snapshot", tmp_path / "old_snapshot")
+    run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.2), rows[1]]})
+    shutil.rmtree(tmp_path / "snapshot")
+    os.replace(tmp_path / "old_snapshot", tmp_path / "snapshot")
+    index = run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.2), dict(rows[1], price=5.5)]})
+    assert index["seq"] == 4 and read_delta(tmp_path, 4) == {'US': {"MSFT": {"price": 5.5}}}
+
+def test_shards_ahead_of_the_ring_reset_the_feed(tmp_path, monkeypatch):
+    rows = [{"symbol": "AAPL", "price": 1.0}]
+    run_once(tmp_path, monkeypatch, {'US': rows})
+    run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.1)]})
+
+    # A run died after rewriting the shard but before publishing its delta
+    shards = make_shards(tmp_path, monkeypatch)
+    shards.delta_feed = None
+    shards.write('US', [dict(rows[0], price=1.2)])
+    shutil.rmtree(tmp_path / "snapshot")
+
+    index = run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.3)]})
+    assert (index["seq"], index["oldest"], index["deltas"]) == (3, 3, [])   # everyone behind 3 reloads
+    assert not os.path.exists(tmp_path / "deltas" / "2.json")
+    with open(tmp_path / "stocks" / "manifest.json") as f:
+        assert json.load(f)["deltaSeq"] == 3
+    index = run_once(tmp_path, monkeypatch, {'US': [dict(rows[0], price=1.4)]})
+    assert index["seq"] == 4 and read_delta(tmp_path, 4) == {'US': {"AAPL": {"price": 1.4}}}
@@ -0,0 +1,57 @@
+import sys
+import os
+import glob
+import shutil
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+from history_store import HistoryStore
+
+def bars(dates, close):
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0},
+                        index=pd.to_datetime(dates))
+
+def test_spilled_frames_leave_memory_and_still_commit(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    days = pd.bdate_range("2025-06-02", periods=5).strftime('%Y-%m-%d')
+    store.stage("A", bars(days, 1.0))
+    store.commit()
+
+    store.stage("B", bars(days, 2.0))
+    store.stage("A", bars(days[:3], 3.0))     # restaged: replaces the committed bars
+    assert store.spill() == 2 and store.staged == {}
+    store.stage("C", bars(days[1:], 4.0))
+    assert store.spill() == 1 and store.staged == {}
+    store.stage("C", bars(days, 5.0))         # staged after its spill: the newer frame wins
+
+    assert store.symbols() == ["A", "B", "C"]
+    assert list(store.get("B")["Close"]) == [2.0] * 5 and list(store.get("A")["Close"]) == [3.0] * 3
+    assert store.commit() == 3
+    assert not os.path.exists(store._spill_dir())
+    reopened = HistoryStore(str(tmp_path / "history"))
+    assert reopened.symbols() == ["A", "B", "C"]
+    assert [list(reopened.get(s)["Close"]) for s in ("A", "B", "C")] == [[3.0] * 3, [2.0] * 5, [5.0] * 5]
+
+def test_export_charts_rebuilds_chart_files_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter())
+    monkeypatch.setattr(history_store, "_store", None)
+    days = pd.bdate_range("2025-06-02", periods=30).strftime('%Y-%m-%d')
+    store = history_store.get_history_store()
+    for n, symbol in enumerate(("2222.SR", "^TASI.SR", "AAPL")):   # what process_symbol does per symbol
+        ingest_master.save_chart_data(symbol, store.stage(symbol, bars(days, 10.0 + n)))
+    store.commit()
+    published = {p: open(p, "rb").read() for p in glob.glob("public/data/charts*/**/*.json", recursive=True)}
+    assert "public/data/charts/TASI.SR.json" in published
+    shutil.rmtree("public/data")
+
+    args = ingest_master.parse_args(["--export-charts", "--symbols", "2222.SR,^TASI.SR"])
+    assert ingest_master.run_export(args) == 2
+    assert not os.path.exists("public/data/charts/AAPL.json")
+    assert ingest_master.run_export(ingest_master.parse_args(["--export-charts"])) == 3
+    exported = {p: open(p, "rb").read() for p in glob.glob("public/data/charts*/**/*.json", recursive=True)}
+    assert exported == published
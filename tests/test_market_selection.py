@@ -0,0 +1,41 @@
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+
+# Tuesday 2025-07-01 14:00 UTC = 17:00 Riyadh, 10:00 New York, 16:00 Cairo
+TUESDAY = datetime(2025, 7, 1, 14, 0, tzinfo=timezone.utc)
+
+def test_trading_calendar_sessions():
+    assert ingest_master.is_market_open('US', TUESDAY)
+    assert not ingest_master.is_market_open('SA', TUESDAY)                      # closed at 15:00 local
+    assert ingest_master.is_market_open('SA', TUESDAY - timedelta(hours=2))     # 15:00 local + grace
+    assert not ingest_master.is_market_open('US', datetime(2025, 7, 5, 15, tzinfo=timezone.utc))  # Saturday
+    assert ingest_master.is_market_open('SA', datetime(2025, 7, 6, 8, tzinfo=timezone.utc))       # Sunday session
+    assert not ingest_master.is_market_open('SA', TUESDAY, grace_minutes=0)
+    assert set(ingest_master.TRADING_CALENDAR) >= set(ingest_master.MARKET_MAPPING)
+
+def test_select_markets_filters():
+    catalog = ingest_master.MARKET_MAPPING
+    selected, partial = ingest_master.select_markets(catalog, markets=['SA', 'Global'], now=TUESDAY)
+    assert list(selected) == ['SA', 'US'] and not partial
+
+    selected, _ = ingest_master.select_markets(catalog, only_open=True, now=TUESDAY)
+    assert 'US' in selected and 'SA' not in selected and 'Global' not in selected
+
+    selected, partial = ingest_master.select_markets(catalog, symbols=['AAPL', '2222.SR', 'NOPE'], now=TUESDAY)
+    assert selected == {'SA': ['2222.SR'], 'US': ['AAPL']} and partial == {'SA', 'US'}
+
+class FakeShards:
+    def fetched_at(self, code):
+        return TUESDAY - timedelta(minutes=5) if code == 'US' else None
+
+def test_select_markets_only_stale():
+    selected, _ = ingest_master.select_markets(ingest_master.MARKET_MAPPING, markets=['US', 'SA'],
+                                               only_stale=ingest_master.parse_age('15m'), shards=FakeShards(), now=TUESDAY)
+    assert list(selected) == ['SA']
+    assert ingest_master.parse_age('2h') == 7200 and ingest_master.parse_age('90') == 90
@@ -0,0 +1,79 @@
+import sys
+import os
+import io
+import json
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import news_indexer
+
+def article(n, day, title=None, url=None, body="x" * 200):
+    return {"title": title or f"Headline {n}", "url": url or f"https://news.example.com/a/{n}",
+            "published_at": f"{day} 10:{n % 60:02d}:00 GMT", "source": "Example", "content": body}
+
+def test_stream_parser_handles_chunk_boundaries():
+    items = [{"title": "a \"quoted\" ] title", "n": 1}, [1, 2], 12345, "s", None, {"content": "y" * 500}]
+    text = " [ " + " ,\n".join(json.dumps(i) for i in items) + " ] "
+    for chunk in (1, 7, 64, 4096):
+        assert list(news_indexer.iter_json_array(io.StringIO(text), chunk_chars=chunk)) == items
+    assert list(news_indexer.iter_json_array(io.StringIO("[]"))) == []
+
+def test_parse_published_formats():
+    assert news_indexer.parse_published("Sun, 07 Dec 2025 20:32:00 GMT").isoformat() == "2025-12-07T20:32:00+00:00"
+    assert news_indexer.parse_published("Mon Dec 08 00:18:48 UTC 2025").isoformat() == "2025-12-08T00:18:48+00:00"
+    assert news_indexer.parse_published("2025-12-08T03:00:00+03:00").isoformat() == "2025-12-08T00:00:00+00:00"
+    assert news_indexer.parse_published("yesterday") is None
+
+def test_build_index_dedupes_and_bounds_shards(tmp_path):
+    sa = [article(n, "Sun, 07 Dec 2025") for n in range(7)] + [article(7, "Sat, 06 Dec 2025")]
+    sa.append(article(8, "Sat, 06 Dec 2025", url="https://www.NEWS.example.com/a/3/"))   # same URL as #3
+    sa.append(article(9, "Sat, 06 Dec 2025", title="headline 5!"))                      # same title as #5
+    sa.append(dict(article(10, "Sat, 06 Dec 2025"), country="EG"))                       # filed under its own market
+    sa.append(dict(article(11, "Sat, 06 Dec 2025"), published_at="soon"))
+    (tmp_path / "news_archive_SA.json").write_text(json.dumps(sa), encoding='utf-8')
+    (tmp_path / "news_archive_US.json").write_text("[]", encoding='utf-8')
+    out = tmp_path / "index"
+    # An earlier run indexed an older archive; the directory also holds files that aren't ours
+    (tmp_path / "old" / "news_archive_SA.json").parent.mkdir()
+    (tmp_path / "old" / "news_archive_SA.json").write_text(json.dumps([article(99, "Wed, 01 Jan 2020")]), encoding='utf-8')
+    news_indexer.build_index([str(tmp_path / "old" / "news_archive_SA.json")], str(out))
+    assert (out / "SA" / "2020-01-01-1.json").exists()
+    (out / "SA" / "2019-12-31-1.json").write_text("[]")
+    (out / "charts").mkdir()
+    (out / "charts" / "2222.SR.json").write_text("{}")
+
+    archives = [str(tmp_path / "news_archive_SA.json"), str(tmp_path / "news_archive_US.json")]
+    manifest = news_indexer.build_index(archives, str(out), page_size=4, max_articles=3)
+
+    assert (manifest["read"], manifest["duplicates"]) == (12, 2)
+    assert manifest["markets"]['SA']["articles"] == 9 and manifest["markets"]['EG']["articles"] == 1
+    assert manifest["markets"]['SA']["shards"] == ["SA/2025-12-07-1.json", "SA/2025-12-07-2.json", "SA/2025-12-07-3.json",
+                                                   "SA/2025-12-06-1.json", "SA/undated-1.json"]
+    assert not (out / "SA" / "2020-01-01-1.json").exists()                 # listed by the previous manifest
+    assert (out / "SA" / "2019-12-31-1.json").exists() and (out / "charts" / "2222.SR.json").exists()
+
+    pages = [json.loads((out / "SA" / f"page-{n}.json").read_text(encoding='utf-8')) for n in (1, 2, 3)]
+    entries = [e for page in pages for e in page["articles"]]
+    assert [p["pages"] for p in pages] == [3, 3, 3] and len(pages[0]["articles"]) == 4
+    assert [e["title"] for e in entries[:2]] == ["Headline 6", "Headline 5"]   # newest first
+    assert entries[-1]["publishedAt"] is None
+    assert all("content" not in e for e in entries)
+    for entry in entries:   # every headline points at the shard holding its body
+        shard = json.loads((out / entry["shard"]).read_text(encoding='utf-8'))
+        assert len(shard) <= 3 and any(a["id"] == entry["id"] and a["content"] for a in shard)
+
+    # Same input again: nothing to rewrite
+    before = {p: os.path.getmtime(p) for p in out.glob("*/*.json")}
+    news_indexer.build_index(archives, str(out), page_size=4, max_articles=3)
+    assert {p: os.path.getmtime(p) for p in out.glob("*/*.json")} == before
+
+def test_build_index_refuses_a_foreign_manifest(tmp_path):
+    (tmp_path / "news_archive_SA.json").write_text(json.dumps([article(1, "Sun, 07 Dec 2025")]), encoding='utf-8')
+    (tmp_path / "manifest.json").write_text('{"markets": {"SA": {"path": "stocks/SA.json"}}}')
+    try:
+        news_indexer.build_index([str(tmp_path / "news_archive_SA.json")], str(tmp_path))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert not (tmp_path / "SA").exists()
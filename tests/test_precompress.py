@@ -0,0 +1,53 @@
+import sys
+import os
+import gzip
+import json
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import precompress
+import ingest_master
+
+def write_json(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([{"symbol": f"S{i}", "price": i * 1.5, "name": "Example Co"} for i in range(rows)], f)
+    return str(path)
+
+def test_siblings_roundtrip_and_stale_cleanup(tmp_path):
+    big = write_json(tmp_path / "big.json", 500)
+    small = write_json(tmp_path / "small.json", 1)
+    with open(small + ".gz", "wb") as f: f.write(b"stale")   # left over from when it was big
+
+    results = precompress.precompress([big, small], formats=("gz",))
+    assert results[small] == {"bytes": os.path.getsize(small)} and not os.path.exists(small + ".gz")
+    with open(big, "rb") as raw, gzip.open(big + ".gz") as packed:
+        assert packed.read() == raw.read()
+    assert results[big]["gz"] == os.path.getsize(big + ".gz") < results[big]["bytes"]
+
+    # Deterministic output: recompressing the same bytes gives the same sibling
+    first = open(big + ".gz", "rb").read()
+    precompress.precompress([big], formats=("gz",))
+    assert open(big + ".gz", "rb").read() == first
+
+    manifest = precompress.update_manifest({"gone.json": {"bytes": 1, "gz": 1}}, dict(results, **{str(tmp_path / "gone.json"): None}), str(tmp_path))
+    assert manifest == {"big.json": results[big]}
+
+def test_process_pool_path(tmp_path):
+    paths = [write_json(tmp_path / f"f{i}.json", 100 + i) for i in range(precompress.PRECOMPRESS_INLINE_FILES + 4)]
+    results = precompress.precompress(paths, formats=("gz", "br", "zst"), workers=2)
+    assert set(results) == set(paths)
+    for path in paths:
+        assert os.path.exists(path + ".gz")
+        assert os.path.exists(path + ".br") == (precompress.brotli is not None)
+
+def test_pump_writes_compression_manifest(tmp_path, monkeypatch):
+    writer = ingest_master.ArtifactWriter(hashes_path=str(tmp_path / "hashes.json"), manifest_path=str(tmp_path / "changes.json"))
+    writer.write(str(tmp_path / "data" / "stocks.json"), {"US": [{"symbol": f"S{i}", "price": i} for i in range(200)]})
+    manifest_path = str(tmp_path / "data" / "compression.json")
+    ingest_master.precompress_artifacts(writer, manifest_path)
+
+    manifest = json.load(open(manifest_path))
+    assert "gz" in manifest["formats"]
+    assert manifest["files"]["stocks.json"]["gz"] == os.path.getsize(tmp_path / "data" / "stocks.json.gz")
@@ -1,63 +1,50 @@
 import sys
 import os
 import json
-import pandas as pd
-from datetime import datetime
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
 
 import ingest_master
+import history_store
+import data_sources
 
-def test_single_stock_ingestion():
-    symbol = "7010.SR" # STC (Saudi Telecom) - likely to have good data
-    print(f"🧪 Testing ingestion for {symbol}...")
-    
-    # Run fetch just for this stock
-    # We can invoke fetch_market_data directly
-    results = ingest_master.fetch_market_data('SA', [symbol])
-    
-    print(f"✅ Fetch complete. Results: {len(results)}")
-    
-    # Check Profile Data
-    profile_path = f"public/data/profiles/{symbol}.json"
-    if not os.path.exists(profile_path):
-        print("❌ Profile file not created!")
-        return
-        
-    with open(profile_path, 'r') as f:
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'yahoo')
+
+def test_single_stock_ingestion(tmp_path, monkeypatch):
+    symbol = "7010.SR" # STC (Saudi Telecom), recorded in tests/fixtures/yahoo
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master, "_journal", None)
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter())
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+    monkeypatch.setattr(history_store, "_store", None)
+
+    replay = data_sources.ReplayProvider(FIXTURE_DIR, mode="replay", latency=0)
+    data_sources.set_provider(replay)
+    try:
+        results = ingest_master.fetch_market_data('SA', [symbol])
+    finally:
+        data_sources.set_provider(None)
+
+    assert replay.misses == 0
+    assert [r["symbol"] for r in results] == [symbol]
+    assert results[0]["name"] == "Saudi Telecom Co." and results[0]["category"] == 'SA'
+
+    # Profile Data
+    with open(f"public/data/profiles/{symbol}.json", 'r') as f:
         data = json.load(f)
-        
-    print("\n📊 Profile Data Check:")
     keys_to_check = [
-        "sharesOutstanding", "floatShares", "sharesShort", 
-        "fiftyDayAverage", "twoHundredDayAverage", 
+        "sharesOutstanding", "floatShares", "sharesShort",
+        "fiftyDayAverage", "twoHundredDayAverage",
         "totalRevenue", "operatingCashflow", "returnOnEquity",
         "recommendationMean"
     ]
-    
-    missing = []
-    for k in keys_to_check:
-        val = data.get(k)
-        print(f"   - {k}: {val}")
-        if val is None: missing.append(k)
-        
-    # Check Chart Data
-    chart_path = f"public/data/charts/{symbol}.json"
-    if not os.path.exists(chart_path):
-        print("❌ Chart file not created!")
-        return
-        
-    with open(chart_path, 'r') as f:
+    assert [k for k in keys_to_check if data.get(k) is None] == []
+
+    # Chart Data
+    with open(f"public/data/charts/{symbol}.json", 'r') as f:
         chart_json = json.load(f)
-        
-    print("\n📈 Chart Data Check:")
-    if "quotes" in chart_json:
-        print(f"   ✅ 'quotes' key found. Count: {len(chart_json['quotes'])}")
-        if len(chart_json['quotes']) > 0:
-            print(f"   - Sample: {chart_json['quotes'][0]}")
-    else:
-        print("   ❌ 'quotes' key MISSING in chart JSON!")
-
-if __name__ == "__main__":
-    test_single_stock_ingestion()
+    assert "quotes" in chart_json and chart_json["quotes"]
+    assert set(chart_json["quotes"][0]) == {"date", "price", "open", "high", "low", "volume"}
+    assert chart_json["quotes"][-1]["price"] == results[0]["price"]
@@ -0,0 +1,124 @@
+import sys
+import os
+import types
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+import data_sources
+from ingest_master import ProfileCache, PROFILE_TTL_SECONDS
+
+HOUR = 3600
+INFO = {"shortName": "Apple", "sector": "Technology",       # static
+        "totalRevenue": 1e11,                                 # fundamentals
+        "recommendationMean": 2.0,                            # analyst
+        "marketCap": 3e12}                                    # market (everything else)
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    """A ProfileCache whose clock is `clock.now` (seconds)."""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(ingest_master, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return ProfileCache(str(tmp_path / "cache" / "profile_info.json"), **kwargs), clock
+
+def test_each_group_expires_on_its_own_ttl(tmp_path, monkeypatch):
+    for group, ttl in PROFILE_TTL_SECONDS.items():
+        ttls = dict({g: 365 * 86400 for g in PROFILE_TTL_SECONDS}, **{group: ttl})   # only `group` can expire
+        cache, clock = make_cache(tmp_path, monkeypatch, ttls=ttls)
+        key = next(k for k in INFO if cache._group_of.get(k, 'market') == group)
+        cache.put("AAPL", {key: INFO[key]})
+        clock.now += ttl - 1
+        assert cache.get("AAPL") == {key: INFO[key]}, group
+        clock.now += 2
+        assert cache.get("AAPL") is None, group
+
+    # Mixed entry: the shortest TTL among the groups it holds decides
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("AAPL", INFO)
+    clock.now += PROFILE_TTL_SECONDS['market'] + 1
+    assert cache.get("AAPL") is None
+    assert cache.get("AAPL", allow_stale=True) == INFO
+
+def test_partial_response_does_not_refresh_missing_groups(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("AAPL", INFO)
+    clock.now += 25 * HOUR    # fundamentals/analyst/market expired, static still fresh
+    # A throttled response: only market fields came back (None means absent)
+    cache.put("AAPL", {"marketCap": 3.1e12, "totalRevenue": None})
+    entry = cache.entries["AAPL"]
+    assert entry["fetched"]["market"] == clock.now
+    assert entry["fetched"]["fundamentals"] == entry["fetched"]["analyst"] == clock.now - 25 * HOUR
+    assert entry["info"]["totalRevenue"] == 1e11 and entry["info"]["marketCap"] == 3.1e12
+    assert cache.get("AAPL") is None           # still stale until the other groups come back
+
+    cache.put("AAPL", {"totalRevenue": 1.2e11, "recommendationMean": 2.1})
+    assert cache.get("AAPL")["totalRevenue"] == 1.2e11
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_entries=3)
+    for symbol in ("A", "B", "C"):
+        cache.put(symbol, {"marketCap": 1.0})
+        clock.now += 1
+    cache.get("A")                              # A is now the most recently used
+    clock.now += 1
+    cache.put("D", {"marketCap": 1.0})
+    assert sorted(cache.entries) == ["A", "C", "D"]
+    clock.now += 1
+    cache.get("C", allow_stale=True)            # a stale read is still a use
+    clock.now += 1
+    cache.put("E", {"marketCap": 1.0})
+    assert sorted(cache.entries) == ["C", "D", "E"]
+
+def test_save_load_round_trip(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("AAPL", dict(INFO, lastDividendDate=pd.Timestamp("2025-05-12")))   # not JSON-native
+    cache.put("2222.SR", {"shortName": "Aramco"})
+    cache.save()
+    assert os.listdir(tmp_path / "cache") == ["profile_info.json"]   # temp file renamed away
+
+    loaded = ProfileCache(str(tmp_path / "cache" / "profile_info.json"))
+    assert loaded.entries["AAPL"]["fetched"] == cache.entries["AAPL"]["fetched"]
+    assert loaded.get("2222.SR") == {"shortName": "Aramco"}
+    assert loaded.get("AAPL")["lastDividendDate"] == "2025-05-12 00:00:00"
+    assert ProfileCache(str(tmp_path / "missing.json")).entries == {}
+
+def test_hit_and_miss_counts(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    assert cache.get("AAPL") is None                       # unknown: miss
+    cache.put("AAPL", INFO)
+    assert cache.get("AAPL") == INFO                       # fresh: hit
+    assert cache.is_fresh("AAPL")                          # planning check: not counted
+    clock.now += PROFILE_TTL_SECONDS['static'] + 1
+    assert cache.get("AAPL") is None                       # expired: miss
+    assert cache.get("AAPL", allow_stale=True) == INFO     # fallback: not counted
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert "1 hits / 2 misses (33% hit rate, 1 entries)" in cache.report()
+
+class FailingInfoProvider:
+    name = "failing"
+    def info(self, symbol):
+        raise RuntimeError("429 Too Many Requests")
+
+def test_last_cached_profile_is_used_when_info_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter())
+    monkeypatch.setattr(history_store, "_store", None)
+    cache, clock = make_cache(tmp_path, monkeypatch)
+    cache.put("AAPL", INFO)
+    clock.now += PROFILE_TTL_SECONDS['static'] + 1          # every group expired: .info is asked for
+    monkeypatch.setattr(ingest_master, "_profile_cache", cache)
+
+    index = pd.bdate_range(end="2025-06-30", periods=5)
+    close = np.arange(100.0, 105.0)
+    df = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 10.0}, index=index)
+    data_sources.set_provider(FailingInfoProvider())
+    try:
+        row = ingest_master.process_symbol('US', "AAPL", df)
+    finally:
+        data_sources.set_provider(None)
+
+    assert (row["name"], row["sector"], row["marketCap"]) == ("Apple", "Technology", 3e12)
+    assert cache.misses == 1 and cache.entries["AAPL"]["fetched"]["static"] < clock.now   # stale entry kept as is
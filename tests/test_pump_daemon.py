@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+from datetime import datetime, timezone, timedelta
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import data_sources
+
+# Tuesday 2025-07-01 14:00 UTC = 17:00 Riyadh (closed), 10:00 New York (open)
+TUESDAY = datetime(2025, 7, 1, 14, 0, tzinfo=timezone.utc)
+
+class FakeShards:
+    def __init__(self, fetched):
+        self.fetched = fetched
+    def fetched_at(self, code):
+        return self.fetched.get(code)
+
+def test_last_session_close_and_history_due():
+    close = ingest_master.last_session_close('SA', TUESDAY)
+    assert close.astimezone(timezone.utc) == datetime(2025, 7, 1, 12, 0, tzinfo=timezone.utc)
+    # Monday morning in New York: last close was Friday
+    monday = datetime(2025, 7, 7, 12, 0, tzinfo=timezone.utc)
+    assert ingest_master.last_session_close('US', monday).weekday() == 4
+
+    shards = FakeShards({
+        'SA': TUESDAY - timedelta(hours=3),  # before today's close -> due
+        'EG': TUESDAY - timedelta(minutes=1), # after today's close + grace -> done
+        'US': TUESDAY - timedelta(days=1),    # open right now -> quote tier's job
+    })
+    assert ingest_master.history_due(['SA', 'EG', 'US', 'UK'], shards, TUESDAY) == ['SA', 'UK']  # UK never fetched
+
+class QuoteProvider:
+    name = "fake"
+    def __init__(self):
+        self.calls = []
+    def quotes(self, symbols):
+        self.calls.append(list(symbols))
+        index = pd.to_datetime(["2025-06-30", "2025-07-01"])
+        frames = {s: pd.DataFrame({"Open": [10.0, 11.0], "High": [10.5, 12.5], "Low": [9.5, 10.5],
+                                   "Close": [10.0, 12.0], "Volume": [100.0, 250.0]}, index=index)
+                  for s in symbols if s != "GONE"}
+        return pd.concat(frames, axis=1)
+
+def test_refresh_quotes_patches_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter(
+        hashes_path=str(tmp_path / "hashes.json"), manifest_path=str(tmp_path / "changes.json")))
+    shards = ingest_master.MarketShardWriter(str(tmp_path / "stocks"), str(tmp_path / "stocks.json"),
+                                             str(tmp_path / "deltas"), str(tmp_path / "snapshot"))
+    rows = [{"symbol": "AAPL", "name": "Apple", "price": 1.0, "marketCap": 5, "lastUpdated": "t1"},
+            {"symbol": "GONE", "name": "Delisted", "price": 3.0, "lastUpdated": "t1"}]
+    shards.write('US', rows)
+    shards.write('SA', [{"symbol": "2222.SR", "price": 27.5, "lastUpdated": "t1"}])
+    fetched = shards.markets['US']['fetchedAt']
+
+    provider = QuoteProvider()
+    data_sources.set_provider(provider)
+    try:
+        quoted = ingest_master.refresh_quotes(['US'], shards=shards, workers=1)
+    finally:
+        data_sources.set_provider(None)
+
+    assert quoted == {'US': 1} and provider.calls == [["AAPL", "GONE"]]
+    us = json.loads(shards.read('US'))
+    assert us[0]["price"] == 12.0 and us[0]["change"] == 2.0 and us[0]["changePercent"] == 20.0
+    assert us[0]["volume"] == 250 and us[0]["previousClose"] == 10.0 and us[0]["marketCap"] == 5
+    assert us[1]["price"] == 3.0 and us[1]["lastUpdated"] == "t1"
+    entry = shards.markets['US']
+    assert entry['fetchedAt'] == fetched and 'quotedAt' in entry   # quotes don't count as a full refresh
+    assert shards.markets['Global']['aliasOf'] == 'US'
+    assert 'quotedAt' not in shards.markets['SA']
+
+def test_daemon_tick_runs_each_tier(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest_master, "load_daemon_state", lambda: {})
+    monkeypatch.setattr(ingest_master, "save_daemon_state", lambda state: calls.append(("state", sorted(state))))
+    monkeypatch.setattr(ingest_master, "history_due", lambda codes, shards, now: ['SA'])
+    monkeypatch.setattr(ingest_master, "main", lambda args: calls.append(("history", args.markets)))
+    monkeypatch.setattr(ingest_master, "run_quote_tier", lambda codes, limiter: calls.append(("quote", codes)))
+    monkeypatch.setattr(ingest_master, "refresh_profiles", lambda symbols, limiter: calls.append(("profile", len(symbols))))
+    sleeps = []
+
+    args = ingest_master.parse_args(["--daemon", "--markets", "SA,US"])
+    ingest_master.run_daemon(args, max_ticks=2, now_fn=lambda: TUESDAY, sleep=sleeps.append)
+
+    assert calls.count(("history", ['SA'])) == 2
+    assert calls.count(("quote", ['US'])) == 2
+    assert ("profile", len(ingest_master.MARKET_MAPPING['SA']) + len(ingest_master.MARKET_MAPPING['US'])) in calls
+    assert sum(1 for c in calls if c[0] == "profile") == 1   # once per DAEMON_PROFILE_INTERVAL
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= ingest_master.DAEMON_QUOTE_INTERVAL
@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+import functools
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import pump_metrics
+import ingest_master
+import history_store
+import data_sources
+from symbol_registry import SymbolRegistry
+
+def test_histogram_quantiles_and_prometheus_text():
+    metrics = pump_metrics.Metrics()
+    for seconds in (0.002, 0.003, 0.004, 0.2, 3.0):
+        metrics.observe("download", seconds, market="US")
+    metrics.inc("symbols", 40, market="US", outcome="ok")
+    metrics.inc("symbols", market="US", outcome="dropped")
+    with metrics.phase("fetch"): pass
+
+    report = metrics.report()
+    stats = report["latency"]["download"]["market=US"]
+    assert stats["count"] == 5 and stats["p50Seconds"] == 0.005 and stats["p95Seconds"] == 3.0
+    assert report["counters"]["symbols"] == {"market=US,outcome=dropped": 1, "market=US,outcome=ok": 40}
+    assert "fetch" in report["phasesSeconds"]
+
+    text = metrics.to_prometheus()
+    assert '# TYPE pump_download_seconds histogram' in text
+    assert 'pump_download_seconds_bucket{market="US",le="0.005"} 3' in text
+    assert 'pump_download_seconds_bucket{market="US",le="+Inf"} 5' in text
+    assert 'pump_download_seconds_count{market="US"} 5' in text
+    assert 'pump_symbols_total{market="US",outcome="ok"} 40' in text
+    assert text.count("# TYPE pump_symbols_total counter") == 1
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end: pass
+
+def test_sampling_profiler_finds_the_hot_function():
+    with pump_metrics.SamplingProfiler(interval=0.001) as profiler:
+        busy(0.2)
+    assert profiler.samples > 0
+    hottest = profiler.own.most_common(1)[0][0]
+    assert hottest.startswith("busy (")
+
+class SlowProvider:
+    """Every download takes `delay` seconds."""
+    name = "slow"
+    def __init__(self, delay):
+        self.delay = delay
+    def download(self, symbols, period="1y", start=None):
+        time.sleep(self.delay)
+        index = pd.bdate_range(end="2025-06-30", periods=30)
+        close = 100 + np.arange(30.0)
+        frame = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1000.0}, index=index)
+        return pd.concat({s: frame for s in symbols}, axis=1)
+    def info(self, symbol):
+        return {"shortName": symbol}
+
+def test_concurrent_market_seconds_start_with_the_market(tmp_path, monkeypatch):
+    registry = SymbolRegistry({'US': {"name": "United States", "symbols": ['AAPL', 'MSFT']},
+                               'AE': {"name": "United Arab Emirates", "symbols": ['EMAAR.AE', 'DIB.AE']}},
+                              {'US': 'America/New_York', 'AE': 'Asia/Dubai'})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setattr(ingest_master, "REGISTRY", registry)
+    monkeypatch.setattr(ingest_master, "MARKET_MAPPING", registry.mapping())
+    monkeypatch.setattr(ingest_master, "PUMP_WORKERS", 2)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+    monkeypatch.setattr(history_store, "_store", None)
+    # One worker thread: AE's only batch starts once US's has finished
+    monkeypatch.setattr(ingest_master, "fetch_all_markets_concurrent",
+                        functools.partial(ingest_master.fetch_all_markets_concurrent, max_workers=1))
+
+    data_sources.set_provider(SlowProvider(0.3))
+    try:
+        ingest_master.main(ingest_master.parse_args([]))
+    finally:
+        data_sources.set_provider(None)
+
+    report = pump_metrics.get_metrics().report()
+    seconds = report["gauges"]["market_seconds"]
+    assert seconds["market=AE"] < report["phasesSeconds"]["fetch"] - 0.2   # not measured from the run start
+    assert seconds["market=US"] >= 0.3 and seconds["market=AE"] >= 0.3
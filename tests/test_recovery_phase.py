@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+import data_sources
+
+def make_history(seed):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=30)
+    close = 100 + rng.standard_normal(30).cumsum()
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=index)
+
+class BatchProvider:
+    """download() only (a per-symbol history() call would fail the test); `delay` simulates a slow upstream."""
+    name = "fake"
+    def __init__(self, delay=0.0, missing=()):
+        self.delay = delay
+        self.missing = set(missing)
+        self.batches = []
+        self.lock = threading.Lock()
+    def download(self, symbols, period="1y", start=None):
+        with self.lock: self.batches.append(list(symbols))
+        time.sleep(self.delay)
+        return pd.concat({s: make_history(i) for i, s in enumerate(symbols) if s not in self.missing}, axis=1)
+    def info(self, symbol):
+        return {"shortName": f"Name {symbol}"}
+
+def isolate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master, "_journal", None)
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter())
+    monkeypatch.setattr(history_store, "_store", None)
+
+def test_retry_phase_downloads_failed_symbols_in_batches(tmp_path, monkeypatch):
+    isolate(tmp_path, monkeypatch)
+    monkeypatch.setattr(ingest_master, "BATCH_SIZE", 2)
+    provider = BatchProvider(missing={'EAST.CA'})
+    data_sources.set_provider(provider)
+    try:
+        recovered, outcome = ingest_master.recover_failed_symbols(
+            {'SA': ['1120.SR', '2222.SR', '2010.SR'], 'EG': ['COMI.CA', 'EAST.CA']}, budget=30)
+    finally:
+        data_sources.set_provider(None)
+
+    assert sorted(provider.batches) == sorted([['1120.SR', '2222.SR'], ['2010.SR'], ['COMI.CA', 'EAST.CA']])
+    assert [r["symbol"] for r in recovered['SA']] == ['1120.SR', '2222.SR', '2010.SR']
+    assert outcome["dropped"] == [{"market": 'EG', "symbol": 'EAST.CA'}]
+
+def test_retry_phase_writes_nothing_after_its_budget(tmp_path, monkeypatch):
+    isolate(tmp_path, monkeypatch)
+    monkeypatch.setattr(ingest_master, "BATCH_SIZE", 1)
+    monkeypatch.setattr(ingest_master, "RETRY_WORKERS", 1)
+    provider = BatchProvider(delay=0.3)
+    data_sources.set_provider(provider)
+    try:
+        recovered, outcome = ingest_master.recover_failed_symbols({'SA': ['1120.SR', '2222.SR', '2010.SR']}, budget=0.1)
+        writes_at_return = len(ingest_master.get_artifact_writer().changed)
+        time.sleep(0.5)
+    finally:
+        data_sources.set_provider(None)
+
+    assert provider.batches == [['1120.SR']]          # queued batches were cancelled
+    assert recovered == {} and len(outcome["dropped"]) == 3
+    assert writes_at_return == 0 and len(ingest_master.get_artifact_writer().changed) == 0
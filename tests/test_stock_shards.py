@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+
+ROWS = {
+    'SA': [{"symbol": "2222.SR", "name": "أرامكو", "price": 27.5, "lastUpdated": "t1"}],
+    'US': [{"symbol": "AAPL", "name": "Apple", "price": 190.5, "lastUpdated": "t1"}],
+}
+
+def make_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_master, "_artifact_writer", ingest_master.ArtifactWriter(
+        hashes_path=str(tmp_path / "hashes.json"), manifest_path=str(tmp_path / "changes.json")))
+    return ingest_master.MarketShardWriter(str(tmp_path / "stocks"), str(tmp_path / "stocks.json"),
+                                           str(tmp_path / "deltas"), str(tmp_path / "snapshot"))
+
+def test_combined_file_matches_monolithic_dump(tmp_path, monkeypatch):
+    shards = make_shards(tmp_path, monkeypatch)
+    shards.write('US', ROWS['US'])
+    shards.write('SA', ROWS['SA'])      # finishing order doesn't matter
+    shards.alias('Global', 'US')
+    shards.finish()
+
+    expected = {'SA': ROWS['SA'], 'US': ROWS['US'], 'Global': ROWS['US']}
+    with open(tmp_path / "stocks.json", encoding='utf-8') as f:
+        assert f.read() == json.dumps(expected, ensure_ascii=False)
+    with open(tmp_path / "stocks" / "manifest.json") as f:
+        markets = json.load(f)["markets"]
+    assert list(markets) == ['SA', 'US', 'Global']
+    assert markets['Global']['aliasOf'] == 'US' and markets['US']['path'] == "stocks/US.json"
+    assert not os.path.exists(tmp_path / "stocks" / "Global.json")
+
+def test_unchanged_shards_are_not_rewritten(tmp_path, monkeypatch):
+    shards = make_shards(tmp_path, monkeypatch)
+    for code, rows in ROWS.items(): shards.write(code, rows)
+    shards.finish()
+    ingest_master.get_artifact_writer().finish()
+    first = json.load(open(tmp_path / "stocks" / "manifest.json"))["markets"]
+
+    # Next run: only lastUpdated moved for SA, US gets one recovered row
+    shards = make_shards(tmp_path, monkeypatch)
+    shards.write('SA', [dict(ROWS['SA'][0], lastUpdated="t2")])
+    shards.write('US', ROWS['US'])
+    shards.merge('US', [{"symbol": "MSFT", "name": "Microsoft", "price": 410.0, "lastUpdated": "t2"}])
+    shards.finish()
+
+    writer = ingest_master.get_artifact_writer()
+    changed = {os.path.relpath(p, tmp_path) for p in writer.changed}
+    assert changed == {os.path.join("stocks", "US.json"), os.path.join("stocks", "manifest.json"), "stocks.json",
+                       os.path.join("deltas", "2.json"), os.path.join("deltas", "index.json")}
+    markets = json.load(open(tmp_path / "stocks" / "manifest.json"))["markets"]
+    assert markets['SA']['updatedAt'] == first['SA']['updatedAt']   # lastUpdated alone is not a change
+    assert markets['SA']['fetchedAt'] >= first['SA']['fetchedAt']
+    assert markets['US']['count'] == 2
+    assert [code for code, _ in shards.iter_markets(['US'])] == ['US']
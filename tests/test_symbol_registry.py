@@ -0,0 +1,98 @@
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import ingest_master
+import history_store
+import data_sources
+from symbol_registry import SymbolRegistry
+
+# AAPL is listed by both markets; its home is US (the first listing)
+MARKETS = {
+    'US': {"name": "United States", "flag": "🇺🇸", "symbols": ['^GSPC', 'AAPL', 'MSFT']},
+    'Global': {"name": "Global", "aliasOf": "US"},
+    'AE': {"name": "United Arab Emirates", "flag": "🇦🇪", "symbols": ['EMAAR.AE', 'FAB.AD', 'AAPL', 'DIB.AE']},
+}
+TIMEZONES = {'US': 'America/New_York', 'AE': 'Asia/Dubai'}
+
+def make_history(seed):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-06-30", periods=30)
+    close = 100 + rng.standard_normal(30).cumsum()
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0}, index=index)
+
+class RecordingProvider:
+    name = "fake"
+    def __init__(self):
+        self.batches = []
+    def download(self, symbols, period="1y", start=None):
+        self.batches.append(list(symbols))
+        return pd.concat({s: make_history(i) for i, s in enumerate(symbols)}, axis=1)
+    def history(self, symbol, period="1y", start=None):
+        return make_history(0)
+    def info(self, symbol):
+        return {"shortName": f"Name {symbol}"}
+
+def test_registry_file_matches_catalog():
+    registry = SymbolRegistry.load()
+    mapping = registry.mapping()
+    assert list(mapping)[:4] == ['SA', 'EG', 'US', 'Global']
+    assert mapping['Global'] is mapping['US']
+    assert registry.flags()['SA'] == '🇸🇦' and 'Global' not in registry.flags()
+    assert registry.exchange('2222.SR') == 'SR'
+    assert registry.exchange('^CASE30') == 'CA'           # suffix-less index batches with its constituents
+    assert registry.asset_type('FTSEMIB.MI') == 'index'
+    assert registry.asset_type('^TASI.SR') == 'index'
+    assert registry.asset_type('ENEL.MI') == 'equity'
+    assert registry.symbols(market='AE', exchange='AD') == ['FAB.AD', 'ETISALAT.AD', 'TAQA.AD']
+
+def test_plan_fetches_each_symbol_once_grouped_by_exchange():
+    registry = SymbolRegistry(MARKETS, TIMEZONES)
+    fetch, owners = registry.plan(registry.mapping())
+
+    assert fetch == {'US': ['^GSPC', 'AAPL', 'MSFT'], 'AE': ['EMAAR.AE', 'DIB.AE', 'FAB.AD']}
+    assert owners['AAPL'] == ['US', 'AE']
+    assert 'Global' not in [m for markets in owners.values() for m in markets]
+    # Only AE selected: AAPL is fetched under AE rather than dropped
+    fetch, _ = registry.plan({'AE': MARKETS['AE']["symbols"]})
+    assert fetch == {'AE': ['EMAAR.AE', 'AAPL', 'DIB.AE', 'FAB.AD']}
+
+def test_plan_batches_never_cross_a_group():
+    registry = SymbolRegistry(MARKETS, TIMEZONES)
+    key = lambda s: registry.group(s, 'AE')
+    assert ingest_master.plan_batches(['EMAAR.AE', 'DIB.AE', 'FAB.AD'], 8, key) == [['EMAAR.AE', 'DIB.AE'], ['FAB.AD']]
+    assert ingest_master.plan_batches(['A', 'B', 'C'], 2) == [['A', 'B'], ['C']]
+
+def test_pump_fans_shared_symbols_out_to_every_market(tmp_path, monkeypatch):
+    registry = SymbolRegistry(MARKETS, TIMEZONES)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setattr(ingest_master, "REGISTRY", registry)
+    monkeypatch.setattr(ingest_master, "MARKET_MAPPING", registry.mapping())
+    monkeypatch.setattr(ingest_master, "COUNTRY_FLAGS", registry.flags())
+    monkeypatch.setattr(ingest_master, "PUMP_WORKERS", 1)
+    monkeypatch.setattr(ingest_master, "_profile_cache", None)
+    monkeypatch.setattr(ingest_master.AdaptiveScheduler, "wait", lambda self, seconds=None: None)
+    monkeypatch.setattr(history_store, "_store", None)
+
+    provider = RecordingProvider()
+    data_sources.set_provider(provider)
+    try:
+        ingest_master.main(ingest_master.parse_args([]))
+    finally:
+        data_sources.set_provider(None)
+
+    downloaded = [s for batch in provider.batches for s in batch]
+    assert sorted(downloaded) == sorted(set(downloaded))  # AAPL once, not once per market
+    assert ['EMAAR.AE', 'DIB.AE', 'FAB.AD'] not in provider.batches
+    with open("public/data/stocks.json", encoding='utf-8') as f:
+        stocks = json.load(f)
+    assert [r["symbol"] for r in stocks['AE']] == MARKETS['AE']["symbols"]  # catalog order kept
+    aapl = {code: next(r for r in rows if r["symbol"] == 'AAPL') for code, rows in stocks.items() if code != 'Global'}
+    assert (aapl['US']["category"], aapl['AE']["category"], aapl['AE']["country"]) == ('US', 'AE', '🇦🇪')
+    assert aapl['US']["price"] == aapl['AE']["price"]